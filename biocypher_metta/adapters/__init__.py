@@ -1,6 +1,36 @@
 # Author Abdulrahman S. Omar <xabush@singularitynet.io>
+import zlib
+from biocypher_metta.adapters.region_filter import RegionFilter
+
+# Properties the adapters add to every node and edge when add_provenance is on
+PROVENANCE_PROPERTIES = ("source", "source_url")
 
 class Adapter:
+    # Format of the input file, if it can be read by one of the shared readers in
+    # biocypher_metta.adapters.readers. Adapters that set it implement process_node_record
+    # and/or process_edge_record so a single scan of the file can feed several adapters.
+    SOURCE_FORMAT = None
+    # Whether the adapter can read a chunk of its input file, set with set_chunk, so a single large input can be
+    # split across several workers. Adapters that set it read their input with readers.read_lines or read_gtf.
+    SPLITTABLE = False
+
+    # Sampling of the nodes and edges, set with set_sampling
+    sample_size = None
+    sample_fraction = None
+
+    # Outputs of positional adapters, 'nodes' and/or 'edges', restricted to the genomic window of their chr, start
+    # and end args. Only entries writing nothing else are sharded by chromosome.
+    POSITIONAL_OUTPUTS = ('nodes', 'edges')
+    # Genomic window of positional adapters, set from their chr, start and end args
+    chr = None
+    start = None
+    end = None
+    # Regions the nodes and edges of positional adapters are restricted to, set with set_region_filter
+    region_filter = None
+    _region_filters = None
+    # (index, count) of the chunk of the input file the adapter reads, set with set_chunk
+    chunk = None
+
     def __init__(self, write_properties, add_provenance):
         self.write_properties = write_properties
         self.add_provenance = add_provenance
@@ -8,4 +38,101 @@ class Adapter:
         pass
 
     def get_edges(self):
-        pass
\ No newline at end of file
+        pass
+
+    def process_node_record(self, record):
+        return ()
+
+    def process_edge_record(self, record):
+        return ()
+
+    def set_sampling(self, sample_size=None, sample_fraction=None):
+        """
+        Only output a sample of the nodes and edges, for quick builds
+        :param sample_size: keep the first sample_size nodes and edges
+        :param sample_fraction: keep the nodes whose id hashes into this fraction of the hash space, and the edges
+        whose source and target both do. The hash only depends on the id, so the kept edges reference nodes kept
+        by any adapter.
+        """
+        self.sample_size = sample_size
+        self.sample_fraction = sample_fraction
+
+    def set_region_filter(self, region_filter):
+        """
+        Only output the nodes and edges in the regions of region_filter, e.g. a panel of loci, in addition to the
+        window of the chr, start and end args of the adapter
+        :param region_filter: a RegionFilter, None to keep all the regions
+        """
+        self.region_filter = region_filter
+        self._region_filters = None
+
+    def set_chunk(self, index, count):
+        """
+        Only read a chunk of the input file, see input_chunks.read_chunk. The file is split into count chunks of
+        about the same size, and the count adapters reading each chunk output the nodes and edges of the whole file.
+        """
+        if not self.SPLITTABLE:
+            raise ValueError(f"{type(self).__name__} can't read a chunk of its input")
+        self.chunk = (index, count)
+
+    def in_region(self, chr, start, end=None):
+        """
+        :return: whether a node or edge at chr:start-end passes the window of the adapter's args and the region filter
+        """
+        if self._region_filters is None:
+            self._region_filters = [f for f in (RegionFilter.from_args(self.chr, self.start, self.end),
+                                                self.region_filter) if f is not None]
+        for region_filter in self._region_filters:
+            if not region_filter.keep(chr, start, end):
+                return False
+        return True
+
+    def read_regions(self):
+        """
+        :return: the (chr, start, end) regions, 1-based and inclusive, that hold all the nodes and edges the adapter
+        keeps, for readers that can seek to them. None if all the regions are kept.
+        """
+        if self.chr is not None:
+            return [(self.chr, self.start or None, self.end or None)]
+        if self.region_filter is not None:
+            return self.region_filter.regions()
+        return None
+
+    def in_sample(self, id):
+        return zlib.crc32(str(id).encode()) < self.sample_fraction * 2**32
+
+    def keep_node(self, node):
+        return self.sample_fraction is None or self.in_sample(node[0])
+
+    def keep_edge(self, edge):
+        return self.sample_fraction is None or (self.in_sample(edge[0]) and self.in_sample(edge[1]))
+
+    def sample(self, entities, keep):
+        """
+        :return: generator of the entities kept by keep, up to sample_size of them. The generator of the entities is
+        closed once sample_size of them are taken, rather than left paused at a yield.
+        """
+        entities = iter(entities)
+        try:
+            if self.sample_size is not None and self.sample_size <= 0:
+                return
+            count = 0
+            for entity in entities:
+                if self.sample_fraction is None or keep(entity):
+                    yield entity
+                    count += 1
+                    if self.sample_size is not None and count >= self.sample_size:
+                        return
+        finally:
+            if hasattr(entities, "close"):
+                entities.close()
+
+    def sample_nodes(self, nodes):
+        if self.sample_fraction is None and self.sample_size is None:
+            return nodes
+        return self.sample(nodes, self.keep_node)
+
+    def sample_edges(self, edges):
+        if self.sample_fraction is None and self.sample_size is None:
+            return edges
+        return self.sample(edges, self.keep_edge)
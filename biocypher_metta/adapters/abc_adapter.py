@@ -1,9 +1,8 @@
 # Author Abdulrahman S. Omar <xabush@singularitynet.io>
 from biocypher_metta.adapters import Adapter
+from biocypher_metta.adapters.gzip_reader import open_gzip
 import pickle
 import csv
-import gzip
-from biocypher_metta.adapters.helpers import check_genomic_location
 from biocypher._logger import logger
 
 #Example ABC Data
@@ -40,7 +39,7 @@ class ABCAdapter(Adapter):
         super(ABCAdapter, self).__init__(write_properties, add_provenance)
 
     def get_nodes(self):
-        with gzip.open(self.file_path, "rt") as fp:
+        with open_gzip(self.file_path) as fp:
             next(fp)
             reader = csv.reader(fp, delimiter=",")
             for row in reader:
@@ -48,7 +47,7 @@ class ABCAdapter(Adapter):
                     rsid = row[COL_DICT['rsid']]
                     chr = row[COL_DICT['chromosome']]
                     pos = self.dbsnp_rsid_map[rsid]["pos"]
-                    if check_genomic_location(self.chr, self.start, self.end, chr, pos, pos):
+                    if self.in_region(chr, pos, pos):
                         _props = {
                             'chr': chr,
                             'start': pos,
@@ -64,15 +63,15 @@ class ABCAdapter(Adapter):
 
 
     def get_edges(self):
-        with gzip.open(self.file_path, "rt") as fp:
+        with open_gzip(self.file_path) as fp:
             next(fp)
             reader = csv.reader(fp, delimiter=",")
             for row in reader:
                 try:
                     rsid = row[COL_DICT['rsid']]
                     chr = row[COL_DICT['chromosome']]
-                    pos = self.dbsnp_rsid_map[rsid]
-                    if check_genomic_location(self.chr, self.start, self.end, chr, pos, pos):
+                    pos = self.dbsnp_rsid_map[rsid]["pos"]
+                    if self.in_region(chr, pos, pos):
                         try:
                             _source = rsid
                             _target = self.hgnc_to_ensembl_map[(row[COL_DICT['target_gene']]).strip()]
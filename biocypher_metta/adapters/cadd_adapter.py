@@ -1,8 +1,8 @@
 # Author Abdulrahman S. Omar <xabush@singularitynet.io>
 from biocypher_metta.adapters import Adapter
+from biocypher_metta.adapters.gzip_reader import open_gzip
 import csv
-import gzip
-from biocypher_metta.adapters.helpers import check_genomic_location, build_regulatory_region_id
+from biocypher_metta.adapters.helpers import build_regulatory_region_id
 from biocypher._logger import logger
 
 #Example CADD Data
@@ -17,6 +17,8 @@ class CADDAdapter(Adapter):
     """
     Adapter for CADD data
     """
+    POSITIONAL_OUTPUTS = ('nodes',)
+
     def __init__(self, filepath, dbsnp_rsid_map,
                  write_properties, add_provenance,  
                  chr=None, start=None, end=None):
@@ -33,7 +35,7 @@ class CADDAdapter(Adapter):
         super(CADDAdapter, self).__init__(write_properties, add_provenance)
 
     def get_nodes(self):
-        with gzip.open(self.file_path, "rt") as fp:
+        with open_gzip(self.file_path) as fp:
             next(fp)
             reader = csv.reader(fp, delimiter=",")
             for row in reader:
@@ -44,7 +46,7 @@ class CADDAdapter(Adapter):
                     ref = row[3]
                     alt = row[4]
                     _props = {}
-                    if check_genomic_location(self.chr, self.start, self.end, chr, pos, pos):
+                    if self.in_region(chr, pos, pos):
                         if self.write_properties:
                             _props = {
                                 'chr': chr,
@@ -1,6 +1,5 @@
-import gzip
 from biocypher_metta.adapters import Adapter
-from biocypher_metta.adapters.helpers import check_genomic_location
+from biocypher_metta.adapters.readers import read_lines
 # Exaple dbSNP vcf input file:
 #CHROM	POS	ID	REF	ALT	QUAL	FILTER	INFO
 # 1	10177	rs367896724	A	AC	.	.	RS=367896724;RSPOS=10177;dbSNPBuildID=138;SSR=0;SAO=0;VP=0x050000020005170026000200;GENEINFO=DDX11L1:100287102;WGT=1;VC=DIV;R5;ASP;VLD;G5A;G5;KGPhase3;CAF=0.5747,0.4253;COMMON=1;TOPMED=0.76728147298674821,0.23271852701325178
@@ -9,6 +8,7 @@ from biocypher_metta.adapters.helpers import check_genomic_location
 
 class DBSNPAdapter(Adapter):
     INDEX = {'chr': 0, 'pos': 1, 'id': 2, 'ref': 3, 'alt': 4, 'info': 7}
+    SPLITTABLE = True
     def __init__(self, filepath, write_properties, add_provenance,
                  chr=None, start=None, end=None):
         self.filepath = filepath
@@ -36,32 +36,31 @@ class DBSNPAdapter(Adapter):
         return info_dict
     
     def get_nodes(self):
-        with gzip.open(self.filepath, 'rt') as f:
-            for line in f:
-                if line.startswith('#'):
-                    continue
-                data = line.strip().split('\t')
-                rsid = data[DBSNPAdapter.INDEX['id']]
-                chr = data[DBSNPAdapter.INDEX['chr']]
-                pos = int(data[DBSNPAdapter.INDEX['pos']])
-                ref = data[DBSNPAdapter.INDEX['ref']]
-                alt = data[DBSNPAdapter.INDEX['alt']]
-                info_dict = self.parse_info(data[DBSNPAdapter.INDEX['info']])
-                caf = info_dict.get('CAF')
+        for line in read_lines(self.filepath, self.read_regions(), 'vcf', self.chunk):
+            if line.startswith('#'):
+                continue
+            data = line.strip().split('\t')
+            rsid = data[DBSNPAdapter.INDEX['id']]
+            chr = data[DBSNPAdapter.INDEX['chr']]
+            pos = int(data[DBSNPAdapter.INDEX['pos']])
+            ref = data[DBSNPAdapter.INDEX['ref']]
+            alt = data[DBSNPAdapter.INDEX['alt']]
+            info_dict = self.parse_info(data[DBSNPAdapter.INDEX['info']])
+            caf = info_dict.get('CAF')
 
-                if check_genomic_location(self.chr, self.start, self.end, chr, pos, pos):
-                    props = {}
-                    if self.write_properties:
-                        props['chr'] = 'chr'+chr
-                        props['start'] = pos
-                        props['end'] = pos
-                        props['ref'] = ref
-                        props['alt'] = alt
-                        if caf != None:
-                            props['caf_ref'] = caf[0]
-                            props['caf_alt'] = caf[1]
-                        if self.add_provenance:
-                            props['source'] = self.source
-                            props['source_url'] = self.source_url
-                    
-                    yield rsid, self.label, props
\ No newline at end of file
+            if self.in_region(chr, pos, pos):
+                props = {}
+                if self.write_properties:
+                    props['chr'] = 'chr'+chr
+                    props['start'] = pos
+                    props['end'] = pos
+                    props['ref'] = ref
+                    props['alt'] = alt
+                    if caf != None:
+                        props['caf_ref'] = caf[0]
+                        props['caf_alt'] = caf[1]
+                    if self.add_provenance:
+                        props['source'] = self.source
+                        props['source_url'] = self.source_url
+                
+                yield rsid, self.label, props
\ No newline at end of file
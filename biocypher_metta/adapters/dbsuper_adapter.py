@@ -1,10 +1,13 @@
 from collections import defaultdict
 import csv
-import gzip
 import pickle
+import numpy as np
+from biocypher._logger import logger
 from biocypher_metta.adapters import Adapter
+from biocypher_metta.adapters.gzip_reader import open_gzip
 
-from biocypher_metta.adapters.helpers import build_regulatory_region_id, check_genomic_location, convert_genome_reference
+from biocypher_metta.adapters.helpers import build_regulatory_region_id, \
+    convert_genome_references, UNMAPPED
 # Example dbSuper tsv input files:
 # chrom	 start	 stop	 se_id	 gene_symbol	 cell_name	 rank
 # chr1	120485363	120615071	SE_00001	NOTCH2	Adipose Nuclei	1
@@ -18,7 +21,7 @@ class DBSuperAdapter(Adapter):
     def __init__(self, filepath, hgnc_to_ensembl_map, dbsuper_tissues_map,
                  write_properties, add_provenance, 
                  type='super enhancer', label='super_enhancer', delimiter='\t',
-                 chr=None, start=None, end=None):
+                 chr=None, start=None, end=None, chain_file=None):
         self.filePath = filepath
         self.hgnc_to_ensembl_map = pickle.load(open(hgnc_to_ensembl_map, 'rb'))
         self.dbsuper_tissues_map = pickle.load(open(dbsuper_tissues_map, 'rb'))
@@ -28,6 +31,8 @@ class DBSuperAdapter(Adapter):
         self.chr = chr
         self.start = start
         self.end = end
+        self.chain_file = chain_file
+        self._rows = None
 
         self.source = 'dbSuper'
         self.version = ''
@@ -36,59 +41,67 @@ class DBSuperAdapter(Adapter):
         super(DBSuperAdapter, self).__init__(write_properties, add_provenance)
 
 
-    def get_nodes(self):
-        with gzip.open(self.filePath, 'rt') as f:
+    def read_rows(self):
+        """
+        :return: the rows of the file with their hg38 start and end. The file is read once per adapter and its
+        coordinates converted in a single batch.
+        """
+        if self._rows is not None:
+            return self._rows
+        with open_gzip(self.filePath) as f:
             reader = csv.reader(f, delimiter=self.delimiter)
             next(reader)
-            for line in reader:
-                se_id = line[DBSuperAdapter.INDEX['se_id']]
-                chr = line[DBSuperAdapter.INDEX['chr']]
-                start_hg19 = int(line[DBSuperAdapter.INDEX['coord_start']]) + 1 # +1 since it is 0-based genomic coordinate
-                end_hg19 = int(line[DBSuperAdapter.INDEX['coord_end']]) + 1
-                start = convert_genome_reference(chr, start_hg19)
-                end = convert_genome_reference(chr, end_hg19)
-                
-                if start == None or end == None:
-                    continue
-                se_region_id = build_regulatory_region_id(chr, start, end)
-                if check_genomic_location(self.chr, self.start, self.end, chr, start, end):
-                    props = {}
-                    if self.write_properties:
-                        props['id'] = se_id
-                        props['chr'] = chr
-                        props['start'] = start
-                        props['end'] = end
-                        if self.add_provenance:
-                            props['source'] = self.source
-                            props['source_url'] = self.source_url
+            rows = list(reader)
+        chrs = [line[DBSuperAdapter.INDEX['chr']] for line in rows]
+        # +1 since it is 0-based genomic coordinate
+        starts_hg19 = np.array([int(line[DBSuperAdapter.INDEX['coord_start']]) for line in rows], dtype=np.int64) + 1
+        ends_hg19 = np.array([int(line[DBSuperAdapter.INDEX['coord_end']]) for line in rows], dtype=np.int64) + 1
+        starts = convert_genome_references(chrs, starts_hg19, chain_file=self.chain_file)
+        ends = convert_genome_references(chrs, ends_hg19, chain_file=self.chain_file)
+        converted = (starts != UNMAPPED) & (ends != UNMAPPED)
+        failed = len(rows) - int(converted.sum())
+        if failed:
+            logger.warning(f"{failed} of {len(rows)} dbSuper regions couldn't be converted to hg38, skipping them")
+        self._rows = list(zip([rows[i] for i in np.flatnonzero(converted)], starts[converted].tolist(),
+                              ends[converted].tolist()))
+        return self._rows
+
+    def get_nodes(self):
+        for line, start, end in self.read_rows():
+            se_id = line[DBSuperAdapter.INDEX['se_id']]
+            chr = line[DBSuperAdapter.INDEX['chr']]
+            se_region_id = build_regulatory_region_id(chr, start, end)
+            if self.in_region(chr, start, end):
+                props = {}
+                if self.write_properties:
+                    props['id'] = se_id
+                    props['chr'] = chr
+                    props['start'] = start
+                    props['end'] = end
+                    if self.add_provenance:
+                        props['source'] = self.source
+                        props['source_url'] = self.source_url
+
+                yield se_region_id, self.label, props
 
-                    yield se_region_id, self.label, props
 
-    
     def get_edges(self):
-        with gzip.open(self.filePath, 'rt') as f:
-            reader = csv.reader(f, delimiter=self.delimiter)
-            next(reader)
-            for line in reader:
-                gene_id = line[DBSuperAdapter.INDEX['gene_id']]
-                ensembl_gene_id = self.hgnc_to_ensembl_map.get(gene_id, None)
-                chr = line[DBSuperAdapter.INDEX['chr']]
-                start_hg19 = int(line[DBSuperAdapter.INDEX['coord_start']]) + 1 # +1 since it is 0-based genomic coordinate
-                end_hg19 = int(line[DBSuperAdapter.INDEX['coord_end']]) + 1
-                start = convert_genome_reference(chr, start_hg19)
-                end = convert_genome_reference(chr, end_hg19)
-                cell_name = line[DBSuperAdapter.INDEX['cell_name']]
-                biological_id = self.dbsuper_tissues_map[cell_name]
-                
-                if None in [ensembl_gene_id, start, end]:
-                    continue
-                se_region_id = build_regulatory_region_id(chr, start, end)
-                if check_genomic_location(self.chr, self.start, self.end, chr, start, end):
-                    props = {}
-                    if self.write_properties:
-                        props['biological_context'] = biological_id
-                        if self.add_provenance:
-                            props['source'] = self.source
-                            props['source_url'] = self.source_url
+        for line, start, end in self.read_rows():
+            gene_id = line[DBSuperAdapter.INDEX['gene_id']]
+            ensembl_gene_id = self.hgnc_to_ensembl_map.get(gene_id, None)
+            chr = line[DBSuperAdapter.INDEX['chr']]
+            cell_name = line[DBSuperAdapter.INDEX['cell_name']]
+            biological_id = self.dbsuper_tissues_map[cell_name]
+
+            if ensembl_gene_id is None:
+                continue
+            se_region_id = build_regulatory_region_id(chr, start, end)
+            if self.in_region(chr, start, end):
+                props = {}
+                if self.write_properties:
+                    props['biological_context'] = biological_id
+                    if self.add_provenance:
+                        props['source'] = self.source
+                        props['source_url'] = self.source_url
 
-                    yield se_region_id, ensembl_gene_id, self.label, props
\ No newline at end of file
+                yield se_region_id, ensembl_gene_id, self.label, props
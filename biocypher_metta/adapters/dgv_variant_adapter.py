@@ -1,6 +1,6 @@
-import gzip
 from biocypher_metta.adapters import Adapter
-from biocypher_metta.adapters.helpers import build_regulatory_region_id, check_genomic_location
+from biocypher_metta.adapters.gzip_reader import open_gzip
+from biocypher_metta.adapters.helpers import build_regulatory_region_id
 # Example dgv input file:
 # variantaccession	chr	start	end	varianttype	variantsubtype	reference	pubmedid	method	platform	mergedvariants	supportingvariants	mergedorsample	frequency	samplesize	observedgains	observedlosses	cohortdescription	genes	samples
 # dgv1n82	1	10001	22118	CNV	duplication	Sudmant_et_al_2013	23825009	Oligo aCGH,Sequencing			nsv945697,nsv945698	M		97	10	0		""	HGDP00456,HGDP00521,HGDP00542,HGDP00665,HGDP00778,HGDP00927,HGDP00998,HGDP01029,HGDP01284,HGDP01307
@@ -27,7 +27,7 @@ class DGVVariantAdapter(Adapter):
         super(DGVVariantAdapter, self).__init__(write_properties, add_provenance)
 
     def get_nodes(self):
-        with gzip.open(self.filepath, 'rt') as f:
+        with open_gzip(self.filepath) as f:
             next(f)
             for line in f:
                 data = line.strip().split(self.delimiter)
@@ -38,7 +38,7 @@ class DGVVariantAdapter(Adapter):
                 variant_type = data[DGVVariantAdapter.INDEX['type']]
                 pubmedid = data[DGVVariantAdapter.INDEX['pubmedid']]
                 region_id = build_regulatory_region_id(chr, start, end)
-                if not check_genomic_location(self.chr, self.start, self.end, chr, start, end):
+                if not self.in_region(chr, start, end):
                     continue
                 props = {}
 
@@ -1,8 +1,8 @@
-import gzip
 import os
 import pickle
 from biocypher_metta.adapters import Adapter
-from biocypher_metta.adapters.helpers import build_regulatory_region_id, check_genomic_location
+from biocypher_metta.adapters.gzip_reader import open_gzip
+from biocypher_metta.adapters.helpers import build_regulatory_region_id
 
 # Example enhancer atlas input file:
 # enhancer signal - enrichment score calculated as the combination of enrichment scores from individual tracks.
@@ -57,7 +57,7 @@ class EnhancerAtlasAdapter(Adapter):
         return chr, start, end, gene
     
     def get_nodes(self):
-        with gzip.open(self.enhancer_filepath, 'rt') as f:
+        with open_gzip(self.enhancer_filepath) as f:
             for line in f:
                 info = line.strip().split('\t')
                 chr = info[EnhancerAtlasAdapter.INDEX['chr']]
@@ -65,7 +65,7 @@ class EnhancerAtlasAdapter(Adapter):
                 end = int(info[EnhancerAtlasAdapter.INDEX['coord_end']]) + 1
                 enhancer_region_id = build_regulatory_region_id(chr, start, end)
                 
-                if check_genomic_location(self.chr, self.start, self.end, chr, start, end):
+                if self.in_region(chr, start, end):
                     props = {}
                     if self.write_properties:
                         props['chr'] = chr
@@ -91,7 +91,7 @@ class EnhancerAtlasAdapter(Adapter):
                     for line in f:
                         info = line.strip().split('\t')
                         chr, start, end, gene = self.parse_enhancer_gene(line)
-                        if check_genomic_location(self.chr, self.start, self.end, chr, start, end):
+                        if self.in_region(chr, start, end):
                             enhancer_region_id = build_regulatory_region_id(chr, start, end)
                             score = float(info[1])
                             props = {}
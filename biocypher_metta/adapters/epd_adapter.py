@@ -1,8 +1,8 @@
 import csv
-import gzip
 import pickle
 from biocypher_metta.adapters import Adapter
-from biocypher_metta.adapters.helpers import build_regulatory_region_id, check_genomic_location
+from biocypher_metta.adapters.gzip_reader import open_gzip
+from biocypher_metta.adapters.helpers import build_regulatory_region_id
 # Example EPD bed input file:
 ##CHRM Start  End   Id  Score Strand -  -
 # chr1 959245 959305 NOC2L_1 900 - 959245 959256
@@ -32,7 +32,7 @@ class EPDAdapter(Adapter):
         super(EPDAdapter, self).__init__(write_properties, add_provenance)
 
     def get_nodes(self):
-        with gzip.open(self.filepath, 'rt') as f:
+        with open_gzip(self.filepath) as f:
             reader = csv.reader(f, delimiter=self.delimiter)
             for line in reader:
                 chr = line[EPDAdapter.INDEX['chr']]
@@ -40,7 +40,7 @@ class EPDAdapter(Adapter):
                 coord_end = int(line[EPDAdapter.INDEX['coord_end']]) + 1
                 promoter_id = build_regulatory_region_id(chr, coord_start, coord_end)
 
-                if check_genomic_location(self.chr, self.start, self.end, chr, coord_start, coord_end):
+                if self.in_region(chr, coord_start, coord_end):
                     props = {}
                     if self.write_properties:
                         props['chr'] = chr
@@ -54,7 +54,7 @@ class EPDAdapter(Adapter):
                     yield promoter_id, self.label, props
 
     def get_edges(self):
-        with gzip.open(self.filepath, 'rt') as f:
+        with open_gzip(self.filepath) as f:
             reader = csv.reader(f, delimiter=self.delimiter)
             for line in reader:
                 chr = line[EPDAdapter.INDEX['chr']]
@@ -65,7 +65,7 @@ class EPDAdapter(Adapter):
                 if ensembl_gene_id is None:
                     continue
                 
-                if check_genomic_location(self.chr, self.start, self.end, chr, coord_start, coord_end):
+                if self.in_region(chr, coord_start, coord_end):
                     promoter_id = build_regulatory_region_id(chr, coord_start, coord_end)
                     props = {}
                     if self.write_properties:
@@ -1,5 +1,7 @@
 from biocypher_metta.adapters import Adapter
-from biocypher_metta.adapters.helpers import build_variant_id, to_float, check_genomic_location
+from biocypher_metta.adapters.helpers import build_variant_id, to_float
+from biocypher_metta.adapters.readers import read_lines
+import contextlib
 import json
 import os
 import csv
@@ -58,6 +60,7 @@ class FavorAdapter(Adapter):
     # Converted to 0-based
 
     WRITE_THRESHOLD = 1000000
+    SPLITTABLE = True
 
     def __init__(self, write_properties, add_provenance, 
                  filepath=None, chr=None, start=None, end=None):
@@ -95,8 +98,10 @@ class FavorAdapter(Adapter):
 
     def get_nodes(self):
 
-        with open(self.filepath, 'r') as f:
-            next(f)
+        with contextlib.closing(read_lines(self.filepath, chunk=self.chunk)) as f:
+            # the header is in the first chunk
+            if self.chunk is None or self.chunk[0] == 0:
+                next(f)
             reader = csv.reader(f, delimiter=',')
 
             for row in reader:
@@ -104,7 +109,7 @@ class FavorAdapter(Adapter):
                 chr = "chr" + row[FIELDS["chromosome"]]
                 pos = int(row[FIELDS["start_position"]])
 
-                if check_genomic_location(self.chr, self.start, self.end, chr, pos, pos):
+                if self.in_region(chr, pos, pos):
                     id = build_variant_id(
                         chr, pos,
                         row[FIELDS["ref_vcf"]],
@@ -1,11 +1,11 @@
 import os
-import gzip
 import json
 import hashlib
 
 from Bio.UniProt.GOA import gafiterator
 
 from biocypher_metta.adapters import Adapter
+from biocypher_metta.adapters.gzip_reader import open_gzip
 
 # GAF files are defined here: https://geneontology.github.io/docs/go-annotation-file-gaf-format-2.2/
 #
@@ -67,7 +67,7 @@ class GAFAdapter(Adapter):
 
     def load_rnacentral_mapping(self):
         self.rnacentral_mapping = {}
-        with gzip.open(GAFAdapter.RNACENTRAL_ID_MAPPING_PATH, 'rt') as mapping_file:
+        with open_gzip(GAFAdapter.RNACENTRAL_ID_MAPPING_PATH) as mapping_file:
             for annotation in mapping_file:
                 mapping = annotation.split('\t')
                 self.rnacentral_mapping[mapping[0] +
@@ -78,7 +78,7 @@ class GAFAdapter(Adapter):
         if self.type == 'rna':
             self.load_rnacentral_mapping()
 
-        with gzip.open(self.filepath, 'rt') as input_file:
+        with open_gzip(self.filepath) as input_file:
             for annotation in gafiterator(input_file):
                 source = annotation['GO_ID']
                 target = annotation['DB_Object_ID']
@@ -1,7 +1,5 @@
 from biocypher_metta.adapters import Adapter
-import gzip
-
-from biocypher_metta.adapters.helpers import check_genomic_location
+from biocypher_metta.adapters.readers import parse_gtf_info, read_gtf
 # Example genocde vcf input file:
 # ##description: evidence-based annotation of the human genome (GRCh38), version 42 (Ensembl 108)
 # ##provider: GENCODE
@@ -23,6 +21,10 @@ class GencodeAdapter(Adapter):
                     'transcript_id', 'transcript_type', 'transcript_name']
 
     INDEX = {'chr': 0, 'type': 2, 'coord_start': 3, 'coord_end': 4, 'info': 8}
+    SOURCE_FORMAT = 'gtf'
+    SPLITTABLE = True
+    # the transcribed to/from edges aren't filtered by location
+    POSITIONAL_OUTPUTS = ('nodes',)
 
     def __init__(self, write_properties, add_provenance, filepath=None, 
                  type='gene', label='gencode_gene', 
@@ -46,89 +48,81 @@ class GencodeAdapter(Adapter):
         super(GencodeAdapter, self).__init__(write_properties, add_provenance)
 
     def parse_info_metadata(self, info):
-        parsed_info = {}
-        for key, value in zip(info, info[1:]):
-            if key in GencodeAdapter.ALLOWED_KEYS:
-                parsed_info[key] = value.replace('"', '').replace(';', '')
-        return parsed_info
+        return parse_gtf_info(info, GencodeAdapter.ALLOWED_KEYS)
 
     def get_nodes(self):
-        with gzip.open(self.filepath, 'rt') as input:
-            for line in input:
-                if line.startswith('#'):
-                    continue
-
-                data_line = line.strip().split()
-                if data_line[GencodeAdapter.INDEX['type']] != 'transcript':
-                    continue
-
-                data = data_line[:GencodeAdapter.INDEX['info']]
-                info = self.parse_info_metadata(data_line[GencodeAdapter.INDEX['info']:])
-                transcript_key = info['transcript_id'].split('.')[0]
-                if info['transcript_id'].endswith('_PAR_Y'):
-                    transcript_key = transcript_key + '_PAR_Y'
-                gene_key = info['gene_id'].split('.')[0]
-                if info['gene_id'].endswith('_PAR_Y'):
-                    gene_key = gene_key + '_PAR_Y'
-                chr = data[GencodeAdapter.INDEX['chr']]
-                start = int(data[GencodeAdapter.INDEX['coord_start']])
-                end = int(data[GencodeAdapter.INDEX['coord_end']])
-                props = {}
-                try:
-                    if check_genomic_location(self.chr, self.start, self.end, chr, start, end):
-                        if self.type == 'transcript':
-                            if self.write_properties:
-                                props = {
-                                    'transcript_id': info['transcript_id'],
-                                    'transcript_name': info['transcript_name'],
-                                    'transcript_type': info['transcript_type'],
-                                    'chr': chr,
-                                    'start': start,
-                                    'end': end,
-                                    'gene_name': info['gene_name'],
-                                }
-                                if self.add_provenance:
-                                    props['source'] = self.source
-                                    props['source_url'] = self.source_url
-                            yield transcript_key, self.label, props
-                except:
-                    print(
-                        f'fail to process for label to load: {self.label}, type to load: {self.type}, data: {line}')
+        for record in read_gtf(self.filepath, self.read_regions(), self.chunk):
+            yield from self.process_node_record(record)
 
     def get_edges(self):
-        with gzip.open(self.filepath, 'rt') as input:
-            for line in input:
-                if line.startswith('#'):
-                    continue
-
-                data_line = line.strip().split()
-                if data_line[GencodeAdapter.INDEX['type']] != 'transcript':
-                    continue
-
-                info = self.parse_info_metadata(data_line[GencodeAdapter.INDEX['info']:])
-                transcript_key = info['transcript_id'].split('.')[0]
-                if info['transcript_id'].endswith('_PAR_Y'):
-                    transcript_key = transcript_key + '_PAR_Y'
-                gene_key = info['gene_id'].split('.')[0]
-                if info['gene_id'].endswith('_PAR_Y'):
-                    gene_key = gene_key + '_PAR_Y'
-               
-                _props = {}
-                if self.write_properties and self.add_provenance:
-                    _props['source'] = self.source
-                    _props['source_url'] = self.source_url
-               
-                try:
-                    if self.type == 'transcribed to':
-                        _id = gene_key + '_' + transcript_key
-                        _source = gene_key
-                        _target = transcript_key
-                        yield _source, _target, self.label, _props
-                    elif self.type == 'transcribed from':
-                        _id = transcript_key + '_' + gene_key
-                        _source = transcript_key
-                        _target = gene_key
-                        yield _source, _target, self.label, _props
-                except:
-                    print(
-                        f'fail to process for label to load: {self.label}, type to load: {self.type}, data: {line}')
+        for record in read_gtf(self.filepath, chunk=self.chunk):
+            yield from self.process_edge_record(record)
+
+    def process_node_record(self, record):
+        if record.type != 'transcript':
+            return
+
+        data = record.fields[:GencodeAdapter.INDEX['info']]
+        info = record.info
+        transcript_key = info['transcript_id'].split('.')[0]
+        if info['transcript_id'].endswith('_PAR_Y'):
+            transcript_key = transcript_key + '_PAR_Y'
+        gene_key = info['gene_id'].split('.')[0]
+        if info['gene_id'].endswith('_PAR_Y'):
+            gene_key = gene_key + '_PAR_Y'
+        chr = data[GencodeAdapter.INDEX['chr']]
+        start = int(data[GencodeAdapter.INDEX['coord_start']])
+        end = int(data[GencodeAdapter.INDEX['coord_end']])
+        props = {}
+        try:
+            if self.in_region(chr, start, end):
+                if self.type == 'transcript':
+                    if self.write_properties:
+                        props = {
+                            'transcript_id': info['transcript_id'],
+                            'transcript_name': info['transcript_name'],
+                            'transcript_type': info['transcript_type'],
+                            'chr': chr,
+                            'start': start,
+                            'end': end,
+                            'gene_name': info['gene_name'],
+                        }
+                        if self.add_provenance:
+                            props['source'] = self.source
+                            props['source_url'] = self.source_url
+                    yield transcript_key, self.label, props
+        except Exception:
+            print(
+                f'fail to process for label to load: {self.label}, type to load: {self.type}, data: {record.line}')
+
+    def process_edge_record(self, record):
+        if record.type != 'transcript':
+            return
+
+        info = record.info
+        transcript_key = info['transcript_id'].split('.')[0]
+        if info['transcript_id'].endswith('_PAR_Y'):
+            transcript_key = transcript_key + '_PAR_Y'
+        gene_key = info['gene_id'].split('.')[0]
+        if info['gene_id'].endswith('_PAR_Y'):
+            gene_key = gene_key + '_PAR_Y'
+
+        _props = {}
+        if self.write_properties and self.add_provenance:
+            _props['source'] = self.source
+            _props['source_url'] = self.source_url
+
+        try:
+            if self.type == 'transcribed to':
+                _id = gene_key + '_' + transcript_key
+                _source = gene_key
+                _target = transcript_key
+                yield _source, _target, self.label, _props
+            elif self.type == 'transcribed from':
+                _id = transcript_key + '_' + gene_key
+                _source = transcript_key
+                _target = gene_key
+                yield _source, _target, self.label, _props
+        except Exception:
+            print(
+                f'fail to process for label to load: {self.label}, type to load: {self.type}, data: {record.line}')
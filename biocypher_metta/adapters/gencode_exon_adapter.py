@@ -1,6 +1,5 @@
-import gzip
 from biocypher_metta.adapters import Adapter
-from biocypher_metta.adapters.helpers import check_genomic_location
+from biocypher_metta.adapters.readers import parse_gtf_info, read_gtf
 
 # Example genocde vcf input file:
 # ##description: evidence-based annotation of the human genome (GRCh38), version 42 (Ensembl 108)
@@ -17,6 +16,8 @@ from biocypher_metta.adapters.helpers import check_genomic_location
 class GencodeExonAdapter(Adapter):
     ALLOWED_KEYS = ['gene_id', 'transcript_id', 'transcript_type', 'transcript_name', 'exon_number', 'exon_id']
     INDEX = {'chr': 0, 'type': 2, 'coord_start': 3, 'coord_end': 4, 'info': 8}
+    SOURCE_FORMAT = 'gtf'
+    SPLITTABLE = True
 
     def __init__(self, write_properties, add_provenance, filepath=None,
                  chr=None, start=None, end=None):
@@ -33,46 +34,42 @@ class GencodeExonAdapter(Adapter):
         super(GencodeExonAdapter, self).__init__(write_properties, add_provenance)
 
     def parse_info_metadata(self, info):
-        parsed_info = {}
-        for key, value in zip(info, info[1:]):
-            if key in GencodeExonAdapter.ALLOWED_KEYS:
-                parsed_info[key] = value.replace('"', '').replace(';', '')
-        return parsed_info
+        return parse_gtf_info(info, GencodeExonAdapter.ALLOWED_KEYS)
 
     def get_nodes(self):
-        with gzip.open(self.filepath, 'rt') as input:
-            for line in input:
-                if line.startswith('#'):
-                    continue
-                split_line = line.strip().split()
-                if split_line[GencodeExonAdapter.INDEX['type']] == 'exon':
-                    info = self.parse_info_metadata(
-                        split_line[GencodeExonAdapter.INDEX['info']:])
-                    gene_id = info['gene_id'].split('.')[0]
-                    transcript_id = info['transcript_id'].split('.')[0]
-                    exon_id = info['exon_id'].split('.')[0]
-                    chr = split_line[GencodeExonAdapter.INDEX['chr']]
-                    start = int(split_line[GencodeExonAdapter.INDEX['coord_start']])
-                    end = int(split_line[GencodeExonAdapter.INDEX['coord_end']])
-                    props = {}
-                    try:
-                        if check_genomic_location(self.chr, self.start, self.end, chr, start, end):
-                            if self.write_properties: 
-                                props = {
-                                    'gene_id': gene_id,
-                                    'transcript_id': transcript_id,
-                                    'chr': chr,
-                                    'start': start,
-                                    'end': end,
-                                    'exon_number': int(info.get('exon_number', -1)), 
-                                    'exon_id': exon_id
-                                }
-                                if self.add_provenance:
-                                    props['source'] = self.source
-                                    props['source_url'] = self.source_url
-                                    
-                            yield exon_id, self.label, props
-                    except:
-                        print(
-                            f'fail to process for label to load: {self.label}, type to load: {self.type}, data: {line}')
+        for record in read_gtf(self.filepath, self.read_regions(), self.chunk):
+            yield from self.process_node_record(record)
 
+    def process_node_record(self, record):
+        if record.type != 'exon':
+            return
+
+        split_line = record.fields
+        info = record.info
+        gene_id = info['gene_id'].split('.')[0]
+        transcript_id = info['transcript_id'].split('.')[0]
+        exon_id = info['exon_id'].split('.')[0]
+        chr = split_line[GencodeExonAdapter.INDEX['chr']]
+        start = int(split_line[GencodeExonAdapter.INDEX['coord_start']])
+        end = int(split_line[GencodeExonAdapter.INDEX['coord_end']])
+        props = {}
+        try:
+            if self.in_region(chr, start, end):
+                if self.write_properties:
+                    props = {
+                        'gene_id': gene_id,
+                        'transcript_id': transcript_id,
+                        'chr': chr,
+                        'start': start,
+                        'end': end,
+                        'exon_number': int(info.get('exon_number', -1)),
+                        'exon_id': exon_id
+                    }
+                    if self.add_provenance:
+                        props['source'] = self.source
+                        props['source_url'] = self.source_url
+
+                yield exon_id, self.label, props
+        except Exception:
+            print(
+                f'fail to process for label to load: {self.label}, data: {record.line}')
@@ -1,6 +1,6 @@
-import gzip
 from biocypher_metta.adapters import Adapter
-from biocypher_metta.adapters.helpers import check_genomic_location
+from biocypher_metta.adapters.gzip_reader import open_gzip
+from biocypher_metta.adapters.readers import parse_gtf_info, read_gtf
 # Example genocde vcf input file:
 # ##description: evidence-based annotation of the human genome (GRCh38), version 42 (Ensembl 108)
 # ##provider: GENCODE
@@ -17,6 +17,8 @@ class GencodeGeneAdapter(Adapter):
     ALLOWED_KEYS = ['gene_id', 'gene_type', 'gene_name',
                     'transcript_id', 'transcript_type', 'transcript_name', 'hgnc_id']
     INDEX = {'chr': 0, 'type': 2, 'coord_start': 3, 'coord_end': 4, 'info': 8}
+    SOURCE_FORMAT = 'gtf'
+    SPLITTABLE = True
 
     def __init__(self, write_properties, add_provenance, filepath=None, 
                  gene_alias_file_path=None, chr=None, start=None, end=None):
@@ -28,6 +30,7 @@ class GencodeGeneAdapter(Adapter):
         self.label = 'gene'
         self.dataset = 'gencode_gene'
         self.gene_alias_file_path = gene_alias_file_path
+        self.alias_dict = None
         self.source = 'GENCODE'
         self.version = 'v44'
         self.source_url = 'https://www.gencodegenes.org/human/'
@@ -35,16 +38,12 @@ class GencodeGeneAdapter(Adapter):
         super(GencodeGeneAdapter, self).__init__(write_properties, add_provenance)
 
     def parse_info_metadata(self, info):
-        parsed_info = {}
-        for key, value in zip(info, info[1:]):
-            if key in GencodeGeneAdapter.ALLOWED_KEYS:
-                parsed_info[key] = value.replace('"', '').replace(';', '')
-        return parsed_info
+        return parse_gtf_info(info, GencodeGeneAdapter.ALLOWED_KEYS)
 
     # the gene alias dict will use both ensembl id and hgnc id as key
     def get_gene_alias(self):
         alias_dict = {}
-        with gzip.open(self.gene_alias_file_path, 'rt') as input:
+        with open_gzip(self.gene_alias_file_path) as input:
             next(input)
             for line in input:
                 (tax_id, gene_id, symbol, locus_tag, synonyms, dbxrefs, chromosome, map_location, description, type_of_gene, symbol_from_nomenclature_authority,
@@ -82,46 +81,48 @@ class GencodeGeneAdapter(Adapter):
         return alias_dict
 
     def get_nodes(self):
-        alias_dict = self.get_gene_alias()
-        with gzip.open(self.filepath, 'rt') as input:
-            for line in input:
-                if line.startswith('#'):
-                    continue
-                split_line = line.strip().split()
-                if split_line[GencodeGeneAdapter.INDEX['type']] == 'gene':
-                    info = self.parse_info_metadata(
-                        split_line[GencodeGeneAdapter.INDEX['info']:])
-                    gene_id = info['gene_id']
-                    id = gene_id.split('.')[0]
-                    alias = alias_dict.get(id)
-                    if not alias:
-                        hgnc_id = info.get('hgnc_id')
-                        if hgnc_id:
-                            alias = alias_dict.get(hgnc_id)
-                    if gene_id.endswith('_PAR_Y'):
-                        id = id + '_PAR_Y'
+        for record in read_gtf(self.filepath, self.read_regions(), self.chunk):
+            yield from self.process_node_record(record)
+
+    def process_node_record(self, record):
+        if record.type != 'gene':
+            return
+        if self.alias_dict is None:
+            self.alias_dict = self.get_gene_alias()
+
+        split_line = record.fields
+        info = record.info
+        gene_id = info['gene_id']
+        id = gene_id.split('.')[0]
+        alias = self.alias_dict.get(id)
+        if not alias:
+            hgnc_id = info.get('hgnc_id')
+            if hgnc_id:
+                alias = self.alias_dict.get(hgnc_id)
+        if gene_id.endswith('_PAR_Y'):
+            id = id + '_PAR_Y'
 
-                    chr = split_line[GencodeGeneAdapter.INDEX['chr']]
-                    start = int(split_line[GencodeGeneAdapter.INDEX['coord_start']])
-                    end = int(split_line[GencodeGeneAdapter.INDEX['coord_end']])
-                    props = {}
-                    try:
-                        if check_genomic_location(self.chr, self.start, self.end, chr, start, end):
-                            if self.write_properties:
-                                props = {
-                                    # 'gene_id': gene_id, # TODO should this be included?
-                                    'gene_type': info['gene_type'],
-                                    'chr': chr,
-                                    'start': start,
-                                    'end': end,
-                                    'gene_name': info['gene_name'],
-                                    'synonyms': alias
-                                }
-                                if self.add_provenance:
-                                    props['source'] = self.source
-                                    props['source_url'] = self.source_url
+        chr = split_line[GencodeGeneAdapter.INDEX['chr']]
+        start = int(split_line[GencodeGeneAdapter.INDEX['coord_start']])
+        end = int(split_line[GencodeGeneAdapter.INDEX['coord_end']])
+        props = {}
+        try:
+            if self.in_region(chr, start, end):
+                if self.write_properties:
+                    props = {
+                        # 'gene_id': gene_id, # TODO should this be included?
+                        'gene_type': info['gene_type'],
+                        'chr': chr,
+                        'start': start,
+                        'end': end,
+                        'gene_name': info['gene_name'],
+                        'synonyms': alias
+                    }
+                    if self.add_provenance:
+                        props['source'] = self.source
+                        props['source_url'] = self.source_url
 
-                            yield id, self.label, props
-                    except:
-                        print(
-                            f'fail to process for label to load: {self.label}, type to load: {self.type}, data: {line}')
+                yield id, self.label, props
+        except Exception:
+            print(
+                f'fail to process for label to load: {self.label}, data: {record.line}')
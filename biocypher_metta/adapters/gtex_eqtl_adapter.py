@@ -2,9 +2,9 @@ import csv
 import os
 import pickle
 from biocypher_metta.adapters import Adapter
-from biocypher_metta.adapters.helpers import to_float, check_genomic_location
+from biocypher_metta.adapters.gzip_reader import open_gzip
+from biocypher_metta.adapters.helpers import to_float
 from biocypher._logger import logger
-import gzip
 
 # Example QTEx eQTL input file:
 # variant_id      gene_id tss_distance    ma_samples      ma_count        maf     pval_nominal    slope   slope_se        pval_nominal_threshold  min_pval_nominal        pval_beta
@@ -60,7 +60,7 @@ class GTExEQTLAdapter(Adapter):
                 tissue_name = file_name.split(".")[0]
                 logger.info(f"Importing tissue: {tissue_name}")
                 if self.tissue_names is None or tissue_name in self.tissue_names:
-                    with gzip.open(os.path.join(self.filepath, file_name), 'rt') as qtl:
+                    with open_gzip(os.path.join(self.filepath, file_name)) as qtl:
                         next(qtl) # skip header
                         qtl_csv = csv.reader(qtl, delimiter='\t')
                         for row in qtl_csv:
@@ -72,7 +72,7 @@ class GTExEQTLAdapter(Adapter):
                                     continue
 
                                 variant_id = row[18]
-                                if check_genomic_location(self.chr, self.start, self.end, chr, pos, pos):
+                                if self.in_region(chr, pos, pos):
                                     _source = variant_id
                                     _target = row[0].split('.')[0]
                                     _props = {}
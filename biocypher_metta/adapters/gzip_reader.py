@@ -0,0 +1,191 @@
+# Gzipped inputs of the adapters, decompressed ahead on a background thread. The compressed file is inflated in
+# large buffers into a bounded queue while the adapter parses the lines of the previous buffers, so decompression
+# (which releases the GIL) overlaps with parsing. The inflate implementation of isal or zlib-ng is used when one is
+# installed, as they are faster than zlib. The readers count the bytes they decompress, for the build metrics.
+import gzip
+import io
+import queue
+import threading
+import zlib
+
+try:
+    from isal import isal_zlib as inflate_lib
+except ImportError:
+    try:
+        from zlib_ng import zlib_ng as inflate_lib
+    except ImportError:
+        inflate_lib = zlib
+
+# Number of compressed bytes read from the file at a time
+READ_SIZE = 1 << 20
+# Minimum number of decompressed bytes per buffer handed to the reader
+BUFFER_SIZE = 4 << 20
+# Number of decompressed buffers decompressed ahead of the reader
+MAX_BUFFERS = 4
+GZIP_MAGIC = b'\x1f\x8b'
+# wbits of a gzip stream with its header and trailer
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+# Number of bytes decompressed by the readers of this process, see build_metrics
+_decompressed_bytes = 0
+
+
+def decompressed_bytes():
+    return _decompressed_bytes
+
+
+def count_decompressed(size):
+    """
+    Add size bytes decompressed outside of open_gzip to the count, e.g. by the chunk readers of input_chunks
+    """
+    global _decompressed_bytes
+    _decompressed_bytes += size
+
+
+def _put(buffers, stop, item):
+    # waits for room in the queue unless the reader is closed
+    while not stop.is_set():
+        try:
+            buffers.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _inflate(file, buffers, stop, read_size, buffer_size):
+    """
+    Decompress the gzip members of file into buffers of at least buffer_size bytes, followed by None at the end
+    of the file or the error that stopped the decompression. Runs on the thread of a ReadAheadReader and doesn't
+    reference it, so a reader that isn't closed can still be garbage collected.
+    """
+    global _decompressed_bytes
+    try:
+        decompressor, started = inflate_lib.decompressobj(GZIP_WBITS), False
+        pending, size = [], 0
+        while not stop.is_set():
+            data = file.read(read_size)
+            if not data:
+                break
+            while data:
+                if not started:
+                    # members can be followed by zero padding
+                    data = data.lstrip(b'\x00')
+                    if not data:
+                        break
+                    if len(data) >= 2 and data[:2] != GZIP_MAGIC:
+                        raise gzip.BadGzipFile(f"Not a gzipped file ({data[:2]!r})")
+                    started = True
+                out = decompressor.decompress(data)
+                if out:
+                    pending.append(out)
+                    size += len(out)
+                if decompressor.eof:
+                    data = decompressor.unused_data
+                    decompressor, started = inflate_lib.decompressobj(GZIP_WBITS), False
+                else:
+                    data = b''
+            if size >= buffer_size:
+                _decompressed_bytes += size
+                if not _put(buffers, stop, b''.join(pending)):
+                    return
+                pending, size = [], 0
+        if stop.is_set():
+            return
+        if started:
+            raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+        _decompressed_bytes += size
+        if pending and not _put(buffers, stop, b''.join(pending)):
+            return
+        _put(buffers, stop, None)
+    except Exception as e:
+        _put(buffers, stop, e)
+    finally:
+        file.close()
+
+
+class ReadAheadReader(io.RawIOBase):
+    """
+    Raw binary stream of the decompressed content of a gzip file, decompressed ahead on a background thread
+    :param filepath: the gzip file, can have several members like the files of bgzip
+    :param max_buffers: number of buffers of at least buffer_size bytes decompressed ahead of the reads
+    """
+    def __init__(self, filepath, read_size=READ_SIZE, buffer_size=BUFFER_SIZE, max_buffers=MAX_BUFFERS):
+        super().__init__()
+        self.name = str(filepath)
+        file = open(filepath, 'rb')
+        self._buffers = queue.Queue(max_buffers)
+        self._stop = threading.Event()
+        self._buffer = memoryview(b'')
+        self._position = 0
+        self._eof = False
+        self._thread = threading.Thread(target=_inflate, args=(file, self._buffers, self._stop, read_size,
+                                                               buffer_size),
+                                        name=f"inflate {self.name}", daemon=True)
+        self._thread.start()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._position >= len(self._buffer):
+            if self._eof:
+                return 0
+            item = self._buffers.get()
+            if item is None:
+                self._eof = True
+                return 0
+            if isinstance(item, Exception):
+                self._eof = True
+                raise item
+            self._buffer, self._position = memoryview(item), 0
+        n = min(len(b), len(self._buffer) - self._position)
+        b[:n] = self._buffer[self._position:self._position + n]
+        self._position += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._buffer = memoryview(b'')
+        super().close()
+
+
+class CountingReader(io.RawIOBase):
+    """
+    Raw binary stream of the decompressed content of a gzip file, decompressed by gzip on the reading thread
+    """
+    def __init__(self, filepath):
+        super().__init__()
+        self.name = str(filepath)
+        self._file = gzip.GzipFile(filepath, 'rb')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        global _decompressed_bytes
+        n = self._file.readinto(b)
+        _decompressed_bytes += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+
+def open_gzip(filepath, mode='rt', encoding=None, errors=None, newline=None, read_ahead=True):
+    """
+    Open a gzip file for reading like gzip.open, decompressing it ahead on a background thread
+    :param mode: 'rt' (or 'r') for text, 'rb' for bytes
+    :param read_ahead: decompress on a background thread, if False the file is decompressed as it is read
+    """
+    if mode not in ('r', 'rt', 'rb'):
+        raise ValueError(f"Invalid mode {mode}, gzip inputs are opened for reading")
+    raw = ReadAheadReader(filepath) if read_ahead else CountingReader(filepath)
+    binary = io.BufferedReader(raw, buffer_size=io.DEFAULT_BUFFER_SIZE * 16)
+    if mode == 'rb':
+        return binary
+    return io.TextIOWrapper(binary, encoding=encoding, errors=errors, newline=newline)
@@ -1,27 +1,39 @@
+from functools import wraps
 from inspect import getfullargspec
 import hashlib
 from math import log10, floor, isinf
-from liftover import get_lifter
+import numpy as np
+from biocypher_metta.genome_liftover import get_lifter, UNMAPPED
+from biocypher_metta.hgvs_normalizer import get_normalizer
 
-import hgvs.dataproviders.uta
-from hgvs.easy import parser
-from hgvs.extras.babelfish import Babelfish
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+    pc = None
 
 ALLOWED_ASSEMBLIES = ['GRCh38']
-_lifters = {}
+
+
+def check_assembly(assembly):
+    if assembly not in ALLOWED_ASSEMBLIES:
+        raise ValueError('Assembly not supported')
 
 
 def assembly_check(id_builder):
-    def wrapper(*args, **kwargs):
-        argspec = getfullargspec(id_builder)
+    # the position of the assembly argument is looked up once, the wrapper runs for every record
+    argspec = getfullargspec(id_builder)
+    assembly_index = argspec.args.index('assembly') if 'assembly' in argspec.args else None
 
-        if 'assembly' in argspec.args:
-            assembly_index = argspec.args.index('assembly')
-            if assembly_index >= len(args):
-                pass
-            elif args[assembly_index] not in ALLOWED_ASSEMBLIES:
-                raise ValueError('Assembly not supported')
-        return id_builder(*args, *kwargs)
+    @wraps(id_builder)
+    def wrapper(*args, **kwargs):
+        if assembly_index is not None:
+            if assembly_index < len(args):
+                check_assembly(args[assembly_index])
+            elif 'assembly' in kwargs:
+                check_assembly(kwargs['assembly'])
+        return id_builder(*args, **kwargs)
 
     return wrapper
 
@@ -29,34 +41,86 @@ def assembly_check(id_builder):
 @assembly_check
 def build_variant_id(chr, pos_first_ref_base, ref_seq, alt_seq, assembly='GRCh38'):
     # pos_first_ref_base: 1-based position
-    key = '{}_{}_{}_{}_{}'.format(str(chr).lower(), pos_first_ref_base, ref_seq, alt_seq, assembly)
+    key = f'{str(chr).lower()}_{pos_first_ref_base}_{ref_seq}_{alt_seq}_{assembly}'
     # return hashlib.sha256(key.encode()).hexdigest()
     return key
 
 @assembly_check
 def build_regulatory_region_id(chr, pos_start, pos_end, assembly='GRCh38'):
     # return '{}_{}_{}_{}_{}'.format(class_name, chr, pos_start, pos_end, assembly)
-    return '{}_{}_{}_{}'.format(chr, pos_start, pos_end, assembly)
+    return f'{chr}_{pos_start}_{pos_end}_{assembly}'
+
+
+def id_column_strings(column):
+    """
+    :return: the values of the column formatted like the f-strings of the scalar id builders, as an Arrow string
+    array for Arrow columns and a NumPy string array otherwise. String and integer arrays are converted in bulk,
+    other values (floats, booleans, missing values) and the values of sequences that aren't arrays, which can mix
+    types, one by one with format, like an f-string.
+    """
+    if pa is not None and isinstance(column, (pa.Array, pa.ChunkedArray)):
+        array = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+        if pa.types.is_string(array.type):
+            return array.fill_null('None') if array.null_count else array
+        if pa.types.is_integer(array.type) and not array.null_count:
+            return array.cast(pa.string())
+        return pa.array([format(v) for v in array.to_pylist()], pa.string())
+    # a sequence of ints and floats would be converted to floats as a whole
+    array = np.asarray(column) if hasattr(column, 'dtype') else np.asarray(column, dtype=object)
+    if array.dtype.kind in 'iuU':
+        return array.astype(str)
+    return np.array([format(v) for v in array], dtype=str)
+
+
+def join_id_columns(columns, assembly, lower_first=False):
+    """
+    Joins the values of each row of the columns and the assembly with '_', in one pass over the columns
+    :param columns: NumPy arrays, Arrow arrays or sequences of the same length
+    :param lower_first: lower case the values of the first column
+    :return: NumPy array of the ids, the ids build_variant_id or build_regulatory_region_id build for each row
+    """
+    arrays = [id_column_strings(column) for column in columns]
+    if pa is not None:
+        arrays = [array if isinstance(array, pa.Array) else pa.array(array, pa.string()) for array in arrays]
+        if lower_first:
+            arrays[0] = pc.utf8_lower(arrays[0])
+        return pc.binary_join_element_wise(*arrays, assembly, '_').to_numpy(zero_copy_only=False)
+
+    if lower_first:
+        arrays[0] = np.char.lower(arrays[0])
+    ids = arrays[0]
+    for array in arrays[1:] + [np.array(assembly)]:
+        ids = np.char.add(np.char.add(ids, '_'), array)
+    return ids.astype(object)
+
+
+def build_variant_ids(chr, pos_first_ref_base, ref_seq, alt_seq, assembly='GRCh38'):
+    """
+    Batch version of build_variant_id, building the ids of columns of variants in one call
+    :return: NumPy array of the ids, as build_variant_id returns them for each row
+    """
+    check_assembly(assembly)
+    return join_id_columns([chr, pos_first_ref_base, ref_seq, alt_seq], assembly, lower_first=True)
+
+
+def build_regulatory_region_ids(chr, pos_start, pos_end, assembly='GRCh38'):
+    """
+    Batch version of build_regulatory_region_id, building the ids of columns of regions in one call
+    :return: NumPy array of the ids, as build_regulatory_region_id returns them for each row
+    """
+    check_assembly(assembly)
+    return join_id_columns([chr, pos_start, pos_end], assembly)
 
 
 @assembly_check
-def build_variant_id_from_hgvs(hgvs_id, validate=True, assembly='GRCh38'):
+def build_variant_id_from_hgvs(hgvs_id, validate=True, assembly='GRCh38', db_url=None, seqrepo_dir=None,
+                               data_provider=None):
     # translate hgvs naming to vcf format e.g. NC_000003.12:g.183917980C>T -> 3_183917980_C_T
     if validate:  # use tools from hgvs, which corrects ref allele if it's wrong
-        # got connection timed out error occasionally, could add a retry function
-        hdp = hgvs.dataproviders.uta.connect()
-        babelfish38 = Babelfish(hdp, assembly_name=assembly)
-        try:
-            chr, pos_start, ref, alt, type = babelfish38.hgvs_to_vcf(
-                parser.parse(hgvs_id))
-        except Exception as e:
-            print(e)
-            return None
-
-        if type == 'sub' or type == 'delins':
-            return build_variant_id(chr, pos_start + 1, ref[1:], alt[1:])
-        else:
-            return build_variant_id(chr, pos_start, ref, alt)
+        # the normalizer reuses its data provider connection and caches the ids on disk. db_url, seqrepo_dir and
+        # data_provider validate offline, see biocypher_metta.hgvs_normalizer
+        return get_normalizer(assembly, db_url=db_url, seqrepo_dir=seqrepo_dir,
+                              data_provider=data_provider).variant_id(hgvs_id)
 
     # if no need to validate/query ref allele (e.g. single position substitutions) -> use regex match is quicker
     else:
@@ -115,34 +179,7 @@ def to_float(str):
     return number
 
 
-def check_genomic_location(chr, start, end,
-                           curr_chr, curr_start, curr_end):
-    """
-    Checks if the curr locations are within the specified locations (chr, start, end)
-    If no chr is specified, then it returns True b/c that means we want to import all chromosomes
-    Used when we want to filter the data imported from a file by location
-    """
-    if chr is None:  # import the data on all chromosomes
-        return True
-    else:  # filter by chromosome and (if specified) by location
-        if chr != curr_chr:
-            return False
-        else:
-            if start and end:
-                if int(curr_start) >= start and int(curr_end) <= end:
-                    return True
-            elif start:
-                if int(curr_start) >= start:
-                    return True
-            elif end:
-                if int(curr_end) <= end:
-                    return True
-            else:
-                return True
-    return False
-
-
-def convert_genome_reference(chr, pos, from_build='hg19', to_build='hg38'):
+def convert_genome_reference(chr, pos, from_build='hg19', to_build='hg38', chain_file=None):
     """
     Convert a genomic coordinate from one reference build to another.
 
@@ -151,25 +188,29 @@ def convert_genome_reference(chr, pos, from_build='hg19', to_build='hg38'):
         to_build (str): The reference build version to convert to (must be 'hg19' or 'hg38', and different from `from_build`).
         chr (str): The chromosome identifier (e.g., 'chr1', 'chrX').
         pos (int): The genomic position on the chromosome.
+        chain_file (str): Path of the chain file, by default the one of the builds in the liftover cache directory.
 
     Returns:
         int: The converted genomic position in the target reference build, or None if the conversion fails.
+        Failed conversions are counted in the `failures` of the lifter, see biocypher_metta.genome_liftover.
     """
-    if from_build not in ['hg19', 'hg38'] or to_build not in ['hg19', 'hg38'] or from_build == to_build:
-        raise ValueError("Invalid reference build versions. 'from_build' and 'to_build' must be different and one of 'hg19' or 'hg38'.")
+    # The lifter of the builds is loaded once and caches the conversions
+    lifter = get_lifter(from_build, to_build, chain_file)
 
-    lifter_key = f"{from_build}_{to_build}"
+    # Convert the chromosome identifier to a format compatible with the chain file
+    chr_no = chr.replace('chr', '').replace('ch', '')
+    return lifter.lift_one(chr_no, pos)
 
-    # Initialize the lifter for the specified build conversion if not already cached
-    if lifter_key not in _lifters:
-        _lifters[lifter_key] = get_lifter(from_build, to_build)
 
-    # Convert the chromosome identifier to a format compatible with the liftover library
-    chr_no = chr.replace('chr', '').replace('ch', '')
+def convert_genome_references(chr, positions, from_build='hg19', to_build='hg38', chain_file=None):
+    """
+    Batch version of convert_genome_reference, converting arrays of positions in one call.
 
-    try:
-        # Perform the liftover conversion using the cached lifter object
-        converted = _lifters[lifter_key].query(chr_no, pos)[0][1]
-        return int(converted)
-    except:
-        return None
\ No newline at end of file
+    Args:
+        chr: The chromosome of all the positions, or an array of the chromosome of each position.
+        positions: Array of genomic positions.
+
+    Returns:
+        numpy.ndarray: The converted positions, UNMAPPED (-1) for those that can't be converted.
+    """
+    return get_lifter(from_build, to_build, chain_file).lift(chr, positions)
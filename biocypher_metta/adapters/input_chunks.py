@@ -0,0 +1,197 @@
+# Splitting of a single large input into chunks parsed independently, e.g. by several worker processes. A chunk is
+# a byte range of the file: for BGZF compressed files (bgzip) the ranges start on block boundaries, so a chunk is
+# decompressed without reading the blocks before it, and for uncompressed files they start anywhere. Plain gzip
+# files can't be split.
+#
+# A chunk yields the lines starting in its byte range, so every line is read by exactly one chunk: the chunk skips
+# the line it starts in the middle of (or at the start of), which the previous chunk reads to its end, including
+# the line starting right at the end of its range.
+import gzip
+import os
+from biocypher._logger import logger
+from biocypher_metta.adapters.gzip_reader import count_decompressed, inflate_lib, open_gzip
+
+BGZF_MAGIC = b'\x1f\x8b\x08\x04'
+# Size of the header of a BGZF block before its extra field
+BGZF_HEADER_SIZE = 12
+# Number of bytes searched for the start of a BGZF block at a time
+SEARCH_SIZE = 1 << 17
+
+
+def is_bgzf(filepath):
+    """
+    :return: whether the file is BGZF compressed, i.e. a gzip file whose first member has the BC extra subfield
+    """
+    with open(filepath, 'rb') as f:
+        header = f.read(16)
+    return len(header) == 16 and header[:4] == BGZF_MAGIC and header[12:14] == b'BC'
+
+
+def is_splittable(filepath):
+    """
+    :return: whether the file can be read in chunks, i.e. it is BGZF compressed or not compressed
+    """
+    with open(filepath, 'rb') as f:
+        magic = f.read(2)
+    return magic != b'\x1f\x8b' or is_bgzf(filepath)
+
+
+def block_size(extra):
+    """
+    :return: the size of a BGZF block from the extra field of its header, None if it has no BC subfield
+    """
+    i = 0
+    while i + 4 <= len(extra):
+        length = int.from_bytes(extra[i + 2:i + 4], 'little')
+        if extra[i:i + 2] == b'BC' and length == 2:
+            return int.from_bytes(extra[i + 4:i + 6], 'little') + 1
+        i += 4 + length
+    return None
+
+
+def is_block_start(f, offset, file_size):
+    """
+    :return: whether a BGZF block starts at offset, checking that another block or the end of the file follows it
+    """
+    f.seek(offset)
+    header = f.read(BGZF_HEADER_SIZE)
+    if len(header) < BGZF_HEADER_SIZE or header[:4] != BGZF_MAGIC:
+        return False
+    size = block_size(f.read(int.from_bytes(header[10:12], 'little')))
+    if size is None or offset + size > file_size:
+        return False
+    if offset + size == file_size:
+        return True
+    f.seek(offset + size)
+    return f.read(4) == BGZF_MAGIC
+
+
+def find_block(f, offset, file_size):
+    """
+    :return: the offset of the first BGZF block starting at or after offset, file_size if there is none
+    """
+    while offset < file_size:
+        f.seek(offset)
+        window = f.read(SEARCH_SIZE + len(BGZF_MAGIC) - 1)
+        i = window.find(BGZF_MAGIC)
+        while i != -1:
+            if is_block_start(f, offset + i, file_size):
+                return offset + i
+            i = window.find(BGZF_MAGIC, i + 1)
+        offset += SEARCH_SIZE
+    return file_size
+
+
+def chunk_range(filepath, index, count):
+    """
+    :return: (start, end) byte range of chunk index of the count chunks of the file, of about the same size
+    """
+    file_size = os.path.getsize(filepath)
+    bounds = [file_size * index // count, file_size * (index + 1) // count]
+    if is_bgzf(filepath):
+        with open(filepath, 'rb') as f:
+            bounds = [offset if offset in (0, file_size) else find_block(f, offset, file_size) for offset in bounds]
+    return bounds[0], bounds[1]
+
+
+def read_blocks(f, offset):
+    """
+    :return: (offset, next block offset, decompressed data) of the BGZF blocks of f from the block at offset
+    """
+    f.seek(offset)
+    while True:
+        header = f.read(BGZF_HEADER_SIZE)
+        if not header:
+            return
+        extra = f.read(int.from_bytes(header[10:12], 'little'))
+        size = block_size(extra) if header[:4] == BGZF_MAGIC else None
+        if size is None:
+            raise gzip.BadGzipFile(f"Not a BGZF block at offset {offset} of {f.name}")
+        data = f.read(size - BGZF_HEADER_SIZE - len(extra))
+        if len(data) < size - BGZF_HEADER_SIZE - len(extra):
+            raise EOFError(f"BGZF block at offset {offset} of {f.name} is truncated")
+        # the data is followed by the CRC32 and size of the decompressed data
+        data = inflate_lib.decompress(data[:-8], -15)
+        count_decompressed(len(data))
+        yield offset, offset + size, data
+        offset += size
+
+
+def decode_lines(data):
+    """
+    :return: the lines of data ending with a newline, decoded with universal newlines like a text file
+    """
+    text = data.decode()
+    if '\r' in text:
+        text = text.replace('\r\n', '\n')
+    lines = text.split('\n')
+    return [line + '\n' for line in lines[:-1]]
+
+
+def read_bgzf_chunk(filepath, start, end, skip_first):
+    with open(filepath, 'rb') as f:
+        pending = []
+        keep = not skip_first
+        for offset, next_offset, data in read_blocks(f, start):
+            first_newline = data.find(b'\n')
+            if first_newline == -1:
+                if keep:
+                    pending.append(data)
+                continue
+            if keep:
+                pending.append(data[:first_newline + 1])
+                yield from decode_lines(b''.join(pending))
+            pending = []
+            # the other lines ending in the block start in it
+            if offset >= end:
+                return
+            last_newline = data.rfind(b'\n')
+            if last_newline > first_newline:
+                yield from decode_lines(data[first_newline + 1:last_newline + 1])
+            if last_newline + 1 < len(data):
+                pending.append(data[last_newline + 1:])
+                keep = True
+            else: # the next line starts at the next block
+                keep = next_offset <= end
+                if not keep:
+                    return
+        last_line = b''.join(pending)
+        if keep and last_line: # without a newline
+            yield last_line.decode()
+
+
+def read_plain_chunk(filepath, start, end, skip_first):
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        position = start
+        if skip_first:
+            position += len(f.readline())
+        while position <= end:
+            line = f.readline()
+            if not line:
+                return
+            position += len(line)
+            if line.endswith(b'\n'):
+                yield from decode_lines(line)
+            else: # last line without a newline
+                yield line.decode()
+
+
+def read_chunk(filepath, chunk):
+    """
+    Lines of a chunk of a text file, gzipped or not
+    :param chunk: (index, count) of the chunk, the file is split into count chunks
+    """
+    index, count = chunk
+    if not is_splittable(filepath):
+        # the first chunk reads the whole file
+        if index == 0:
+            logger.warning(f"{filepath} isn't BGZF compressed and can't be split, reading all of it in one chunk")
+            with open_gzip(filepath) as f:
+                yield from f
+        return
+    start, end = chunk_range(filepath, index, count)
+    if is_bgzf(filepath):
+        yield from read_bgzf_chunk(filepath, start, end, index > 0)
+    else:
+        yield from read_plain_chunk(filepath, start, end, index > 0)
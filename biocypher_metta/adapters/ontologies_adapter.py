@@ -1,7 +1,7 @@
 import rdflib
-from owlready2 import *
 from abc import ABC, abstractmethod
 from biocypher_metta.adapters import Adapter
+from biocypher_metta.adapters.ontology_store import DEFAULT_CACHE_DIR, get_ontology_world
 
 class OntologyAdapter(Adapter):
     HAS_PART = rdflib.term.URIRef('http://purl.obolibrary.org/obo/BFO_0000051')
@@ -23,13 +23,17 @@ class OntologyAdapter(Adapter):
     PREDICATES = [SUBCLASS, DB_XREF]
     RESTRICTION_PREDICATES = [HAS_PART, PART_OF]
 
-    def __init__(self, write_properties, add_provenance, ontology, type, label, dry_run=False):
+    def __init__(self, write_properties, add_provenance, ontology, type, label, dry_run=False, cache_dir=None):
+        """
+        :param cache_dir: directory of the quadstores the ontologies are parsed into, see ontology_store
+        """
         self.type = type
         self.label = label
         self.dry_run = dry_run
         self.graph = None
         self.cache = {}
         self.ontology = ontology
+        self.cache_dir = DEFAULT_CACHE_DIR if cache_dir is None else cache_dir
 
         # Set source and source_url based on the ontology
         self.source, self.source_url = self.get_ontology_source()
@@ -48,8 +52,9 @@ class OntologyAdapter(Adapter):
         if self.ontology not in self.ONTOLOGIES:
             raise ValueError(f"Ontology '{self.ontology}' is not defined in this adapter.")
         
-        onto = get_ontology(self.ONTOLOGIES[self.ontology]).load()
-        self.graph = default_world.as_rdflib_graph()
+        if self.graph is None:
+            # opened once, get_nodes and get_edges share the graph
+            self.graph = get_ontology_world(self.ONTOLOGIES[self.ontology], self.cache_dir).as_rdflib_graph()
         self.clear_cache()
 
     def get_nodes(self):
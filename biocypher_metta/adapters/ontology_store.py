@@ -0,0 +1,96 @@
+# Persistent owlready2 quadstores of the ontologies read by OntologyAdapter. An ontology is parsed from its OWL file
+# once, into an SQLite quadstore in the cache directory keyed by the ontology IRI and the hash of the file, and the
+# adapters of later jobs and builds open the quadstore instead of parsing the file again. The triples are queried
+# from SQLite, so the ontology isn't held in memory.
+#
+# The OWL file is downloaded to the cache directory the first time an ontology is used, unless a copy is found in
+# the owlready2 onto_path. Remove it from the cache directory to use a newer release.
+import hashlib
+import os
+import pathlib
+import urllib.request
+import owlready2
+from biocypher._logger import logger
+from biocypher_metta.build_manifest import hash_file
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+                                 "biocypher-metta", "ontologies")
+STORE_SUFFIX = ".sqlite3"
+
+_worlds = {}
+
+
+def ontology_file_name(iri):
+    return iri.rstrip("/").rsplit("/", 1)[-1]
+
+
+def find_ontology_file(iri, cache_dir):
+    """
+    :return: the local OWL file of the ontology, downloaded to cache_dir if there is none in the owlready2
+    onto_path or cache_dir. An IRI that isn't a URL is the path of the file.
+    """
+    if iri.startswith("file://"):
+        return pathlib.Path(iri[len("file://"):])
+    if not iri.startswith(("http://", "https://")):
+        return pathlib.Path(iri)
+    name = ontology_file_name(iri)
+    for directory in [*owlready2.onto_path, cache_dir]:
+        path = pathlib.Path(directory, name)
+        if path.is_file() and path.stat().st_size > 0:
+            return path
+    path = pathlib.Path(cache_dir, name)
+    logger.info(f"No local copy of the ontology {iri}, downloading it to {path}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        urllib.request.urlretrieve(iri, tmp_path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, path)
+    return path
+
+
+def store_path(iri, source, cache_dir):
+    """
+    :return: the path of the quadstore of the ontology, which changes with the content of its OWL file
+    """
+    key = hashlib.sha256(f"{iri}\n{hash_file(source)}".encode()).hexdigest()[:16]
+    return pathlib.Path(cache_dir, f"{pathlib.Path(ontology_file_name(iri)).stem}-{key}{STORE_SUFFIX}")
+
+
+def build_store(iri, source, path):
+    """
+    Parse the OWL file of the ontology into a new quadstore. It is written next to path and renamed, so jobs
+    building the same store at the same time don't read a partial one.
+    """
+    logger.info(f"Building the quadstore of the ontology {iri} from {source}")
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    world = owlready2.World(filename=str(tmp_path))
+    try:
+        with open(source, "rb") as f:
+            world.get_ontology(iri).load(fileobj=f)
+        world.save()
+    finally:
+        world.close()
+    os.replace(tmp_path, path)
+
+
+def get_ontology_world(iri, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    :param iri: the IRI of the ontology, or the path of its OWL file
+    :param cache_dir: the directory of the quadstores and of the downloaded OWL files
+    :return: the owlready2 World holding only the ontology, opened once per process
+    """
+    # forked workers open their own connection to the quadstore
+    key = (iri, str(cache_dir), os.getpid())
+    if key not in _worlds:
+        cache_dir = pathlib.Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        source = find_ontology_file(iri, cache_dir)
+        path = store_path(iri, source, cache_dir)
+        if not path.is_file():
+            build_store(iri, source, path)
+        _worlds[key] = owlready2.World(filename=str(path), exclusive=False)
+    return _worlds[key]
@@ -1,9 +1,9 @@
 import csv
-import gzip
 import pickle
 
 from biocypher_metta.adapters import Adapter
-from biocypher_metta.adapters.helpers import build_regulatory_region_id, check_genomic_location
+from biocypher_metta.adapters.gzip_reader import open_gzip
+from biocypher_metta.adapters.helpers import build_regulatory_region_ids
 # Example PEREGRINE input files:
 
 # PEREGRINEenhancershg38
@@ -63,7 +63,7 @@ class PEREGRINEAdapter(Adapter):
         
     def get_nodes(self):
         enhancer_info = {}
-        with gzip.open(self.enhancers_file, 'rt') as f:
+        with open_gzip(self.enhancers_file) as f:
             reader = csv.reader(f, delimiter=self.delimiter)
             for line in reader:
                 chr, start, end, enhancer_id = line
@@ -74,19 +74,22 @@ class PEREGRINEAdapter(Adapter):
                 }
 
         source_map = {}
-        with gzip.open(self.source_file, 'rt') as f:
+        with open_gzip(self.source_file) as f:
             for line in f:
                 enhancer_id, source = line.strip().split('\t')
                 source_map[enhancer_id] = source
 
-        for enhancer_id, info in enhancer_info.items():
+        # the ids of all the enhancers are built in one call
+        region_ids = build_regulatory_region_ids([info['chr'] for info in enhancer_info.values()],
+                                                 [info['start'] for info in enhancer_info.values()],
+                                                 [info['end'] for info in enhancer_info.values()])
+        for (enhancer_id, info), enhancer_region_id in zip(enhancer_info.items(), region_ids):
             data_source = source_map[enhancer_id]
             chr = info['chr']
             start = info['start']
             end = info['end']
-            enhancer_region_id = build_regulatory_region_id(chr, start, end)
             props = {}
-            if check_genomic_location(self.chr, self.start, self.end, chr, start, end):
+            if self.in_region(chr, start, end):
                 if self.write_properties:
                     props['id'] = enhancer_id
                     props['chr'] = chr
@@ -101,19 +104,22 @@ class PEREGRINEAdapter(Adapter):
                 yield enhancer_region_id, self.label, props
 
     def get_edges(self):
-        enhancer_id_map = {}
-        with gzip.open(self.enhancers_file, 'rt') as f:
+        ids, chrs, starts, ends = [], [], [], []
+        with open_gzip(self.enhancers_file) as f:
             reader = csv.reader(f, delimiter=self.delimiter)
             for line in reader:
                 id = line[self.INDEX['id']]
                 chr = line[self.INDEX['chr']]
                 start = int(line[self.INDEX['start']])
                 end = int(line[self.INDEX['end']])
-                if check_genomic_location(self.chr, self.start, self.end, chr, start, end):
-                    region_id = build_regulatory_region_id(chr, start, end)
-                    enhancer_id_map[id] = region_id
+                if self.in_region(chr, start, end):
+                    ids.append(id)
+                    chrs.append(chr)
+                    starts.append(start)
+                    ends.append(end)
+        enhancer_id_map = dict(zip(ids, build_regulatory_region_ids(chrs, starts, ends)))
         
-        with gzip.open(self.enhancer_gene_link, 'rt') as f:
+        with open_gzip(self.enhancer_gene_link) as f:
             reader = csv.reader(f, delimiter=self.delimiter)
             next(reader)    # Skip header
             for line in reader:
@@ -0,0 +1,148 @@
+import os
+from Bio import SwissProt
+from biocypher._logger import logger
+from biocypher_metta.adapters.gzip_reader import open_gzip
+from biocypher_metta.adapters.input_chunks import is_bgzf, read_chunk
+from biocypher_metta.adapters.region_filter import alternate_chr_name
+
+try:
+    import pysam
+except ImportError:
+    pysam = None
+
+# Readers shared by adapters that consume the same input file. An adapter declares the format of its input in
+# SOURCE_FORMAT and implements process_node_record/process_edge_record for the records yielded by the reader,
+# so the orchestrator can scan the file once and hand each record to every adapter reading it.
+
+
+def parse_gtf_info(info, allowed_keys=None):
+    """
+    Parses the attributes column of a GTF line (already split on whitespace) into a dict
+    :param info: the tokens of the attributes column
+    :param allowed_keys: the attribute keys to keep, all keys are kept if None
+    """
+    parsed_info = {}
+    for key, value in zip(info, info[1:]):
+        if allowed_keys is None or key in allowed_keys:
+            parsed_info[key] = value.replace('"', '').replace(';', '')
+    return parsed_info
+
+
+# Tabix presets of the indexed readers: column of the start position and whether it is 0-based
+TABIX_PRESETS = {'vcf': (1, False), 'gff': (3, False), 'bed': (1, True)}
+
+
+def open_tabix(filepath, preset):
+    """
+    :return: the tabix indexed file, the index is built next to the file if it has none. None if the file
+    isn't BGZF compressed, the index can't be built (e.g. the file isn't sorted) or opened, or pysam (the tabix
+    extra) isn't installed.
+    """
+    if pysam is None or not str(filepath).endswith('.gz') or not is_bgzf(filepath):
+        return None
+    index_paths = [f'{filepath}.tbi', f'{filepath}.csi']
+    if not any(os.path.exists(p) for p in index_paths):
+        # written next to the index and renamed, so jobs reading the file at the same time never open a partial index
+        tmp_path = f'{filepath}.tbi.{os.getpid()}.tmp'
+        try:
+            pysam.tabix_index(str(filepath), preset=preset, keep_original=True, index=tmp_path)
+            os.replace(tmp_path, index_paths[0])
+            logger.info(f"Built the tabix index of {filepath}")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Couldn't build the tabix index of {filepath}, reading all of it: {e}")
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    try:
+        return pysam.TabixFile(str(filepath))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Couldn't open the tabix index of {filepath}, reading all of it: {e}")
+        return None
+
+
+def read_lines(filepath, regions=None, preset=None, chunk=None):
+    """
+    Lines of a text file, gzipped or not. If regions are given and the file is BGZF compressed, only the lines
+    overlapping the regions are read, using the tabix index of the file which is built on first use. Otherwise all
+    the lines are read, so the lines should still be filtered by region, e.g. with Adapter.in_region.
+    :param regions: (chr, start, end) of the regions, 1-based and inclusive, start or end None if unbounded,
+    see Adapter.read_regions. They can overlap, a line is read once. None to read all the lines.
+    :param preset: the tabix preset of the file format, a key of TABIX_PRESETS
+    :param chunk: (index, count) to only read a chunk of the file, see input_chunks.read_chunk. The regions
+    aren't used to seek in a chunk.
+    """
+    if chunk is not None:
+        yield from read_chunk(filepath, chunk)
+        return
+    tabix = open_tabix(filepath, preset) if regions is not None else None
+    if tabix is None:
+        with open_gzip(filepath) if str(filepath).endswith('.gz') else open(filepath, 'r') as f:
+            yield from f
+        return
+
+    start_column, zero_based = TABIX_PRESETS[preset]
+    with tabix:
+        # read in the order of the file
+        contigs = {contig: i for i, contig in enumerate(tabix.contigs)}
+        contig_regions = []
+        for chr, start, end in regions:
+            contig = chr if chr in contigs else alternate_chr_name(chr)
+            if contig in contigs:
+                contig_regions.append((contig, start, end))
+        previous_contig, previous_end = None, None
+        for contig, start, end in sorted(contig_regions, key=lambda r: (contigs[r[0]], r[1] or 0)):
+            if contig != previous_contig:
+                previous_contig, previous_end = contig, None
+            for line in tabix.fetch(contig, None if start is None else start - 1, end):
+                # a line overlapping this region and a previous one, which ends the furthest, was already read
+                if previous_end is not None:
+                    line_start = int(line.split('\t', start_column + 1)[start_column]) - (0 if zero_based else 1)
+                    if line_start < previous_end:
+                        continue
+                yield line + '\n'
+            end = float('inf') if end is None else end
+            previous_end = end if previous_end is None else max(previous_end, end)
+
+
+class GTFRecord:
+    """
+    A line of a GTF file. The attributes column is only parsed when it is first accessed, so lines of a feature
+    type no consumer is interested in are skipped cheaply.
+    """
+    INDEX = {'chr': 0, 'type': 2, 'coord_start': 3, 'coord_end': 4, 'info': 8}
+
+    __slots__ = ('line', 'fields', '_info')
+
+    def __init__(self, line):
+        self.line = line
+        self.fields = line.strip().split()
+        self._info = None
+
+    @property
+    def type(self):
+        return self.fields[GTFRecord.INDEX['type']]
+
+    @property
+    def info(self):
+        if self._info is None:
+            self._info = parse_gtf_info(self.fields[GTFRecord.INDEX['info']:])
+        return self._info
+
+
+def read_gtf(filepath, regions=None, chunk=None):
+    for line in read_lines(filepath, regions, 'gff', chunk):
+        if line.startswith('#'):
+            continue
+        yield GTFRecord(line)
+
+
+def read_swissprot(filepath):
+    with open_gzip(filepath) as input_file:
+        yield from SwissProt.parse(input_file)
+
+
+SOURCE_READERS = {
+    'gtf': read_gtf,
+    'swissprot': read_swissprot,
+}
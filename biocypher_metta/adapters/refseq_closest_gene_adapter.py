@@ -1,9 +1,9 @@
 # Author Abdulrahman S. Omar <xabush@singularitynet.io>
 from biocypher_metta.adapters import Adapter
+from biocypher_metta.adapters.gzip_reader import open_gzip
 import pickle
 import csv
-import gzip
-from biocypher_metta.adapters.helpers import check_genomic_location, build_regulatory_region_id
+from biocypher_metta.adapters.helpers import build_regulatory_region_id
 from biocypher._logger import logger
 
 #Example RefSeq Closest Gene Data
@@ -34,7 +34,7 @@ class RefSeqClosestGeneAdapter(Adapter):
         super(RefSeqClosestGeneAdapter, self).__init__(write_properties, add_provenance)
 
     def get_edges(self):
-        with gzip.open(self.file_path, "rt") as fp:
+        with open_gzip(self.file_path) as fp:
             next(fp)
             reader = csv.reader(fp, delimiter=",")
             for row in reader:
@@ -42,7 +42,7 @@ class RefSeqClosestGeneAdapter(Adapter):
                     rsid = row[0]
                     chr = row[1]
                     pos = self.dbsnp_rsid_map[rsid]["pos"]
-                    if check_genomic_location(self.chr, self.start, self.end, chr, pos, pos):
+                    if self.in_region(chr, pos, pos):
                         try:
                             source_id = rsid
                             target_id = self.hgnc_to_ensembl_map[(row[7]).strip()]
@@ -0,0 +1,132 @@
+# Filter of nodes and edges by genomic location, restricting a build to a set of regions, e.g. a single window given
+# by the chr, start and end args of an adapter or a panel of loci read from a BED file. The regions of each
+# chromosome are merged into sorted, non overlapping interval arrays, so a query is a binary search.
+import bisect
+import numpy as np
+from biocypher_metta.adapters.gzip_reader import open_gzip
+
+UNBOUNDED_START = int(np.iinfo(np.int64).min)
+UNBOUNDED_END = int(np.iinfo(np.int64).max)
+
+
+def alternate_chr_name(chr):
+    return chr[3:] if chr.startswith("chr") else f"chr{chr}"
+
+
+class RegionFilter:
+    """
+    Regions of the genome, with 1-based inclusive coordinates like the positions of the adapters
+    :param regions: iterable of (chr, start, end), start or end None for a region unbounded on that side
+    :param overlap: keep the entities overlapping a region, instead of those contained in one
+    """
+    def __init__(self, regions, overlap=False):
+        self.overlap = overlap
+        by_chr = {}
+        for chr, start, end in regions:
+            by_chr.setdefault(chr, []).append((UNBOUNDED_START if start is None else int(start),
+                                               UNBOUNDED_END if end is None else int(end)))
+        self.chromosomes = list(by_chr)
+        self.intervals = {}
+        for chr, intervals in by_chr.items():
+            self.intervals[chr] = self.merge(intervals)
+        # chromosomes can be given with or without the chr prefix
+        for chr in list(self.intervals):
+            self.intervals.setdefault(alternate_chr_name(chr), self.intervals[chr])
+
+    @staticmethod
+    def merge(intervals):
+        """
+        :return: the starts and ends of the union of the intervals, sorted and non overlapping, as lists for the
+        queries of single entities and as arrays for the batch queries
+        """
+        intervals = sorted(intervals)
+        starts, ends = [intervals[0][0]], [intervals[0][1]]
+        for start, end in intervals[1:]:
+            if start <= ends[-1] + 1: # adjacent or overlapping
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        return starts, ends, np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+
+    @classmethod
+    def from_args(cls, chr=None, start=None, end=None):
+        """
+        :return: the filter of the chr, start and end args of an adapter, as check_genomic_location applied them,
+        None if chr is None since all the chromosomes are kept
+        """
+        if chr is None:
+            return None
+        # a start or end of 0 never filtered anything
+        return cls([(chr, start or None, end or None)])
+
+    @classmethod
+    def from_bed(cls, path, overlap=False):
+        """
+        :param path: BED file of the regions, gzipped or not. Only the chrom, chromStart and chromEnd columns are
+        read, with the 0-based half-open coordinates of BED.
+        """
+        opener = open_gzip if str(path).endswith(".gz") else open
+        regions = []
+        with opener(path, "rt") as f:
+            for line in f:
+                if not line.strip() or line.startswith(("#", "track", "browser")):
+                    continue
+                fields = line.split("\t") if "\t" in line else line.split()
+                regions.append((fields[0], int(fields[1]) + 1, int(fields[2])))
+        if not regions:
+            raise ValueError(f"No regions in {path}")
+        return cls(regions, overlap)
+
+    def regions(self):
+        """
+        :return: the merged regions as (chr, start, end), start or end None if unbounded
+        """
+        return [(chr, None if start == UNBOUNDED_START else start, None if end == UNBOUNDED_END else end)
+                for chr in self.chromosomes for start, end in zip(*self.intervals[chr][:2])]
+
+    def keep(self, chr, start, end=None):
+        """
+        :return: whether the entity from start to end (inclusive) on chr is in (or overlaps) a region
+        """
+        intervals = self.intervals.get(chr)
+        if intervals is None:
+            return False
+        starts, ends = intervals[0], intervals[1]
+        start = start if type(start) is int else int(start)
+        end = start if end is None else end if type(end) is int else int(end)
+        if self.overlap:
+            i = bisect.bisect_right(starts, end) - 1
+            return i >= 0 and ends[i] >= start
+        i = bisect.bisect_right(starts, start) - 1
+        return i >= 0 and end <= ends[i]
+
+    def keep_all(self, chr, starts, ends=None):
+        """
+        Batch version of keep
+        :param chr: chromosome of all the entities, or an array of the chromosome of each entity
+        :param starts: array of the start positions
+        :param ends: array of the end positions, the start positions if None
+        :return: boolean array, whether each entity is kept
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = starts if ends is None else np.asarray(ends, dtype=np.int64)
+        if isinstance(chr, str):
+            return self._keep_chromosome(chr, starts, ends)
+        chrs = np.asarray(chr)
+        kept = np.zeros(len(starts), dtype=bool)
+        for c in np.unique(chrs):
+            mask = chrs == c
+            kept[mask] = self._keep_chromosome(str(c), starts[mask], ends[mask])
+        return kept
+
+    def _keep_chromosome(self, chr, starts, ends):
+        intervals = self.intervals.get(chr)
+        if intervals is None:
+            return np.zeros(len(starts), dtype=bool)
+        region_starts, region_ends = intervals[2], intervals[3]
+        if self.overlap:
+            i = region_starts.searchsorted(ends, side="right") - 1
+            return (i >= 0) & (region_ends[np.maximum(i, 0)] >= starts)
+        i = region_starts.searchsorted(starts, side="right") - 1
+        return (i >= 0) & (ends <= region_ends[np.maximum(i, 0)])
@@ -1,8 +1,8 @@
 from collections import defaultdict
 import csv
-import gzip
 from biocypher_metta.adapters import Adapter
-from biocypher_metta.adapters.helpers import check_genomic_location
+from biocypher_metta.adapters.gzip_reader import open_gzip
+from biocypher_metta.adapters.readers import read_lines
 
 # Example RNAcentral bed input file:
 # chr1	10244	10273	URS000035F234_9606	0	-	10244	10273	63,125,151	2	19,5	0,24	.	piRNA	PirBase
@@ -16,6 +16,8 @@ from biocypher_metta.adapters.helpers import check_genomic_location
 
 class RNACentralAdapter(Adapter):
     INDEX = {'chr': 0, 'coord_start': 1, 'coord_end': 2, 'id': 3, 'rna_type': 13}
+    # the edges are read from the Rfam file, which has no locations
+    POSITIONAL_OUTPUTS = ('nodes',)
 
     def __init__(self, filepath, rfam_filepath, write_properties, add_provenance, 
                  type = 'non coding rna', label = 'non_coding_rna',
@@ -36,29 +38,28 @@ class RNACentralAdapter(Adapter):
         super(RNACentralAdapter, self).__init__(write_properties, add_provenance)
 
     def get_nodes(self):
-        with gzip.open(self.filepath, 'rt') as input:
-            for line in input:
-                infos = line.split('\t')
-                rna_id = infos[RNACentralAdapter.INDEX['id']].split('_')[0]
-                chr = infos[RNACentralAdapter.INDEX['chr']]
-                start = int(infos[RNACentralAdapter.INDEX['coord_start']].strip())+1 # +1 since it is 0 indexed coordinate
-                end = int(infos[RNACentralAdapter.INDEX['coord_end']].strip())+1
-                props = {}
-                if check_genomic_location(self.chr, self.start, self.end, chr, start, end):
-                    if self.write_properties:
-                        props['chr'] = chr
-                        props['start'] = start
-                        props['end'] = end
-                        props['rna_type'] = infos[RNACentralAdapter.INDEX['rna_type']].strip()
-                    
-                        if self.add_provenance:
-                            props['source'] = self.source
-                            props['source_url'] = self.source_url
+        for line in read_lines(self.filepath, self.read_regions(), 'bed'):
+            infos = line.split('\t')
+            rna_id = infos[RNACentralAdapter.INDEX['id']].split('_')[0]
+            chr = infos[RNACentralAdapter.INDEX['chr']]
+            start = int(infos[RNACentralAdapter.INDEX['coord_start']].strip())+1 # +1 since it is 0 indexed coordinate
+            end = int(infos[RNACentralAdapter.INDEX['coord_end']].strip())+1
+            props = {}
+            if self.in_region(chr, start, end):
+                if self.write_properties:
+                    props['chr'] = chr
+                    props['start'] = start
+                    props['end'] = end
+                    props['rna_type'] = infos[RNACentralAdapter.INDEX['rna_type']].strip()
+                
+                    if self.add_provenance:
+                        props['source'] = self.source
+                        props['source_url'] = self.source_url
 
-                    yield rna_id, self.label, props
+                yield rna_id, self.label, props
 
     def get_edges(self):
-        with gzip.open(self.rfam_filepath, 'rt') as input:
+        with open_gzip(self.rfam_filepath) as input:
             reader = csv.reader(input, delimiter='\t')
             for line in reader:
                 rna_id, go_term, rfam = line
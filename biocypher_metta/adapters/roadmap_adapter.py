@@ -1,10 +1,9 @@
 # Author Abdulrahman S. Omar <xabush@singularitynet.io>
 import csv
-import gzip
 import os.path
 import pickle
 from biocypher_metta.adapters import Adapter
-from biocypher_metta.adapters.helpers import check_genomic_location
+from biocypher_metta.adapters.gzip_reader import open_gzip
 # Example roadmap csv input files
 # rsid,dataset,cell,tissue,datatype
 # rs10,erc2-DHS,"E050 Primary hematopoietic stem cells G-CSF-mobili",Blood,"DNase I Hotspot"
@@ -48,7 +47,7 @@ class RoadMapAdapter(Adapter):
     def get_nodes(self):
 
         for file_name in os.listdir(self.filepath):
-            with gzip.open(os.path.join(self.filepath, file_name), "rt") as fp:
+            with open_gzip(os.path.join(self.filepath, file_name)) as fp:
                 next(fp)
                 reader = csv.reader(fp, delimiter=',')
                 for row in reader:
@@ -58,7 +57,7 @@ class RoadMapAdapter(Adapter):
                         pos = self.dbsnp_rsid_map[_id]["pos"]
                         tissue = row[RoadMapAdapter.INDEX['tissue']].replace('"', '').replace("'", '')
                         biological_context = self.tissue_to_ontology_id_map.get(tissue, None)
-                        if check_genomic_location(self.chr, self.start, self.end, chr, pos, pos):
+                        if self.in_region(chr, pos, pos):
                             _props = {}
                             if biological_context == None:
                                 print(f"{tissue} not found in ontology map skipping...")
@@ -1,8 +1,8 @@
 # Author Abdulrahman S. Omar <xabush@singularitynet.io>
 from biocypher_metta.adapters import Adapter
+from biocypher_metta.adapters.gzip_reader import open_gzip
 import pickle
 import csv
-import gzip
 
 # Imports STRING Protein-Protein interactions
 
@@ -35,7 +35,7 @@ class StringPPIAdapter(Adapter):
         super(StringPPIAdapter, self).__init__(write_properties, add_provenance)
 
     def get_edges(self):
-        with gzip.open(self.filepath, "rt") as fp:
+        with open_gzip(self.filepath) as fp:
             table = csv.reader(fp, delimiter=" ", quotechar='"')
             table.__next__() # skip header
             for row in table:
@@ -1,8 +1,8 @@
 # Author Abdulrahman S. Omar <xabush@singularitynet.io>
 from biocypher_metta.adapters import Adapter
+from biocypher_metta.adapters.gzip_reader import open_gzip
 import pickle
 import csv
-import gzip
 
 # Transcription factor - target gene relationships from TFLink
 
@@ -34,7 +34,7 @@ class TFLinkAdapter(Adapter):
         super(TFLinkAdapter, self).__init__(write_properties, add_provenance)
 
     def get_edges(self):
-        with gzip.open(self.filepath, 'rt') as fp:
+        with open_gzip(self.filepath) as fp:
             table = csv.reader(fp, delimiter="\t", quotechar='"')
             for row in table:
                 tf_entrez_id = row[TFLinkAdapter.INDEX['NCBI.GeneID.TF']]
@@ -1,9 +1,9 @@
 import csv
-import gzip
 import json
 import os
 from biocypher_metta.adapters import Adapter
-from biocypher_metta.adapters.helpers import build_variant_id, to_float, check_genomic_location
+from biocypher_metta.adapters.gzip_reader import open_gzip
+from biocypher_metta.adapters.helpers import build_variant_id, to_float
 from biocypher._logger import logger
 
 
@@ -33,15 +33,15 @@ class TopLDAdapter(Adapter):
         super(TopLDAdapter, self).__init__(write_properties, add_provenance)
 
     def get_edges(self):
-        with gzip.open(self.file_path, 'rt') as f:
+        with open_gzip(self.file_path) as f:
             reader = csv.reader(f)
             next(reader)
             for row in reader:
                 try:
                     var1_pos = int(row[TopLDAdapter.INDEX['SNP1']])
                     var2_pos = int(row[TopLDAdapter.INDEX['SNP2']])
-                    if not check_genomic_location(self.chr, self.start, self.end, self.chr, var1_pos, var1_pos) or \
-                            not check_genomic_location(self.chr, self.start, self.end, self.chr, var2_pos, var2_pos):
+                    if not self.in_region(self.chr, var1_pos, var1_pos) or \
+                            not self.in_region(self.chr, var2_pos, var2_pos):
                         continue
                     rsid_1 = self.dbsnp_pos_map.get(f"{self.chr}_{var1_pos}", None)
                     rsid_2 = self.dbsnp_pos_map.get(f"{self.chr}_{var2_pos}", None)
@@ -5,8 +5,10 @@ class UberonAdapter(OntologyAdapter):
         'uberon': 'http://purl.obolibrary.org/obo/uberon.owl'
     }
 
-    def __init__(self, write_properties, add_provenance, ontology, type, label='uberon', dry_run=False):
-        super(UberonAdapter, self).__init__(write_properties, add_provenance, ontology, type, label, dry_run)
+    def __init__(self, write_properties, add_provenance, ontology, type, label='uberon', dry_run=False,
+                 cache_dir=None):
+        super(UberonAdapter, self).__init__(write_properties, add_provenance, ontology, type, label, dry_run,
+                                            cache_dir)
     
     def get_ontology_source(self):
         """
@@ -1,6 +1,5 @@
-import gzip
-from Bio import SeqIO
 from biocypher_metta.adapters import Adapter
+from biocypher_metta.adapters.readers import read_swissprot
 
 # Data file is uniprot_sprot_human.dat.gz and uniprot_trembl_human.dat.gz at https://ftp.uniprot.org/pub/databases/uniprot/current_release/knowledgebase/taxonomic_divisions/.
 # We can use SeqIO from Bio to read the file.
@@ -12,6 +11,7 @@ class UniprotAdapter(Adapter):
 
     ALLOWED_TYPES = ['translates to', 'translation of']
     ALLOWED_LABELS = ['translates_to', 'translation_of']
+    SOURCE_FORMAT = 'swissprot'
 
     def __init__(self, filepath, type, label,
                  write_properties, add_provenance):
@@ -30,45 +30,58 @@ class UniprotAdapter(Adapter):
 
         super(UniprotAdapter, self).__init__(write_properties, add_provenance)
 
+    def get_dbxrefs(self, record):
+        # same cross references as the dbxrefs of the SeqRecord built by SeqIO's 'swiss' parser
+        dbxrefs = []
+        for cross_reference in record.cross_references:
+            if len(cross_reference) < 2:
+                continue
+            dbxref = f'{cross_reference[0]}:{cross_reference[1]}'
+            if dbxref not in dbxrefs:
+                dbxrefs.append(dbxref)
+        return dbxrefs
+
     def get_edges(self):
-        with gzip.open(self.filepath, 'rt') as input_file:
-            records = SeqIO.parse(input_file, 'swiss')
-            for record in records:
-                if self.type == 'translates to':
-                    dbxrefs = record.dbxrefs
-                    for item in dbxrefs:
-                        if item.startswith('Ensembl') and 'ENST' in item:
-                            try:
-                                ensg_id = item.split(':')[-1].split('.')[0]
-                                _id = record.id + '_' + ensg_id
-                                _source = ensg_id
-                                _target = record.id
-                                _props = {}
-                                if self.write_properties and self.add_provenance:
-                                    _props['source'] = self.source
-                                    _props['source_url'] = self.source_url
-                                yield _source, _target, self.label, _props
+        for record in read_swissprot(self.filepath):
+            yield from self.process_edge_record(record)
+
+    def process_edge_record(self, record):
+        record_id = record.accessions[0]
+        if self.type == 'translates to':
+            dbxrefs = self.get_dbxrefs(record)
+            for item in dbxrefs:
+                if item.startswith('Ensembl') and 'ENST' in item:
+                    try:
+                        ensg_id = item.split(':')[-1].split('.')[0]
+                        _id = record_id + '_' + ensg_id
+                        _source = ensg_id
+                        _target = record_id
+                        _props = {}
+                        if self.write_properties and self.add_provenance:
+                            _props['source'] = self.source
+                            _props['source_url'] = self.source_url
+                        yield _source, _target, self.label, _props
 
-                            except:
-                                print(
-                                    f'fail to process for edge translates to: {record.id}')
-                                pass
-                elif self.type == 'translation of':
-                    dbxrefs = record.dbxrefs
-                    for item in dbxrefs:
-                        if item.startswith('Ensembl') and 'ENST' in item:
-                            try:
-                                ensg_id = item.split(':')[-1].split('.')[0]
-                                _id = ensg_id + '_' + record.id
-                                _target = ensg_id
-                                _source = record.id
-                                _props = {}
-                                if self.write_properties and self.add_provenance:
-                                    _props['source'] = self.source
-                                    _props['source_url'] = self.source_url
-                                yield  _source, _target, self.label, _props
+                    except Exception:
+                        print(
+                            f'fail to process for edge translates to: {record_id}')
+                        pass
+        elif self.type == 'translation of':
+            dbxrefs = self.get_dbxrefs(record)
+            for item in dbxrefs:
+                if item.startswith('Ensembl') and 'ENST' in item:
+                    try:
+                        ensg_id = item.split(':')[-1].split('.')[0]
+                        _id = ensg_id + '_' + record_id
+                        _target = ensg_id
+                        _source = record_id
+                        _props = {}
+                        if self.write_properties and self.add_provenance:
+                            _props['source'] = self.source
+                            _props['source_url'] = self.source_url
+                        yield  _source, _target, self.label, _props
 
-                            except:
-                                print(
-                                    f'fail to process for edge translation of: {record.id}')
-                                pass
+                    except Exception:
+                        print(
+                            f'fail to process for edge translation of: {record_id}')
+                        pass
@@ -1,8 +1,7 @@
-import gzip
 import json
 import os
 from biocypher_metta.adapters import Adapter
-from Bio import SwissProt
+from biocypher_metta.adapters.readers import read_swissprot
 
 
 # Data file is uniprot_sprot_human.dat.gz and uniprot_trembl_human.dat.gz at https://ftp.uniprot.org/pub/databases/uniprot/current_release/knowledgebase/taxonomic_divisions/.
@@ -13,6 +12,7 @@ from Bio import SwissProt
 
 class UniprotProteinAdapter(Adapter):
    # ALLOWED_SOURCES = ['UniProtKB/Swiss-Prot', 'UniProtKB/TrEMBL']
+    SOURCE_FORMAT = 'swissprot'
 
     def __init__(self, filepath, write_properties, add_provenance):
         self.filepath = filepath
@@ -44,19 +44,20 @@ class UniprotProteinAdapter(Adapter):
         return sorted(list(set(dbxrefs)), key=str.casefold)
 
     def get_nodes(self):
-        with gzip.open(self.filepath, 'rt') as input_file:
-            records = SwissProt.parse(input_file)
-            for record in records:
-                dbxrefs = self.get_dbxrefs(record.cross_references)
-                id = record.accessions[0]
-                props = {}
-                if self.write_properties:
-                    props = {
-                        'accessions': record.accessions[1:] if len(record.accessions) > 1 else record.accessions[0],
-                        'protein_name': record.entry_name.split('_')[0],
-                        'synonyms': dbxrefs
-                    }
-                    if self.add_provenance:
-                        props['source'] = self.source
-                        props['source_url'] = self.source_url
-                yield id, self.label, props
+        for record in read_swissprot(self.filepath):
+            yield from self.process_node_record(record)
+
+    def process_node_record(self, record):
+        dbxrefs = self.get_dbxrefs(record.cross_references)
+        id = record.accessions[0]
+        props = {}
+        if self.write_properties:
+            props = {
+                'accessions': record.accessions[1:] if len(record.accessions) > 1 else record.accessions[0],
+                'protein_name': record.entry_name.split('_')[0],
+                'synonyms': dbxrefs
+            }
+            if self.add_provenance:
+                props['source'] = self.source
+                props['source_url'] = self.source_url
+        yield id, self.label, props
@@ -0,0 +1,194 @@
+# Benchmarks of the adapters and of MeTTaWriter over the sample files in samples/, used by
+# scripts/benchmark_adapters.py. Everything runs locally on the files referenced by the adapters config.
+import importlib
+import json
+import os
+import pickle
+import time
+import tracemalloc
+from biocypher._logger import logger
+from biocypher_metta.build_manifest import list_input_files
+from biocypher_metta.dbsnp_index import DbsnpIndex
+
+MODES = ["adapter", "writer"]
+
+
+def load_dbsnp_maps(dbsnp_rsids=None, dbsnp_pos=None, dbsnp_index=None):
+    if dbsnp_index is not None:
+        index = DbsnpIndex(dbsnp_index)
+        return index.rsid_map(), index.pos_map()
+    rsid_map = pickle.load(open(dbsnp_rsids, "rb")) if dbsnp_rsids is not None else None
+    pos_map = pickle.load(open(dbsnp_pos, "rb")) if dbsnp_pos is not None else None
+    return rsid_map, pos_map
+
+
+def missing_requirements(config, dbsnp_maps):
+    """
+    :return: why the entry can't be benchmarked, or None if it can
+    """
+    args = config["adapter"]["args"]
+    for key, value in zip(["dbsnp_rsid_map", "dbsnp_pos_map"], dbsnp_maps):
+        if key in args and value is None:
+            return f"needs {key}"
+    for value in args.values():
+        if isinstance(value, str) and os.path.sep in value and not os.path.exists(value):
+            return f"{value} not found"
+    return None
+
+
+def create_adapter(config, dbsnp_maps):
+    adapter_module = importlib.import_module(config["adapter"]["module"])
+    adapter_cls = getattr(adapter_module, config["adapter"]["cls"])
+    ctr_args = dict(config["adapter"]["args"])
+    for key, value in zip(["dbsnp_rsid_map", "dbsnp_pos_map"], dbsnp_maps):
+        if key in ctr_args:
+            ctr_args[key] = value
+    ctr_args["write_properties"] = True
+    ctr_args["add_provenance"] = True
+    return adapter_cls(**ctr_args)
+
+
+def entity_streams(config, adapter):
+    streams = []
+    if config["nodes"]:
+        streams.append(("nodes", adapter.get_nodes))
+    if config["edges"]:
+        streams.append(("edges", adapter.get_edges))
+    return streams
+
+
+def time_adapter(config, dbsnp_maps):
+    adapter = create_adapter(config, dbsnp_maps)
+    records = 0
+    start = time.perf_counter()
+    for _, get_entities in entity_streams(config, adapter):
+        for _ in get_entities():
+            records += 1
+    return records, time.perf_counter() - start, 0
+
+
+def time_writer(config, dbsnp_maps, writer, path_prefix):
+    adapter = create_adapter(config, dbsnp_maps)
+    records = 0
+    output_bytes = 0
+    start = time.perf_counter()
+    sinks = []
+    for kind, get_entities in entity_streams(config, adapter):
+        write = writer.write_nodes if kind == "nodes" else writer.write_edges
+        sinks.append(write(get_entities(), path_prefix=path_prefix))
+    elapsed = time.perf_counter() - start
+    for sink in sinks:
+        records += sink.records
+        output_bytes += os.path.getsize(sink.file_path)
+        os.remove(sink.file_path)
+    return records, elapsed, output_bytes
+
+
+def measure_allocations(config, dbsnp_maps):
+    """
+    Run the adapter under tracemalloc and return the mean number of bytes allocated while producing a record,
+    i.e. the peak of traced memory above the level at the start of the record. CPython doesn't count allocations,
+    this is the closest per-record measure it exposes.
+    """
+    adapter = create_adapter(config, dbsnp_maps)
+    records = 0
+    allocated = 0
+    tracemalloc.start()
+    try:
+        for _, get_entities in entity_streams(config, adapter):
+            entities = get_entities()
+            while True:
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                try:
+                    next(entities)
+                except StopIteration:
+                    break
+                _, peak = tracemalloc.get_traced_memory()
+                allocated += peak - before
+                records += 1
+    finally:
+        tracemalloc.stop()
+    return allocated / records if records else None
+
+
+def run_benchmarks(adapters_dict, writer, dbsnp_maps, repeat=3, allocations=True):
+    """
+    Benchmark every entry of the adapters config, alone (mode 'adapter') and written through the writer
+    (mode 'writer'). Times are the best of `repeat` runs.
+    :param writer: MeTTaWriter writing to a scratch directory, the outputs are removed after each run
+    :return: dict of results by entry name and mode
+    """
+    results = {}
+    for name, config in adapters_dict.items():
+        reason = missing_requirements(config, dbsnp_maps)
+        if reason is not None:
+            logger.info(f"Skipping {name}: {reason}")
+            continue
+        logger.info(f"Benchmarking {name}")
+        input_bytes = sum(os.path.getsize(f) for f in list_input_files(config["adapter"]["args"]))
+        allocated = measure_allocations(config, dbsnp_maps) if allocations else None
+        results[name] = {}
+        for mode in MODES:
+            best = None
+            for _ in range(repeat):
+                if mode == "adapter":
+                    records, elapsed, output_bytes = time_adapter(config, dbsnp_maps)
+                else:
+                    records, elapsed, output_bytes = time_writer(config, dbsnp_maps, writer, name)
+                if best is None or elapsed < best[1]:
+                    best = (records, elapsed, output_bytes)
+            records, elapsed, output_bytes = best
+            results[name][mode] = {
+                "records": records,
+                "seconds": elapsed,
+                "records_per_sec": records / elapsed if elapsed > 0 else None,
+                "input_bytes_per_sec": input_bytes / elapsed if elapsed > 0 else None,
+                "output_bytes_per_sec": output_bytes / elapsed if mode == "writer" and elapsed > 0 else None,
+                "alloc_bytes_per_record": allocated,
+            }
+    return results
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    :return: (name, mode, baseline rate, current rate) of every benchmark whose records/sec dropped more than
+    tolerance (a fraction) below its baseline
+    """
+    regressions = []
+    for name, modes in results.items():
+        for mode, result in modes.items():
+            base = baseline.get(name, {}).get(mode)
+            if base is None or not base.get("records_per_sec") or result["records_per_sec"] is None:
+                continue
+            if result["records_per_sec"] < base["records_per_sec"] * (1 - tolerance):
+                regressions.append((name, mode, base["records_per_sec"], result["records_per_sec"]))
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def format_results(results, baseline=None):
+    header = ["entry", "mode", "records", "records/s", "in MB/s", "out MB/s", "alloc B/rec", "vs baseline"]
+    rows = []
+    for name, modes in results.items():
+        for mode, r in modes.items():
+            base = (baseline or {}).get(name, {}).get(mode, {}).get("records_per_sec")
+            change = f"{(r['records_per_sec'] / base - 1) * 100:+.1f}%" if base and r["records_per_sec"] else "-"
+            rows.append([name, mode, str(r["records"]),
+                         f"{r['records_per_sec']:.0f}" if r["records_per_sec"] else "-",
+                         f"{r['input_bytes_per_sec'] / 1e6:.2f}" if r["input_bytes_per_sec"] else "-",
+                         f"{r['output_bytes_per_sec'] / 1e6:.2f}" if r["output_bytes_per_sec"] else "-",
+                         f"{r['alloc_bytes_per_record']:.0f}" if r["alloc_bytes_per_record"] is not None else "-",
+                         change])
+    widths = [max(len(r[i]) for r in [header] + rows) for i in range(len(header))]
+    return "\n".join("  ".join(c.ljust(w) if i < 2 else c.rjust(w) for i, (c, w) in enumerate(zip(r, widths)))
+                     for r in [header] + rows)
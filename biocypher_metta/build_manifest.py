@@ -0,0 +1,117 @@
+# Build manifest used for incremental rebuilds. For every adapters config entry it records a fingerprint of
+# everything the entry's output depends on: the input files (size, mtime and content hash), the constructor
+# args, the write_properties/add_provenance flags, the schema config, the writer options changing the output and
+# the adapter source. An entry whose fingerprint didn't change since the last build doesn't need to be rerun.
+import hashlib
+import importlib.util
+import json
+import os
+from biocypher._logger import logger
+
+MANIFEST_FILE = "build_manifest.json"
+
+
+def hash_file(path, block_size=16 * 1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def list_input_files(args):
+    """
+    :return: the sorted paths of all files referenced by the constructor args, directories are walked
+    """
+    files = set()
+    for value in args.values():
+        if not isinstance(value, (str, os.PathLike)) or not os.path.exists(value):
+            continue
+        if os.path.isdir(value):
+            for root, _, file_names in os.walk(value):
+                files.update(os.path.join(root, f) for f in file_names)
+        else:
+            files.add(str(value))
+    return sorted(files)
+
+
+class BuildManifest:
+    """
+    :param output_dir: the output directory of the build, the manifest is kept in it
+    """
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, MANIFEST_FILE)
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                self.entries = json.load(f).get("entries", {})
+        # content hashes of the previous build, reused for files whose size and mtime didn't change
+        self._known_hashes = {}
+        for entry in self.entries.values():
+            for file in entry["inputs"]:
+                self._known_hashes[(file["path"], file["size"], file["mtime"])] = file["sha256"]
+
+    def describe_file(self, path):
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        if key not in self._known_hashes:
+            logger.info(f"Hashing {path}")
+            self._known_hashes[key] = hash_file(path)
+        return {"path": path, "size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": self._known_hashes[key]}
+
+    def fingerprint(self, config, write_properties, add_provenance, schema_hash, substitutions=None, sampling=None,
+                    regions=None, writer_options=None):
+        """
+        Compute the fingerprint of an adapters config entry
+        :param substitutions: values to use instead of args set by the build script, e.g. the path of the dbsnp
+        map instead of the None placeholder in the config
+        :param sampling: the (sample_size, sample_fraction) of the build
+        :param regions: the (hash of the regions file, overlap) the build is restricted to
+        :param writer_options: the writer options changing the content of the output files, e.g. the provenance mode
+        """
+        args = dict(config["adapter"]["args"])
+        for k, v in (substitutions or {}).items():
+            if k in args:
+                args[k] = v
+        args = {k: str(v) if isinstance(v, os.PathLike) else v for k, v in args.items()}
+
+        module_spec = importlib.util.find_spec(config["adapter"]["module"])
+        inputs = [self.describe_file(f) for f in list_input_files(args)]
+        fingerprint = {
+            "adapter": {"module": config["adapter"]["module"], "cls": config["adapter"]["cls"],
+                        "sha256": hash_file(module_spec.origin)},
+            "args": args,
+            "inputs": inputs,
+            "outdir": config["outdir"],
+            "nodes": config["nodes"],
+            "edges": config["edges"],
+            "write_properties": write_properties,
+            "add_provenance": add_provenance,
+            "schema_config": schema_hash,
+        }
+        if sampling is not None and any(v is not None for v in sampling):
+            fingerprint["sampling"] = list(sampling)
+        if regions is not None:
+            fingerprint["regions"] = list(regions)
+        if writer_options:
+            fingerprint["writer_options"] = dict(writer_options)
+        if "chunk" in config: # the chunk of the input the entry reads, see Adapter.set_chunk
+            fingerprint["chunk"] = list(config["chunk"])
+        # sizes and mtimes only serve to skip rehashing, touching an input doesn't make its entry stale
+        content = dict(fingerprint, inputs=[(f["path"], f["sha256"]) for f in inputs])
+        fingerprint["digest"] = hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+        return fingerprint
+
+    def is_unchanged(self, name, fingerprint):
+        entry = self.entries.get(name)
+        return entry is not None and entry["digest"] == fingerprint["digest"]
+
+    def record(self, name, fingerprint):
+        self.entries[name] = fingerprint
+
+    def forget(self, name):
+        self.entries.pop(name, None)
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump({"entries": self.entries}, f, indent=2, sort_keys=True, default=str)
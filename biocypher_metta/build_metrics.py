@@ -0,0 +1,142 @@
+# Throughput and resource metrics of the adapters run by create_knowledge_graph.py
+import csv
+import json
+import os
+import resource
+import time
+from biocypher_metta.adapters import gzip_reader
+
+METRICS_JSON = "build_metrics.json"
+METRICS_CSV = "build_metrics.csv"
+FIELDS = ["entry", "job", "wall_time", "cpu_time", "peak_rss", "bytes_read", "bytes_decompressed", "records",
+          "lines_written", "bytes_written", "parse_time", "serialize_time", "parse_rate", "serialize_rate"]
+
+
+def decompressed_bytes():
+    """
+    :return: bytes decompressed by this process, counted by the readers of gzip_reader
+    """
+    return gzip_reader.decompressed_bytes()
+
+
+def read_chars():
+    """
+    :return: bytes read by this process through read syscalls, None if not available on this platform
+    """
+    try:
+        with open("/proc/self/io", "r") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def reset_peak_rss():
+    # resets VmHWM on Linux, so the peak RSS of each job can be measured in a long lived worker
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss():
+    """
+    :return: peak resident set size in bytes since the last reset_peak_rss
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ResourceMonitor:
+    """
+    Measures the wall time, CPU time, peak RSS and input bytes of the code run in the with block in this process
+    """
+    def __enter__(self):
+        reset_peak_rss()
+        self.start_read = read_chars()
+        self.start_decompressed = decompressed_bytes()
+        self.start_cpu = time.process_time()
+        self.start_wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.wall_time = time.perf_counter() - self.start_wall
+        self.cpu_time = time.process_time() - self.start_cpu
+        self.peak_rss = peak_rss()
+        end_read = read_chars()
+        self.bytes_read = None if end_read is None else end_read - self.start_read
+        self.bytes_decompressed = decompressed_bytes() - self.start_decompressed
+
+    def as_dict(self):
+        return {"wall_time": self.wall_time, "cpu_time": self.cpu_time, "peak_rss": self.peak_rss,
+                "bytes_read": self.bytes_read, "bytes_decompressed": self.bytes_decompressed}
+
+
+def sink_counts(sinks):
+    return {"records": sum(s.records for s in sinks), "lines_written": sum(s.lines for s in sinks),
+            "serialize_time": sum(s.write_time for s in sinks)}
+
+
+def entry_metrics(name, job, usage, counts, parse_time, bytes_written):
+    """
+    Combine the measurements of a config entry. The resource usage and the parse time are those of the whole job,
+    which is shared by the entries of a shared scan.
+    :param usage: ResourceMonitor.as_dict() of the job
+    :param counts: sink_counts() of the entry's sinks
+    :param parse_time: time spent reading and parsing the input, i.e. producing the records
+    """
+    metrics = {"entry": name, "job": ",".join(job), **usage, **counts,
+               "bytes_written": bytes_written, "parse_time": parse_time}
+    metrics["parse_rate"] = counts["records"] / parse_time if parse_time > 0 else None
+    metrics["serialize_rate"] = counts["records"] / counts["serialize_time"] if counts["serialize_time"] > 0 else None
+    return metrics
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def write_report(output_dir, metrics):
+    """
+    Write the metrics of the entries to build_metrics.json and build_metrics.csv in the output directory
+    :param metrics: list of entry_metrics() dicts
+    """
+    with open(os.path.join(output_dir, METRICS_JSON), "w") as f:
+        json.dump(metrics, f, indent=2)
+    with open(os.path.join(output_dir, METRICS_CSV), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(metrics)
+
+
+def _human(n, suffix="", units=("", "K", "M", "G", "T")):
+    if n is None:
+        return "-"
+    for unit in units[:-1]:
+        if abs(n) < 1000:
+            return (f"{n:.0f}" if unit == "" else f"{n:.1f}{unit}") + suffix
+        n /= 1000
+    return f"{n:.1f}{units[-1]}{suffix}"
+
+
+def format_summary(metrics):
+    """
+    :return: a table of the main metrics of every entry, slowest first
+    """
+    header = ["entry", "wall", "cpu", "peak rss", "read", "records", "written", "parse/s", "serialize/s"]
+    rows = [[m["entry"], f"{m['wall_time']:.1f}s", f"{m['cpu_time']:.1f}s", _human(m["peak_rss"], "B"),
+             _human(m["bytes_read"], "B"), _human(m["records"]), _human(m["bytes_written"], "B"),
+             _human(m["parse_rate"]), _human(m["serialize_rate"])]
+            for m in sorted(metrics, key=lambda m: m["wall_time"], reverse=True)]
+    widths = [max(len(r[i]) for r in [header] + rows) for i in range(len(header))]
+    lines = ["  ".join(c.ljust(w) if i == 0 else c.rjust(w) for i, (c, w) in enumerate(zip(r, widths)))
+             for r in [header] + rows]
+    return "\n".join(lines)
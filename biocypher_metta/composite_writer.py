@@ -0,0 +1,188 @@
+# Writes the nodes and edges of a single adapter pass in several output formats. Every entity is handed to a sink
+# of each format, optionally running the encoding of each format in its own thread or process.
+import multiprocessing
+import queue
+import threading
+import time
+from biocypher._logger import logger
+
+# Entities handed to a format's thread or process at once
+DEFAULT_BATCH_SIZE = 1000
+# Batches queued per format before the producer waits for the format to catch up
+MAX_PENDING_BATCHES = 16
+
+PARALLELISM = ["none", "thread", "process"]
+
+
+class CompositeSink:
+    """
+    Sink writing every entity to the sinks of several formats. Counts the entities once, and the lines and the
+    time spent writing over all the formats.
+    """
+    def __init__(self, sinks):
+        self.sinks = sinks
+        self.file_path = sinks[0].file_path
+        self.records = 0
+
+    def write(self, entity):
+        for sink in self.sinks:
+            sink.write(entity)
+        self.records += 1
+
+    @property
+    def lines(self):
+        return sum(s.lines for s in self.sinks)
+
+    @property
+    def write_time(self):
+        return sum(s.write_time for s in self.sinks)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class QueuedSink:
+    """
+    Sink handing the entities in batches to another sink running in a thread or a forked process. write_time is the
+    time the producer spent handing over the entities, including waiting for a full queue, so it is still the time
+    the producer didn't spend producing. lines counts the lines of the other sink and is only known once closed.
+    :param open_sink: function opening the sink, called in the thread or process
+    :param parallelism: 'thread' or 'process'
+    """
+    def __init__(self, open_sink, parallelism, batch_size=DEFAULT_BATCH_SIZE, max_pending=MAX_PENDING_BATCHES):
+        self.batch_size = batch_size
+        self.batch = []
+        self.records = 0
+        self.lines = 0
+        self.write_time = 0.0
+        if parallelism == "thread":
+            self.queue = queue.Queue(max_pending)
+            self.results = queue.Queue()
+            self.consumer = threading.Thread(target=consume, args=(open_sink, self.queue, self.results), daemon=True)
+        else:
+            context = multiprocessing.get_context("fork")
+            self.queue = context.Queue(max_pending)
+            self.results = context.Queue()
+            self.consumer = context.Process(target=consume, args=(open_sink, self.queue, self.results))
+        self.consumer.start()
+        self.file_path, error = self.results.get()
+        if error is not None:
+            self.consumer.join()
+            raise RuntimeError(f"Opening an output sink failed: {error}")
+
+    def write(self, entity):
+        self.batch.append(entity)
+        self.records += 1
+        if len(self.batch) >= self.batch_size:
+            start = time.perf_counter()
+            self.queue.put(self.batch)
+            self.batch = []
+            self.write_time += time.perf_counter() - start
+
+    def close(self):
+        if self.batch:
+            self.queue.put(self.batch)
+            self.batch = []
+        self.queue.put(None)
+        error, self.lines = self.results.get()
+        self.consumer.join()
+        if error is not None:
+            raise RuntimeError(f"Writing {self.file_path} failed: {error}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def consume(open_sink, batches, results):
+    """
+    Body of the thread or process of a QueuedSink: write the batches of entities to the sink until None is received.
+    Sends the sink's file path or the error opening it, then the error writing to it if any and its number of lines.
+    """
+    try:
+        sink = open_sink()
+    except Exception as e:
+        results.put((None, repr(e)))
+        return
+    results.put((sink.file_path, None))
+    error = None
+    while (batch := batches.get()) is not None:
+        if error is not None: # keep draining the queue so the producer never blocks
+            continue
+        try:
+            for entity in batch:
+                sink.write(entity)
+        except Exception as e:
+            logger.error(f"Error while writing {sink.file_path}: {e}")
+            error = repr(e)
+    try:
+        sink.close()
+    except Exception as e:
+        error = error or repr(e)
+    results.put((error, sink.lines))
+
+
+class CompositeWriter:
+    """
+    Writer fanning out the nodes and edges to the writers of several formats, so each adapter is only run once
+    whatever the number of formats
+    :param writers: dict of the writers by format name, the first one is the primary format
+    :param parallelism: 'none' to encode every format in the calling thread, 'thread' or 'process' to run the
+    encoding of each format in its own thread or forked process
+    """
+    def __init__(self, writers, parallelism="none"):
+        if parallelism not in PARALLELISM:
+            raise ValueError(f"Unknown parallelism {parallelism}, expected one of {', '.join(PARALLELISM)}")
+        self.writers = writers
+        self.parallelism = parallelism if len(writers) > 1 else "none"
+
+    def file_writers(self):
+        """
+        :return: the writers writing a nodes and an edges file per output directory
+        """
+        return [w for w in self.writers.values() if hasattr(w, "NODES_FILE")]
+
+    def output_file_names(self):
+        """
+        :return: the names of the nodes files and of the edges files written to each output directory
+        """
+        return {"nodes": [w.output_file_name(w.NODES_FILE) for w in self.file_writers()],
+                "edges": [w.output_file_name(w.EDGES_FILE) for w in self.file_writers()]}
+
+    def open_sink(self, open_sinks):
+        if len(open_sinks) == 1:
+            return open_sinks[0]()
+        if self.parallelism == "none":
+            return CompositeSink([open_sink() for open_sink in open_sinks])
+        return CompositeSink([QueuedSink(open_sink, self.parallelism) for open_sink in open_sinks])
+
+    def node_sink(self, path_prefix=None, create_dir=True, separator=True):
+        return self.open_sink([lambda w=w: w.node_sink(path_prefix, create_dir, separator)
+                               for w in self.writers.values()])
+
+    def edge_sink(self, path_prefix=None, create_dir=True, separator=True):
+        return self.open_sink([lambda w=w: w.edge_sink(path_prefix, create_dir, separator)
+                               for w in self.writers.values()])
+
+    def write_nodes(self, nodes, path_prefix=None, create_dir=True, separator=True):
+        with self.node_sink(path_prefix, create_dir, separator) as sink:
+            for node in nodes:
+                sink.write(node)
+
+        logger.info("Finished writing out nodes")
+        return sink
+
+    def write_edges(self, edges, path_prefix=None, create_dir=True, separator=True):
+        with self.edge_sink(path_prefix, create_dir, separator) as sink:
+            for edge in edges:
+                sink.write(edge)
+        return sink
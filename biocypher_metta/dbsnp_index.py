@@ -0,0 +1,260 @@
+# Compact, memory-mapped replacement for the pickled dbSNP rsid -> position and position -> rsid dicts.
+#
+# Layout of an index directory:
+#   meta.json               chromosome names (position in the list is the chromosome code) and counts
+#   rsid/ids.npy            numeric part of every rsid, sorted (uint64)
+#   rsid/chr.npy            chromosome code of each rsid (uint8)
+#   rsid/pos.npy            position of each rsid (uint32)
+#   pos/<chr>.pos.npy       positions on the chromosome, sorted (uint32)
+#   pos/<chr>.rsid.npy      rsid at each position (uint64)
+#
+# All arrays are opened with mmap_mode='r', so they cost no RAM up front, only the pages actually touched are
+# read, and processes using the same index share a single copy through the page cache.
+import json
+import os
+import pathlib
+import shutil
+import numpy as np
+import pandas as pd
+from biocypher._logger import logger
+
+META_FILE = "meta.json"
+# rsids are bucketed on their value while the VCF is streamed, each bucket is then sorted in memory
+RSID_BUCKET_SIZE = 1 << 24
+CHUNK_SIZE = 5_000_000
+
+_POS_DTYPE = np.dtype([("pos", "<u4"), ("rsid", "<u8")])
+_RSID_DTYPE = np.dtype([("rsid", "<u8"), ("chr", "u1"), ("pos", "<u4")])
+
+
+def normalize_chr(chr):
+    chr = str(chr)
+    return chr if chr.startswith("chr") else "chr" + chr
+
+
+def build_dbsnp_index(vcf_path, index_dir, chunk_size=CHUNK_SIZE):
+    """
+    Build an index from the dbSNP VCF file read by DBSNPAdapter (chromosome names without the 'chr' prefix,
+    see dbsnp_adapter.py for an example). Chromosomes are stored with the 'chr' prefix, the format the
+    adapters use to look up positions. When several rsids share a position the first one in the file is kept
+    for position lookups.
+    :param vcf_path: path to the (gzipped) dbSNP VCF file
+    :param index_dir: directory to write the index to
+    """
+    index_path = pathlib.Path(index_dir)
+    tmp_path = index_path.joinpath("tmp")
+    tmp_path.mkdir(parents=True, exist_ok=True)
+    index_path.joinpath("rsid").mkdir(exist_ok=True)
+    index_path.joinpath("pos").mkdir(exist_ok=True)
+
+    chromosomes = []
+    chr_codes = {}
+    buckets = set()
+    reader = pd.read_csv(vcf_path, sep="\t", comment="#", header=None, usecols=[0, 1, 2],
+                         names=["chr", "pos", "id"], dtype={"chr": str, "pos": np.uint32, "id": str},
+                         chunksize=chunk_size)
+    total = 0
+    for chunk in reader:
+        chunk = chunk[chunk["id"].str.startswith("rs")]
+        rsids = chunk["id"].str[2:].astype(np.uint64).to_numpy()
+        positions = chunk["pos"].to_numpy()
+        chrs = chunk["chr"].to_numpy()
+
+        codes = np.empty(len(chunk), dtype=np.uint8)
+        for chr in pd.unique(chrs):
+            name = normalize_chr(chr)
+            if name not in chr_codes:
+                chr_codes[name] = len(chromosomes)
+                chromosomes.append(name)
+            codes[chrs == chr] = chr_codes[name]
+
+        for code in np.unique(codes):
+            mask = codes == code
+            records = np.empty(mask.sum(), dtype=_POS_DTYPE)
+            records["pos"] = positions[mask]
+            records["rsid"] = rsids[mask]
+            with open(tmp_path.joinpath(f"{chromosomes[code]}.bin"), "ab") as f:
+                records.tofile(f)
+
+        bucket_ids = rsids // RSID_BUCKET_SIZE
+        for bucket in np.unique(bucket_ids):
+            mask = bucket_ids == bucket
+            records = np.empty(mask.sum(), dtype=_RSID_DTYPE)
+            records["rsid"] = rsids[mask]
+            records["chr"] = codes[mask]
+            records["pos"] = positions[mask]
+            with open(tmp_path.joinpath(f"rsid_{bucket}.bin"), "ab") as f:
+                records.tofile(f)
+            buckets.add(int(bucket))
+
+        total += len(chunk)
+        logger.info(f"Read {total} variants")
+
+    counts = {}
+    for chr in chromosomes:
+        records = np.fromfile(tmp_path.joinpath(f"{chr}.bin"), dtype=_POS_DTYPE)
+        records = records[np.argsort(records["pos"], kind="stable")]
+        np.save(index_path.joinpath("pos", f"{chr}.pos.npy"), records["pos"])
+        np.save(index_path.joinpath("pos", f"{chr}.rsid.npy"), records["rsid"])
+        counts[chr] = len(records)
+        logger.info(f"Indexed {len(records)} positions on {chr}")
+
+    # concatenating the sorted buckets in bucket order gives the globally sorted rsid arrays
+    n_rsids = sum(os.path.getsize(tmp_path.joinpath(f"rsid_{b}.bin")) // _RSID_DTYPE.itemsize for b in buckets)
+    ids = np.lib.format.open_memmap(index_path.joinpath("rsid", "ids.npy"), mode="w+", dtype="<u8", shape=(n_rsids,))
+    chrs = np.lib.format.open_memmap(index_path.joinpath("rsid", "chr.npy"), mode="w+", dtype="u1", shape=(n_rsids,))
+    positions = np.lib.format.open_memmap(index_path.joinpath("rsid", "pos.npy"), mode="w+", dtype="<u4", shape=(n_rsids,))
+    offset = 0
+    for bucket in sorted(buckets):
+        records = np.fromfile(tmp_path.joinpath(f"rsid_{bucket}.bin"), dtype=_RSID_DTYPE)
+        records = records[np.argsort(records["rsid"], kind="stable")]
+        ids[offset:offset + len(records)] = records["rsid"]
+        chrs[offset:offset + len(records)] = records["chr"]
+        positions[offset:offset + len(records)] = records["pos"]
+        offset += len(records)
+    ids.flush(); chrs.flush(); positions.flush()
+    del ids, chrs, positions
+    logger.info(f"Indexed {n_rsids} rsids")
+
+    with open(index_path.joinpath(META_FILE), "w") as f:
+        json.dump({"source": str(vcf_path), "chromosomes": chromosomes, "counts": counts, "rsids": n_rsids}, f, indent=2)
+
+    shutil.rmtree(tmp_path)
+
+
+class DbsnpIndex:
+    """
+    Read access to an index built by build_dbsnp_index. Nothing is read until the first lookup and position
+    arrays are opened per chromosome on demand.
+    :param index_dir: the index directory
+    :param chromosomes: restrict lookups to these chromosomes, all chromosomes if None
+    """
+    def __init__(self, index_dir, chromosomes=None):
+        self.index_path = pathlib.Path(index_dir)
+        with open(self.index_path.joinpath(META_FILE), "r") as f:
+            self.meta = json.load(f)
+        self.chromosomes = self.meta["chromosomes"]
+        self.chr_codes = {chr: i for i, chr in enumerate(self.chromosomes)}
+        self.allowed_chromosomes = None if chromosomes is None else {normalize_chr(c) for c in chromosomes}
+        self._rsid_arrays = None
+        self._pos_arrays = {}
+
+    def __getstate__(self):
+        # memory maps are reopened lazily, so sending an index to another process only sends the path
+        state = self.__dict__.copy()
+        state["_rsid_arrays"] = None
+        state["_pos_arrays"] = {}
+        return state
+
+    def _load(self, path):
+        return np.load(self.index_path.joinpath(path), mmap_mode="r")
+
+    def rsid_arrays(self):
+        if self._rsid_arrays is None:
+            self._rsid_arrays = (self._load("rsid/ids.npy"), self._load("rsid/chr.npy"), self._load("rsid/pos.npy"))
+        return self._rsid_arrays
+
+    def pos_arrays(self, chr):
+        if chr not in self._pos_arrays:
+            if chr not in self.chr_codes:
+                self._pos_arrays[chr] = None
+            else:
+                self._pos_arrays[chr] = (self._load(f"pos/{chr}.pos.npy"), self._load(f"pos/{chr}.rsid.npy"))
+        return self._pos_arrays[chr]
+
+    def is_allowed(self, chr):
+        return self.allowed_chromosomes is None or chr in self.allowed_chromosomes
+
+    def lookup_rsid(self, rsid):
+        """
+        :return: (chr, pos) of the rsid, or None if it isn't in the index
+        """
+        if not isinstance(rsid, str) or not rsid.startswith("rs"):
+            return None
+        try:
+            n = int(rsid[2:])
+        except ValueError:
+            return None
+        ids, chrs, positions = self.rsid_arrays()
+        i = ids.searchsorted(n)
+        if i == len(ids) or ids[i] != n:
+            return None
+        chr = self.chromosomes[chrs[i]]
+        if not self.is_allowed(chr):
+            return None
+        return chr, int(positions[i])
+
+    def lookup_position(self, chr, pos):
+        """
+        :return: the rsid at the position, or None if there is none in the index
+        """
+        chr = normalize_chr(chr)
+        if not self.is_allowed(chr):
+            return None
+        arrays = self.pos_arrays(chr)
+        if arrays is None:
+            return None
+        positions, rsids = arrays
+        pos = int(pos)
+        i = positions.searchsorted(pos)
+        if i == len(positions) or positions[i] != pos:
+            return None
+        return f"rs{rsids[i]}"
+
+    def rsid_map(self):
+        return DbsnpRsidMap(self)
+
+    def pos_map(self):
+        return DbsnpPosMap(self)
+
+
+class DbsnpRsidMap:
+    """
+    Drop-in replacement of the pickled rsid dict: map[rsid] -> {"chr": chr, "pos": pos}
+    """
+    def __init__(self, index):
+        self.index = index
+
+    def get(self, rsid, default=None):
+        result = self.index.lookup_rsid(rsid)
+        if result is None:
+            return default
+        chr, pos = result
+        return {"chr": chr, "pos": pos}
+
+    def __getitem__(self, rsid):
+        value = self.get(rsid)
+        if value is None:
+            raise KeyError(rsid)
+        return value
+
+    def __contains__(self, rsid):
+        return self.index.lookup_rsid(rsid) is not None
+
+
+class DbsnpPosMap:
+    """
+    Drop-in replacement of the pickled position dict: map["chr<chr>_<pos>"] -> rsid
+    """
+    def __init__(self, index):
+        self.index = index
+
+    def _lookup(self, key):
+        try:
+            chr, pos = key.rsplit("_", 1)
+            return self.index.lookup_position(chr, pos)
+        except (AttributeError, ValueError):
+            return None
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self._lookup(key) is not None
@@ -0,0 +1,207 @@
+# Columnar store of the nodes and edges produced by the adapters. Each config entry's nodes and edges are saved
+# as Parquet part files, with the id, label (and source and target of edges) columns and one typed column per
+# property, so the outputs can be rendered again in any format with different options by scanning the store
+# instead of re-parsing the sources.
+import json
+import os
+import pathlib
+import time
+from biocypher._logger import logger
+from biocypher_metta.adapters import Adapter, PROVENANCE_PROPERTIES
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Subdirectory of the output directory of an entry the store is written to
+STORE_DIR = "store"
+# Number of nodes or edges written to each part file
+DEFAULT_BATCH_SIZE = 100_000
+KEY_COLUMNS = {"nodes": ["id", "label"], "edges": ["source", "target", "label"]}
+# Prefix of the property columns, so properties can't clash with the key columns
+PROPERTY_PREFIX = "property:"
+# Schema metadata listing the columns whose values are JSON encoded, see column_array
+JSON_COLUMNS = b"json_columns"
+
+SCALAR_TYPES = {str, int, float, bool}
+
+
+def check_store():
+    if pa is None:
+        raise ImportError("The entity store needs the pyarrow package, installed with the store extra")
+
+
+def column_array(values):
+    """
+    :return: the Arrow array of the values of a column and whether it is JSON encoded. Values of a single
+    scalar type, or lists of values of a single scalar type, get a typed column. Anything Arrow would convert
+    (e.g. ints mixed with floats) or can't store, like dicts, is JSON encoded so it reads back unchanged.
+    """
+    types = {type(v) for v in values if v is not None}
+    if len(types) == 1:
+        value_type = next(iter(types))
+        if value_type is list:
+            element_types = {type(e) for v in values if v is not None for e in v}
+            typed = len(element_types) <= 1 and element_types <= SCALAR_TYPES
+        else:
+            typed = value_type in SCALAR_TYPES
+        if typed:
+            try:
+                return pa.array(values), False
+            except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+                pass
+    elif not types:
+        return pa.array(values, type=pa.null()), False
+    return pa.array([None if v is None else json.dumps(v, default=str) for v in values], type=pa.string()), True
+
+
+class StoreSink:
+    """
+    Writes nodes or edges to Parquet part files of batch_size entities, numbered in the order they are written
+    :param output_dir: the directory of the part files
+    :param kind: 'nodes' or 'edges'
+    """
+    def __init__(self, output_dir, kind, batch_size=DEFAULT_BATCH_SIZE):
+        check_store()
+        self.file_path = output_dir
+        self.kind = kind
+        self.batch_size = batch_size
+        self.batch = []
+        self.parts = 0
+        self.records = 0
+        self.lines = 0
+        self.write_time = 0.0
+        # created even if nothing is written, so an empty stream is told apart from a missing one
+        pathlib.Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    def write(self, entity):
+        self.batch.append(entity)
+        self.records += 1
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        start = time.perf_counter()
+        columns = {column: [entity[i] for entity in self.batch] for i, column in enumerate(KEY_COLUMNS[self.kind])}
+        keys = {}
+        for entity in self.batch:
+            keys.update(dict.fromkeys(entity[-1]))
+        for key in keys:
+            columns[PROPERTY_PREFIX + key] = [entity[-1].get(key) for entity in self.batch]
+        names, arrays, json_columns = [], [], []
+        for name, values in columns.items():
+            array, is_json = column_array(values)
+            names.append(name)
+            arrays.append(array)
+            if is_json:
+                json_columns.append(name)
+        table = pa.Table.from_arrays(arrays, names=names,
+                                     metadata={JSON_COLUMNS: json.dumps(json_columns).encode()})
+        pq.write_table(table, os.path.join(self.file_path, f"part-{self.parts:05d}.parquet"))
+        self.parts += 1
+        self.lines += len(self.batch)
+        self.batch = []
+        self.write_time += time.perf_counter() - start
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class EntityStoreWriter:
+    """
+    Writer saving the nodes and edges to the entity store instead of serializing them. The schema and BioCypher
+    configs are only taken for compatibility with the other writers.
+    """
+    def __init__(self, schema_config, biocypher_config, output_dir, batch_size=DEFAULT_BATCH_SIZE):
+        check_store()
+        self.output_path = pathlib.Path(output_dir)
+        self.batch_size = batch_size
+
+    def get_output_dir(self, kind, path_prefix=None):
+        if path_prefix is not None:
+            return self.output_path.joinpath(path_prefix, STORE_DIR, kind)
+        return self.output_path.joinpath(STORE_DIR, kind)
+
+    def node_sink(self, path_prefix=None, create_dir=True, separator=True):
+        return StoreSink(self.get_output_dir("nodes", path_prefix), "nodes", self.batch_size)
+
+    def edge_sink(self, path_prefix=None, create_dir=True, separator=True):
+        return StoreSink(self.get_output_dir("edges", path_prefix), "edges", self.batch_size)
+
+    def write_nodes(self, nodes, path_prefix=None, create_dir=True, separator=True):
+        with self.node_sink(path_prefix, create_dir, separator) as sink:
+            for node in nodes:
+                sink.write(node)
+
+        logger.info("Finished writing out nodes")
+        return sink
+
+    def write_edges(self, edges, path_prefix=None, create_dir=True, separator=True):
+        with self.edge_sink(path_prefix, create_dir, separator) as sink:
+            for edge in edges:
+                sink.write(edge)
+        return sink
+
+
+def read_entities(entities_dir, kind):
+    """
+    Read back the nodes or edges saved by a StoreSink, in the order they were written, as the tuples the
+    adapters yield. Properties without a value are left out.
+    """
+    check_store()
+    n_keys = len(KEY_COLUMNS[kind])
+    for part in sorted(pathlib.Path(entities_dir).glob("part-*.parquet")):
+        table = pq.read_table(part)
+        json_columns = set(json.loads(table.schema.metadata[JSON_COLUMNS]))
+        columns = table.to_pydict()
+        for name in json_columns:
+            columns[name] = [None if v is None else json.loads(v) for v in columns[name]]
+        key_values = [columns[c] for c in KEY_COLUMNS[kind]]
+        properties = [(name[len(PROPERTY_PREFIX):], columns[name]) for name in table.column_names[n_keys:]]
+        for i in range(table.num_rows):
+            props = {key: values[i] for key, values in properties if values[i] is not None}
+            yield (*(values[i] for values in key_values), props)
+
+
+class StoreAdapter(Adapter):
+    """
+    Adapter reading the nodes and edges of a config entry from the entity store, to render them again with
+    different options. Properties are filtered when reading, so the store should be built with write_properties
+    and add_provenance on.
+    :param entry_dir: the store directory of the config entry
+    :param excluded_properties: properties left out of the nodes and edges
+    """
+    def __init__(self, entry_dir, write_properties, add_provenance, excluded_properties=()):
+        super(StoreAdapter, self).__init__(write_properties, add_provenance)
+        if not os.path.isdir(entry_dir):
+            raise FileNotFoundError(f"{entry_dir} not found in the entity store")
+        self.entry_dir = pathlib.Path(entry_dir)
+        self.excluded_properties = set(excluded_properties)
+        if not add_provenance:
+            self.excluded_properties.update(PROVENANCE_PROPERTIES)
+
+    def filter_properties(self, props):
+        if not self.write_properties:
+            return {}
+        if self.excluded_properties:
+            return {k: v for k, v in props.items() if k not in self.excluded_properties}
+        return props
+
+    def get_nodes(self):
+        for id, label, props in read_entities(self.entry_dir.joinpath("nodes"), "nodes"):
+            yield id, label, self.filter_properties(props)
+
+    def get_edges(self):
+        for source, target, label, props in read_entities(self.entry_dir.joinpath("edges"), "edges"):
+            yield source, target, label, self.filter_properties(props)
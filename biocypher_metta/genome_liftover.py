@@ -0,0 +1,195 @@
+# Conversion of genomic positions between reference builds with UCSC chain files. The aligned blocks of the chain
+# file are loaded into sorted NumPy arrays per source chromosome, so arrays of positions are converted with a single
+# searchsorted. Positions covered by blocks of several chains, which the liftover package converts in an unspecified
+# order, get the block with the lowest start, the first one in the file on ties.
+import collections
+import functools
+import os
+import pathlib
+import urllib.request
+import numpy as np
+from biocypher._logger import logger
+from biocypher_metta.adapters.gzip_reader import open_gzip
+
+BUILDS = ["hg19", "hg38"]
+# Value of the positions that can't be converted in the arrays returned by Lifter.lift
+UNMAPPED = -1
+# Number of single position conversions cached by each Lifter
+DEFAULT_CACHE_SIZE = 2 ** 18
+CHAIN_SERVER = "https://hgdownload.soe.ucsc.edu"
+
+_lifters = {}
+
+
+def chain_file_name(from_build, to_build):
+    return f"{from_build}To{to_build[0].upper()}{to_build[1:]}.over.chain.gz"
+
+
+def chain_dirs():
+    """
+    :return: the directories searched for chain files, the cache directories of the liftover package
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return [pathlib.Path(cache_home, "liftover"), pathlib.Path("~/.liftover").expanduser()]
+
+
+def find_chain_file(from_build, to_build):
+    """
+    :return: the local chain file converting from_build to to_build. It is downloaded to the liftover cache
+    directory if there is none, so later builds work offline.
+    """
+    name = chain_file_name(from_build, to_build)
+    for chain_dir in chain_dirs():
+        path = chain_dir.joinpath(name)
+        if path.is_file() and path.stat().st_size > 0:
+            return path
+    path = chain_dirs()[0].joinpath(name)
+    url = f"{CHAIN_SERVER}/goldenPath/{from_build}/liftOver/{name}"
+    logger.info(f"No local chain file {name}, downloading it from {url}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        urllib.request.urlretrieve(url, tmp_path)
+    except OSError as e:
+        tmp_path.unlink(missing_ok=True)
+        raise FileNotFoundError(f"No chain file {name} in {', '.join(map(str, chain_dirs()))} and downloading it "
+                                f"failed: {e}. Download it from {url} or give its path.")
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_chain_file(path):
+    """
+    :return: dict of the aligned blocks of each source chromosome, as lists of
+    (start, end, query chromosome, query start, query on minus strand, query chromosome size)
+    """
+    opener = open_gzip if str(path).endswith(".gz") else open
+    blocks = collections.defaultdict(list)
+    with opener(path, "rt") as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0] == "chain":
+                chain_blocks = blocks[fields[2]]
+                t_pos, q_name, q_size, q_minus, q_pos = int(fields[5]), fields[7], int(fields[8]), \
+                    fields[9] == "-", int(fields[10])
+                continue
+            size = int(fields[0])
+            chain_blocks.append((t_pos, t_pos + size, q_name, q_pos, q_minus, q_size))
+            if len(fields) == 3:
+                t_pos += size + int(fields[1])
+                q_pos += size + int(fields[2])
+    return blocks
+
+
+class ChromosomeBlocks:
+    """
+    The blocks of a source chromosome, cut into non overlapping segments each converted by its first matching block.
+    A position p of a segment is converted to sign * p + shift on the query chromosome.
+    """
+    def __init__(self, blocks):
+        t_start = np.array([b[0] for b in blocks], dtype=np.int64)
+        t_end = np.array([b[1] for b in blocks], dtype=np.int64)
+        q_start = np.array([b[3] for b in blocks], dtype=np.int64)
+        q_minus = np.array([b[4] for b in blocks], dtype=bool)
+        q_size = np.array([b[5] for b in blocks], dtype=np.int64)
+
+        order = np.argsort(t_start, kind="stable")
+        t_start, t_end, q_start, q_minus, q_size = (a[order] for a in (t_start, t_end, q_start, q_minus, q_size))
+        # a block only converts the positions past the end of all the blocks before it
+        covered = np.maximum.accumulate(np.concatenate([[np.iinfo(np.int64).min], t_end[:-1]]))
+        seg_start = np.maximum(t_start, covered)
+        keep = seg_start < t_end
+        self.starts = seg_start[keep]
+        self.ends = t_end[keep]
+        self.sign = np.where(q_minus, -1, 1)[keep]
+        self.shift = np.where(q_minus, q_size - 1 - q_start + t_start, q_start - t_start)[keep]
+
+    def lift(self, positions):
+        """
+        :return: the converted positions, UNMAPPED for those outside the blocks
+        """
+        index = self.starts.searchsorted(positions, side="right") - 1
+        found = index >= 0
+        found[found] = positions[found] < self.ends[index[found]]
+        lifted = np.full(len(positions), UNMAPPED, dtype=np.int64)
+        lifted[found] = self.sign[index[found]] * positions[found] + self.shift[index[found]]
+        return lifted
+
+
+class Lifter:
+    """
+    Converts genomic positions with a chain file. Conversions that fail are counted in failures, by reason:
+    'chromosome' for chromosomes missing from the chain file and 'position' for positions outside its blocks.
+    :param chain_file: path of the chain file, gzipped or not
+    :param one_based: whether positions are one-based, like the liftover package they are zero-based by default
+    :param cache_size: number of single position conversions cached by lift_one
+    """
+    def __init__(self, chain_file, one_based=False, cache_size=DEFAULT_CACHE_SIZE):
+        self.chain_file = pathlib.Path(chain_file)
+        self.one_based = int(one_based)
+        self.chromosomes = {chr: ChromosomeBlocks(blocks) for chr, blocks in read_chain_file(self.chain_file).items()}
+        # chromosomes can be given with or without the chr prefix
+        for chr, blocks in list(self.chromosomes.items()):
+            self.chromosomes.setdefault(chr[3:] if chr.startswith("chr") else f"chr{chr}", blocks)
+        self.failures = collections.Counter()
+        self._lift_one = functools.lru_cache(maxsize=cache_size)(self._lift_position)
+
+    def lift(self, chr, positions):
+        """
+        :param chr: chromosome of all the positions, or an array of the chromosome of each position
+        :return: int64 array of the converted positions, UNMAPPED for those that can't be converted
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if isinstance(chr, str):
+            return self._lift_chromosome(chr, positions)
+        chrs = np.asarray(chr)
+        lifted = np.empty(len(positions), dtype=np.int64)
+        for c in np.unique(chrs):
+            mask = chrs == c
+            lifted[mask] = self._lift_chromosome(str(c), positions[mask])
+        return lifted
+
+    def _lift_chromosome(self, chr, positions):
+        blocks = self.chromosomes.get(chr)
+        if blocks is None:
+            self.failures["chromosome"] += len(positions)
+            return np.full(len(positions), UNMAPPED, dtype=np.int64)
+        lifted = blocks.lift(positions - self.one_based)
+        unmapped = lifted == UNMAPPED
+        lifted[~unmapped] += self.one_based
+        self.failures["position"] += int(unmapped.sum())
+        return lifted
+
+    def _lift_position(self, chr, pos):
+        blocks = self.chromosomes.get(chr)
+        if blocks is None:
+            return "chromosome"
+        lifted = int(blocks.lift(np.array([pos - self.one_based], dtype=np.int64))[0])
+        return "position" if lifted == UNMAPPED else lifted + self.one_based
+
+    def lift_one(self, chr, pos):
+        """
+        Convert a single position, caching the result
+        :return: the converted position, None if it can't be converted
+        """
+        lifted = self._lift_one(chr, int(pos))
+        if isinstance(lifted, str):
+            self.failures[lifted] += 1
+            return None
+        return lifted
+
+
+def get_lifter(from_build="hg19", to_build="hg38", chain_file=None):
+    """
+    :param chain_file: the chain file to use, by default the one of the builds in the liftover cache directory
+    :return: the Lifter of the builds, loaded once per process
+    """
+    if from_build not in BUILDS or to_build not in BUILDS or from_build == to_build:
+        raise ValueError(f"Invalid reference build versions. 'from_build' and 'to_build' must be different and one "
+                         f"of {', '.join(BUILDS)}.")
+    key = (from_build, to_build, chain_file)
+    if key not in _lifters:
+        _lifters[key] = Lifter(chain_file or find_chain_file(from_build, to_build))
+    return _lifters[key]
@@ -0,0 +1,167 @@
+# Normalization of HGVS ids to variant ids, validating the reference allele against the UTA and SeqRepo data of the
+# hgvs package. The data provider is connected once per process, with a connection pool, and the variant ids are
+# memoized in an SQLite cache on disk, so an id is only normalized once across builds.
+#
+# The data provider is the public UTA database by default. For offline use, point db_url to a local PostgreSQL UTA
+# snapshot, e.g. postgresql://anonymous@localhost/uta/uta_20210129b, and seqrepo_dir to a local SeqRepo snapshot, or
+# pass any hgvs data provider as data_provider. hgvs can't connect to SQLite UTA snapshots. The args are taken by
+# get_normalizer and build_variant_id_from_hgvs, and default to the UTA_DB_URL and HGVS_SEQREPO_DIR environment
+# variables read by hgvs, so builds going through adapters can also be pointed to local snapshots with e.g.
+#   UTA_DB_URL=postgresql://anonymous@localhost/uta/uta_20210129b HGVS_SEQREPO_DIR=/data/seqrepo/2021-01-29
+import os
+import pathlib
+import sqlite3
+import hgvs.dataproviders.uta
+import hgvs.exceptions
+import hgvs.parser
+from hgvs.extras.babelfish import Babelfish
+from biocypher._logger import logger
+
+DEFAULT_CACHE_PATH = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+                                  "biocypher-metta", "hgvs.sqlite")
+# Number of ids looked up in the cache per query
+LOOKUP_BATCH_SIZE = 500
+
+_normalizers = {}
+
+
+class HGVSNormalizer:
+    """
+    Converts HGVS ids to variant ids, see build_variant_id_from_hgvs
+    :param cache_path: the SQLite file the variant ids are cached in, None to not cache them
+    :param data_provider: the hgvs data provider, by default one connected to db_url
+    :param db_url: URL of the PostgreSQL UTA database, by default UTA_DB_URL or the public UTA database
+    :param seqrepo_dir: directory of a local SeqRepo snapshot the sequences are read from
+    """
+    def __init__(self, assembly="GRCh38", cache_path=DEFAULT_CACHE_PATH, data_provider=None, db_url=None,
+                 seqrepo_dir=None):
+        self.assembly = assembly
+        self.cache_path = None if cache_path is None else pathlib.Path(cache_path)
+        self.db_url = db_url
+        self.seqrepo_dir = seqrepo_dir
+        self._data_provider = data_provider
+        self._babelfish = None
+        self._parser = None
+        self._connection = None
+        self._pid = None
+
+    @property
+    def data_provider(self):
+        if self._data_provider is None:
+            if self.seqrepo_dir is not None:
+                # read by the sequence fetcher of the data provider when it's created
+                os.environ["HGVS_SEQREPO_DIR"] = str(self.seqrepo_dir)
+            self._data_provider = hgvs.dataproviders.uta.connect(db_url=self.db_url, pooling=True)
+        return self._data_provider
+
+    @property
+    def babelfish(self):
+        if self._babelfish is None:
+            self._babelfish = Babelfish(self.data_provider, assembly_name=self.assembly)
+        return self._babelfish
+
+    @property
+    def parser(self):
+        if self._parser is None:
+            self._parser = hgvs.parser.Parser()
+        return self._parser
+
+    @property
+    def cache(self):
+        """
+        The connection to the cache, opened once per process
+        """
+        if self._pid != os.getpid():
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.cache_path, timeout=60)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS variant_ids (hgvs TEXT NOT NULL, assembly TEXT NOT NULL, "
+                                     "variant_id TEXT, PRIMARY KEY (hgvs, assembly))")
+            self._pid = os.getpid()
+        return self._connection
+
+    def to_vcf(self, hgvs_id):
+        """
+        :return: (chr, pos, ref, alt, type) of the variant, None if it isn't a valid variant. Errors of the data
+        provider, e.g. connection errors, are raised.
+        """
+        try:
+            return self.babelfish.hgvs_to_vcf(self.parser.parse(hgvs_id))
+        except hgvs.exceptions.HGVSError as e:
+            logger.warning(f"Invalid HGVS id {hgvs_id}: {e}")
+            return None
+
+    def normalize(self, hgvs_id):
+        """
+        :return: the variant id of the HGVS id, None if it isn't a valid variant
+        """
+        # imported here as the helpers use the normalizer
+        from biocypher_metta.adapters.helpers import build_variant_id
+        vcf = self.to_vcf(hgvs_id)
+        if vcf is None:
+            return None
+        chr, pos_start, ref, alt, type = vcf
+        if type == 'sub' or type == 'delins':
+            return build_variant_id(chr, pos_start + 1, ref[1:], alt[1:], self.assembly)
+        return build_variant_id(chr, pos_start, ref, alt, self.assembly)
+
+    def lookup(self, hgvs_ids):
+        """
+        :return: dict of the cached variant ids of the HGVS ids that are in the cache
+        """
+        if self.cache_path is None:
+            return {}
+        cached = {}
+        for i in range(0, len(hgvs_ids), LOOKUP_BATCH_SIZE):
+            batch = hgvs_ids[i:i + LOOKUP_BATCH_SIZE]
+            rows = self.cache.execute(f"SELECT hgvs, variant_id FROM variant_ids WHERE assembly = ? AND hgvs IN "
+                                      f"({', '.join('?' * len(batch))})", [self.assembly, *batch])
+            cached.update(rows)
+        return cached
+
+    def store(self, variant_ids):
+        if self.cache_path is None or not variant_ids:
+            return
+        with self.cache:
+            self.cache.executemany("INSERT OR REPLACE INTO variant_ids VALUES (?, ?, ?)",
+                                   [(hgvs_id, self.assembly, variant_id) for hgvs_id, variant_id in variant_ids.items()])
+
+    def variant_ids(self, hgvs_ids):
+        """
+        Batch version of variant_id, looking up the cache once for all the ids and caching the new ones in a single
+        transaction
+        :return: list of the variant ids of the HGVS ids, None for those that aren't valid variants or couldn't
+        be validated
+        """
+        unique_ids = list(dict.fromkeys(hgvs_ids))
+        variant_ids = self.lookup(unique_ids)
+        normalized = {}
+        for hgvs_id in unique_ids:
+            if hgvs_id in variant_ids:
+                continue
+            try:
+                normalized[hgvs_id] = self.normalize(hgvs_id)
+            except Exception as e:
+                # not cached, the id is validated again next time
+                logger.error(f"Couldn't validate HGVS id {hgvs_id}: {e}")
+                variant_ids[hgvs_id] = None
+        self.store(normalized)
+        variant_ids.update(normalized)
+        return [variant_ids[hgvs_id] for hgvs_id in hgvs_ids]
+
+    def variant_id(self, hgvs_id):
+        return self.variant_ids([hgvs_id])[0]
+
+
+def get_normalizer(assembly="GRCh38", cache_path=DEFAULT_CACHE_PATH, data_provider=None, db_url=None,
+                   seqrepo_dir=None):
+    """
+    :return: the normalizer of the assembly with the given data provider and cache, see HGVSNormalizer for the args,
+    created once per process
+    """
+    # the normalizer keeps a reference to the data provider, so its id isn't reused
+    key = (assembly, None if cache_path is None else str(cache_path), id(data_provider), db_url,
+           None if seqrepo_dir is None else str(seqrepo_dir))
+    if key not in _normalizers:
+        _normalizers[key] = HGVSNormalizer(assembly, cache_path, data_provider, db_url, seqrepo_dir)
+    return _normalizers[key]
@@ -0,0 +1,224 @@
+# Sidecar index of a nodes.metta or edges.metta file, giving random access to the atoms of an entity without
+# scanning the file. Written by MeTTaWriter with index=True next to the file it indexes.
+#
+# Layout of the <file>.idx directory:
+#   meta.json        size of the indexed file and chromosome names (position in the list is the chromosome code)
+#   keys.npy         (hash, offset, length) of each entity's block of atoms, sorted by hash. Nodes are keyed by
+#                    their id, edges by their source and by their target id.
+#   positions.npy    (chr, start, offset, length) of the entities with chr and start properties, sorted by
+#                    chromosome and start
+#
+# The arrays are opened with mmap_mode='r' and searched with searchsorted, so a lookup reads O(log n) pages.
+import hashlib
+import json
+import mmap
+import os
+import pathlib
+import shutil
+from array import array
+import numpy as np
+
+INDEX_SUFFIX = ".idx"
+META_FILE = "meta.json"
+
+KEY_DTYPE = np.dtype([("hash", "<u8"), ("offset", "<u8"), ("length", "<u4")])
+POSITION_DTYPE = np.dtype([("chr", "<u2"), ("start", "<i8"), ("offset", "<u8"), ("length", "<u4")])
+
+
+def index_path(file_path):
+    return pathlib.Path(f"{file_path}{INDEX_SUFFIX}")
+
+
+def key_hash(key):
+    return int.from_bytes(hashlib.blake2b(str(key).encode(), digest_size=8).digest(), "little")
+
+
+def entity_position(properties):
+    """
+    :return: (chr, start) of an entity from its chr and start (or pos) properties, None if it has none
+    """
+    chr = properties.get("chr")
+    start = properties.get("start", properties.get("pos"))
+    if chr is None or start is None:
+        return None
+    try:
+        return str(chr), int(start)
+    except (TypeError, ValueError):
+        return None
+
+
+class IndexBuilder:
+    """
+    Collects the offsets of the entities written by an EntitySink and writes the index when the sink is closed
+    :param kind: 'nodes' or 'edges'
+    """
+    def __init__(self, kind):
+        self.key_fields = (0,) if kind == "nodes" else (0, 1)
+        self.hashes, self.offsets, self.lengths = array("Q"), array("Q"), array("L")
+        self.chromosomes = {}
+        self.chrs, self.starts, self.position_offsets, self.position_lengths = array("H"), array("q"), array("Q"), \
+            array("L")
+
+    def add(self, entity, offset, length):
+        for i in self.key_fields:
+            self.hashes.append(key_hash(entity[i]))
+            self.offsets.append(offset)
+            self.lengths.append(length)
+        position = entity_position(entity[-1])
+        if position is not None:
+            chr, start = position
+            code = self.chromosomes.setdefault(chr, len(self.chromosomes))
+            self.chrs.append(code)
+            self.starts.append(start)
+            self.position_offsets.append(offset)
+            self.position_lengths.append(length)
+
+    def write(self, file_path, start_offset, file_size):
+        """
+        Write the index of file_path. If the sink appended to a file that has an up to date index, the entries
+        are added to it.
+        :param start_offset: size of the file when the sink opened it
+        """
+        keys = np.empty(len(self.hashes), dtype=KEY_DTYPE)
+        keys["hash"], keys["offset"], keys["length"] = self.hashes, self.offsets, self.lengths
+        positions = np.empty(len(self.chrs), dtype=POSITION_DTYPE)
+        positions["chr"], positions["start"] = self.chrs, self.starts
+        positions["offset"], positions["length"] = self.position_offsets, self.position_lengths
+        chromosomes = list(self.chromosomes)
+        parts = [(keys, positions, chromosomes, 0)]
+
+        previous = index_path(file_path)
+        if start_offset > 0 and previous.is_dir():
+            meta = read_meta(previous)
+            if meta["file_size"] == start_offset:
+                parts.insert(0, (*load_arrays(previous), meta["chromosomes"], 0))
+        write_index(previous, parts, file_size)
+
+
+def read_meta(index_dir):
+    with open(pathlib.Path(index_dir).joinpath(META_FILE), "r") as f:
+        return json.load(f)
+
+
+def load_arrays(index_dir, mmap_mode=None):
+    index_dir = pathlib.Path(index_dir)
+    return (np.load(index_dir.joinpath("keys.npy"), mmap_mode=mmap_mode),
+            np.load(index_dir.joinpath("positions.npy"), mmap_mode=mmap_mode))
+
+
+def write_index(index_dir, parts, file_size):
+    """
+    Write an index combining several parts, each (keys, positions, chromosomes, base offset). The offsets of
+    a part are shifted by its base offset, e.g. its position in a file concatenated from several files.
+    """
+    codes = {}
+    all_keys, all_positions = [], []
+    for keys, positions, part_chromosomes, base in parts:
+        keys = np.array(keys)
+        keys["offset"] += base
+        positions = np.array(positions)
+        positions["offset"] += base
+        remap = np.array([codes.setdefault(c, len(codes)) for c in part_chromosomes] or [0], dtype="<u2")
+        positions["chr"] = remap[positions["chr"]]
+        all_keys.append(keys)
+        all_positions.append(positions)
+    chromosomes = list(codes)
+    keys = np.concatenate(all_keys) if all_keys else np.empty(0, dtype=KEY_DTYPE)
+    positions = np.concatenate(all_positions) if all_positions else np.empty(0, dtype=POSITION_DTYPE)
+    keys = keys[np.argsort(keys["hash"], kind="stable")]
+    positions = positions[np.lexsort((positions["start"], positions["chr"]))]
+
+    # written next to the final directory and renamed, so a partial index is never left behind
+    index_dir = pathlib.Path(index_dir)
+    tmp_dir = index_dir.with_name(index_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    np.save(tmp_dir.joinpath("keys.npy"), keys)
+    np.save(tmp_dir.joinpath("positions.npy"), positions)
+    chr_ranges = {}
+    bounds = np.searchsorted(positions["chr"], np.arange(len(chromosomes) + 1))
+    for code, chr in enumerate(chromosomes):
+        chr_ranges[chr] = [int(bounds[code]), int(bounds[code + 1])]
+    with open(tmp_dir.joinpath(META_FILE), "w") as f:
+        json.dump({"file_size": file_size, "chromosomes": chromosomes, "chr_ranges": chr_ranges}, f, indent=2)
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(tmp_dir, index_dir)
+
+
+def merge_indexes(file_paths, target_path):
+    """
+    Write the index of target_path, the concatenation of file_paths, from the indexes of the files
+    :return: False, and nothing is written, if one of the files has no up to date index
+    """
+    parts = []
+    base = 0
+    for file_path in file_paths:
+        index_dir = index_path(file_path)
+        size = os.path.getsize(file_path)
+        if not index_dir.is_dir() or read_meta(index_dir)["file_size"] != size:
+            return False
+        parts.append((*load_arrays(index_dir), read_meta(index_dir)["chromosomes"], base))
+        base += size
+    write_index(index_path(target_path), parts, base)
+    return True
+
+
+class MettaIndex:
+    """
+    Random access to the entities of an indexed nodes.metta or edges.metta file
+    :param file_path: the indexed file, its index is read from <file_path>.idx
+    """
+    def __init__(self, file_path):
+        self.file_path = pathlib.Path(file_path)
+        self.index_dir = index_path(file_path)
+        self.meta = read_meta(self.index_dir)
+        if self.meta["file_size"] != os.path.getsize(self.file_path):
+            raise ValueError(f"The index of {self.file_path} is out of date, rebuild it with the file")
+        self.keys, self.positions = load_arrays(self.index_dir, mmap_mode="r")
+        self._file = open(self.file_path, "rb")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.meta["file_size"] else b""
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def block(self, offset, length):
+        return self._data[offset:offset + length].decode()
+
+    def lookup(self, id):
+        """
+        :return: the atoms of the entities with this id, for edges the edges with this source or target id,
+        one string per entity in file order
+        """
+        id = str(id)
+        h = key_hash(id)
+        hashes = self.keys["hash"]
+        begin, end = hashes.searchsorted(h, side="left"), hashes.searchsorted(h, side="right")
+        blocks = []
+        for offset, length in sorted(set((int(o), int(l)) for o, l in zip(self.keys["offset"][begin:end],
+                                                                         self.keys["length"][begin:end]))):
+            block = self.block(offset, length)
+            # hashes can collide, keep the blocks that have the id
+            if f" {id})" in block:
+                blocks.append(block)
+        return blocks
+
+    def region(self, chr, start, end):
+        """
+        :return: the atoms of the entities on chr starting between start and end (inclusive), in position order
+        """
+        chr_range = self.meta["chr_ranges"].get(chr)
+        if chr_range is None:
+            return []
+        begin, stop = chr_range
+        starts = self.positions["start"][begin:stop]
+        first, last = starts.searchsorted(start, side="left"), starts.searchsorted(end, side="right")
+        return [self.block(int(o), int(l)) for o, l in zip(self.positions["offset"][begin + first:begin + last],
+                                                           self.positions["length"][begin + first:begin + last])]
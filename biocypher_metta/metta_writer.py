@@ -4,26 +4,226 @@ import pathlib
 import os
 from biocypher._logger import logger
 import networkx as nx
-
-class MeTTaWriter:
+import time
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from biocypher_metta.output_codecs import BlockCompressedWriter, check_codec, codec_extension
+from biocypher_metta.metta_index import IndexBuilder
+from biocypher_metta.schema_cache import SchemaCache, DEFAULT_CACHE_DIR
+from biocypher_metta.adapters import PROVENANCE_PROPERTIES
+
+# Size in characters of the output buffered by an EntitySink before it is written to the file
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+
+# How the provenance properties are written: 'inline' as properties of every entity, 'reference' as a provenance
+# record written once per file and referenced by each entity, see ProvenanceReferences
+PROVENANCE_MODES = ["inline", "reference"]
+
+# Same escaping as MeTTaWriter.check_property: spaces become underscores, parentheses and backslashes are
+# escaped with a backslash
+ESCAPE_TABLE = str.maketrans({" ": "_", "(": "\\(", ")": "\\)", "\\": "\\\\"})
+
+
+class EntitySink:
+    """
+    Appends the atoms of nodes or edges to an output file. The atoms of each entity are joined into a single
+    chunk and the chunks are written out in one call once buffer_size characters are buffered. Counts the
+    entities and lines written and the time spent serializing and writing them.
+    :param file_path: the file to append to
+    :param serialize: function converting a node or an edge to its list of atoms
+    :param buffer_size: number of characters to buffer before writing to the file
+    :param open_file: function opening the file for appending, e.g. compressing the output
+    :param indexer: IndexBuilder recording the byte offset of each entity's chunk, written next to the file on
+    close. Only valid for uncompressed files.
+    :param separator: end the output with an empty line, separating it from the output appended to the file next.
+    False for the chunks of a split input merged into the file, except the last one, so the merged file is the
+    same as when the input isn't split.
+    """
+    def __init__(self, file_path, serialize, buffer_size=DEFAULT_BUFFER_SIZE, open_file=None, indexer=None,
+                 separator=True):
+        self.file_path = file_path
+        self.serialize = serialize
+        self.buffer_size = buffer_size
+        self.indexer = indexer
+        self.separator = separator
+        self.start_offset = self.offset = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        self.file = open(file_path, "a") if open_file is None else open_file(file_path)
+        self.buffer = []
+        self.buffered = 0
+        self.records = 0
+        self.lines = 0
+        self.write_time = 0.0
+
+    def write(self, entity):
+        start = time.perf_counter()
+        atoms = self.serialize(entity)
+        chunk = "\n".join(atoms) + "\n"
+        self.buffer.append(chunk)
+        self.buffered += len(chunk)
+        if self.indexer is not None:
+            length = len(chunk) if chunk.isascii() else len(chunk.encode())
+            self.indexer.add(entity, self.offset, length)
+            self.offset += length
+        if self.buffered >= self.buffer_size:
+            self.flush()
+        self.records += 1
+        self.lines += len(atoms)
+        self.write_time += time.perf_counter() - start
+
+    def flush(self):
+        self.file.write("".join(self.buffer))
+        self.buffer = []
+        self.buffered = 0
+
+    def close(self):
+        if self.separator:
+            self.buffer.append("\n")
+            self.offset += 1
+        self.flush()
+        self.file.close()
+        if self.indexer is not None:
+            self.indexer.write(self.file_path, self.start_offset, self.offset)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ProvenanceReferences:
+    """
+    Serializer of the 'reference' provenance mode. The provenance properties of each entity are replaced by a
+    reference to a provenance record with the same values, written once per file before the first entity
+    referencing it. Record ids are derived from the values, so a record has the same id in every file. A file
+    written by several adapters, or by the chunks of an input split with --split-input, is the concatenation of
+    their outputs, so it repeats the record once per adapter or chunk.
+    :param serialize: the node or edge serializer of the writer
+    :param write_record: function returning the atoms of the provenance record with the given id and properties
+    :param write_reference: function returning the atom referencing a record, from the first atom of an entity
+    and the id of the record
+    """
+    def __init__(self, serialize, write_record, write_reference):
+        self.serialize = serialize
+        self.write_record = write_record
+        self.write_reference = write_reference
+        self.ids = {}
+        self.written = set()
+
+    def record_id(self, provenance):
+        key = tuple((k, tuple(v) if isinstance(v, list) else v) for k, v in provenance.items())
+        id = self.ids.get(key)
+        if id is None:
+            digest = hashlib.sha1(json.dumps(provenance, sort_keys=True, default=str).encode()).hexdigest()
+            id = self.ids[key] = f"prov_{digest[:12]}"
+        return id
+
+    def __call__(self, entity):
+        properties = entity[-1]
+        provenance = {k: properties[k] for k in PROVENANCE_PROPERTIES if properties.get(k) not in (None, "")}
+        if not provenance:
+            return self.serialize(entity)
+        properties = {k: v for k, v in properties.items() if k not in PROVENANCE_PROPERTIES}
+        atoms = self.serialize((*entity[:-1], properties))
+        id = self.record_id(provenance)
+        atoms.append(self.write_reference(atoms[0], id))
+        if id not in self.written:
+            self.written.add(id)
+            atoms = self.write_record(id, provenance) + atoms
+        return atoms
+
+
+class OutputCodecMixin:
+    """
+    Optional compression of the node and edge files of a writer. With a codec the output buffer of each sink is
+    compressed as an independent block on a thread pool shared by the sinks of the writer.
+    """
+    def init_output_codec(self, codec=None, compression_level=None, compression_threads=None):
+        check_codec(codec or "none")
+        self.codec = None if codec == "none" else codec
+        self.compression_level = compression_level
+        self.compression_threads = compression_threads or os.cpu_count()
+        self._compression_pool = None # created on first use, so it is never inherited by forked workers
+
+    def output_file_name(self, file_name):
+        return file_name + codec_extension(self.codec)
+
+    def open_output(self, file_path):
+        if self.codec is None:
+            return open(file_path, "a")
+        if self._compression_pool is None:
+            self._compression_pool = ThreadPoolExecutor(max_workers=self.compression_threads,
+                                                        thread_name_prefix="compress")
+        return BlockCompressedWriter(file_path, self.codec, self._compression_pool, self.compression_level,
+                                     max_pending=2 * self.compression_threads)
+
+
+class MeTTaWriter(OutputCodecMixin):
+    NODES_FILE = "nodes.metta"
+    EDGES_FILE = "edges.metta"
 
     def __init__(self, schema_config, biocypher_config,
-                 output_dir):
+                 output_dir, buffer_size=DEFAULT_BUFFER_SIZE,
+                 codec=None, compression_level=None, compression_threads=None, index=False,
+                 schema_cache_dir=DEFAULT_CACHE_DIR, provenance="inline"):
+        """
+        :param index: write a sidecar index of each nodes and edges file, see biocypher_metta.metta_index
+        :param schema_cache_dir: directory caching the type definitions and edge node types derived from the
+        configs, so BioCypher is only started when they change. None to always derive them.
+        :param provenance: one of PROVENANCE_MODES
+        """
         self.schema_config = schema_config
         self.biocypher_config = biocypher_config
         self.output_path = pathlib.Path(output_dir)
+        self.buffer_size = buffer_size
+        self.init_output_codec(codec, compression_level, compression_threads)
+        if index and self.codec is not None:
+            raise ValueError("The output index needs uncompressed output files")
+        self.index = index
+        if provenance not in PROVENANCE_MODES:
+            raise ValueError(f"Unknown provenance mode {provenance}, expected one of {', '.join(PROVENANCE_MODES)}")
+        self.provenance = provenance
 
         if not os.path.exists(output_dir):
             self.output_path.mkdir()
 
-        self.bcy = BioCypher(schema_config_path=schema_config,
-                             biocypher_config_path=biocypher_config)
-
-        self.onotology = self.bcy._get_ontology()
-        self.create_type_hierarchy()
+        self._bcy = None
+        schema_cache = SchemaCache(schema_cache_dir, type(self), schema_config, biocypher_config)
+        cached = schema_cache.load()
+        if cached is not None:
+            with open(f"{self.output_path}/type_defs.metta", "w") as f:
+                f.write(cached["type_defs"])
+            self.edge_node_types = cached["edge_node_types"]
+            logger.info("Type hierarchy loaded from the schema cache.")
+        else:
+            self.create_type_hierarchy()
+            with open(f"{self.output_path}/type_defs.metta", "r") as f:
+                schema_cache.save({"type_defs": f.read(), "edge_node_types": self.edge_node_types})
+        if provenance == "reference":
+            with open(f"{self.output_path}/type_defs.metta", "a") as f:
+                f.write("(: PROVENANCE Type)\n(: provenance (-> $x PROVENANCE))\n")
 
         #self.excluded_properties = ["licence", "version", "source"]
         self.excluded_properties = []
+        # serializers compiled on first use, see compile_node_label, compile_edge_label and compile_properties
+        self._node_labels = {}
+        self._edge_templates = {}
+        self._property_fields = {}
+
+    @property
+    def bcy(self):
+        """
+        The BioCypher instance, started on first use
+        """
+        if self._bcy is None:
+            self._bcy = BioCypher(schema_config_path=self.schema_config,
+                                  biocypher_config_path=self.biocypher_config)
+        return self._bcy
+
+    @property
+    def onotology(self):
+        return self.bcy._get_ontology()
 
     def create_type_hierarchy(self):
         G = self.onotology._nx_graph
@@ -88,63 +288,135 @@ class MeTTaWriter:
                     file.write(out_str + "\n")
 
 
-    def write_nodes(self, nodes, path_prefix=None, create_dir=True):
+    def get_output_path(self, file_name, path_prefix=None, create_dir=True):
         if path_prefix is not None:
-            file_path = f"{self.output_path}/{path_prefix}/nodes.metta"
+            file_path = f"{self.output_path}/{path_prefix}/{file_name}"
             if create_dir:
                 if not os.path.exists(f"{self.output_path}/{path_prefix}"):
                     pathlib.Path(f"{self.output_path}/{path_prefix}").mkdir(parents=True, exist_ok=True)
         else:
-            file_path = f"{self.output_path}/nodes.metta"
-        with open(file_path, "a") as f:
-            for node in nodes:
-                out_str = self.write_node(node)
-                for s in out_str:
-                    f.write(s + "\n")
+            file_path = f"{self.output_path}/{file_name}"
+        return file_path
 
-            f.write("\n")
+    def node_sink(self, path_prefix=None, create_dir=True, separator=True):
+        """
+        Opens the nodes file for writing nodes one at a time, e.g. when they are pushed from a shared source scan
+        """
+        return EntitySink(self.get_output_path(self.output_file_name(self.NODES_FILE), path_prefix, create_dir),
+                          self.serializer(self.write_node), self.buffer_size, self.open_output,
+                          IndexBuilder("nodes") if self.index else None, separator)
 
-        logger.info("Finished writing out nodes")
+    def edge_sink(self, path_prefix=None, create_dir=True, separator=True):
+        """
+        Opens the edges file for writing edges one at a time, e.g. when they are pushed from a shared source scan
+        """
+        return EntitySink(self.get_output_path(self.output_file_name(self.EDGES_FILE), path_prefix, create_dir),
+                          self.serializer(self.write_edge), self.buffer_size, self.open_output,
+                          IndexBuilder("edges") if self.index else None, separator)
 
+    def serializer(self, serialize):
+        """
+        :return: the serializer of a new sink, write_node or write_edge wrapped according to the provenance mode
+        """
+        if self.provenance == "reference":
+            return ProvenanceReferences(serialize, self.write_provenance_record, self.write_provenance_reference)
+        return serialize
 
+    def write_provenance_record(self, id, provenance):
+        return self.write_property(f"(provenance {id})", provenance)
 
-    def write_edges(self, edges, path_prefix=None, create_dir=True):
-        if path_prefix is not None:
-            file_path = f"{self.output_path}/{path_prefix}/edges.metta"
-            if create_dir:
-                if not os.path.exists(f"{self.output_path}/{path_prefix}"):
-                    pathlib.Path(f"{self.output_path}/{path_prefix}").mkdir(parents=True, exist_ok=True)
-        else:
-            file_path = f"{self.output_path}/edges.metta"
+    def write_provenance_reference(self, def_out, id):
+        return f"(has_provenance {def_out} (provenance {id}))"
 
-        with open(file_path, "a") as f:
-            for edge in edges:
-                out_str = self.write_edge(edge)
-                for s in out_str:
-                    f.write(s + "\n")
+    def write_nodes(self, nodes, path_prefix=None, create_dir=True, separator=True):
+        with self.node_sink(path_prefix, create_dir, separator) as sink:
+            for node in nodes:
+                sink.write(node)
 
-            f.write("\n")
+        logger.info("Finished writing out nodes")
+        return sink
 
-    def write_node(self, node):
-        id, label, properties = node
+
+
+    def write_edges(self, edges, path_prefix=None, create_dir=True, separator=True):
+        with self.edge_sink(path_prefix, create_dir, separator) as sink:
+            for edge in edges:
+                sink.write(edge)
+        return sink
+
+    def compile_node_label(self, label):
         if "." in label:
             label = label.split(".")[1]
-        def_out = f"({self.convert_input_labels(label)} {id})"
-        return self.write_property(def_out, properties)
+        return f"({self.convert_input_labels(label)} "
 
-    def write_edge(self, edge):
-        source_id, target_id, label, properties = edge
+    def compile_edge_label(self, label):
+        """
+        :return: the parts of the edge atom around the source and target ids, from edge_node_types
+        """
         label = label.lower()
         source_type = self.edge_node_types[label]["source"]
         target_type = self.edge_node_types[label]["target"]
         output_label = self.edge_node_types[label]["output_label"]
         if output_label is not None:
             label = output_label
-        def_out = f"({label} ({source_type} {source_id}) ({target_type} {target_id}))"
+        return f"({label} ({source_type} ", f") ({target_type} "
+
+    def compile_properties(self, keys):
+        """
+        :return: the key and the '(key ' prefix of the atom of every property written for this set of keys
+        """
+        return tuple((k, f"({k} ") for k in keys if k not in self.excluded_properties)
+
+    def write_node(self, node):
+        id, label, properties = node
+        prefix = self._node_labels.get(label)
+        if prefix is None:
+            prefix = self._node_labels[label] = self.compile_node_label(label)
+        def_out = f"{prefix}{id})"
         return self.write_property(def_out, properties)
 
+    def write_edge(self, edge):
+        source_id, target_id, label, properties = edge
+        template = self._edge_templates.get(label)
+        if template is None:
+            template = self._edge_templates[label] = self.compile_edge_label(label)
+        prefix, middle = template
+        def_out = f"{prefix}{source_id}{middle}{target_id}))"
+        return self.write_property(def_out, properties)
 
     def write_property(self, def_out, property):
+        """
+        Serializes the properties with the fields compiled for their set of keys. Values of the common types are
+        formatted inline, strings are escaped with a translation table. Produces the same output as
+        write_property_generic, which handles every other type.
+        """
+        keys = tuple(property)
+        fields = self._property_fields.get(keys)
+        if fields is None:
+            fields = self._property_fields[keys] = self.compile_properties(keys)
+
+        out_str = [def_out]
+        for k, prefix in fields:
+            v = property[k]
+            t = type(v)
+            if t is str:
+                if v == "": continue
+                out_str.append(f"{prefix}{def_out} {v.translate(ESCAPE_TABLE)})")
+            elif t is int or t is float or t is bool:
+                out_str.append(f"{prefix}{def_out} {v})")
+            elif v is None:
+                continue
+            elif t is list:
+                prop = " ".join([e.translate(ESCAPE_TABLE) if type(e) is str else f"{self.check_property(e)}"
+                                 for e in v])
+                out_str.append(f"{prefix}{def_out} ({prop}))")
+            elif t is dict:
+                out_str.extend(self.write_property(f"{prefix}{def_out})", v))
+            else:
+                out_str.extend(self.write_property_generic(def_out, {k: v})[1:])
+        return out_str
+
+    def write_property_generic(self, def_out, property):
         out_str = [def_out]
         for k, v in property.items():
             if k in self.excluded_properties or v is None or v == "": continue
@@ -157,7 +429,7 @@ class MeTTaWriter:
                 out_str.append(f'({k} {def_out} {prop})')
             elif isinstance(v, dict):
                 prop = f"({k} {def_out})"
-                out_str.extend(self.write_property(prop, v))
+                out_str.extend(self.write_property_generic(prop, v))
             else:
                 out_str.append(f'({k} {def_out} {self.check_property(v)})')
         return out_str
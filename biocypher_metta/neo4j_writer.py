@@ -0,0 +1,165 @@
+# Writes the nodes and edges as BioCypher's neo4j-admin import files (per label header and part CSV files and the
+# neo4j-admin-import-call.sh script), using BioCypher's own Neo4j batch writer so the files are the same as those
+# of a regular BioCypher build.
+import glob
+import os
+import pathlib
+import re
+import time
+from biocypher import BioCypher
+from biocypher._logger import logger
+from biocypher.output.write._get_writer import get_writer
+
+# Number of nodes or edges translated and written to a new part file at once
+DEFAULT_BATCH_SIZE = 100_000
+# Subdirectory of the output directory of an entry the import files are written to
+NEO4J_DIR = "neo4j"
+
+PART_FILE = re.compile(r"^(?P<label>.+)-part(?P<part>\d+)\.csv$")
+
+
+class Neo4jSink:
+    """
+    Collects nodes or edges and writes them in batches through a BioCypher Neo4j batch writer, each batch to a new
+    part file of its label. Counts the entities written and the time spent translating and writing them.
+    :param output_dir: the directory the header and part files are written to
+    :param translate: the BioCypher translator function converting the tuples to BioCypher nodes or edges
+    :param write: the write_nodes or write_edges method of a Neo4j batch writer writing to output_dir
+    :param batch_size: number of entities per part file
+    """
+    def __init__(self, output_dir, translate, write, batch_size=DEFAULT_BATCH_SIZE):
+        self.file_path = output_dir
+        self.translate = translate
+        self.write_batch = write
+        self.batch_size = batch_size
+        self.batch = []
+        self.records = 0
+        self.lines = 0
+        self.write_time = 0.0
+
+    def write(self, entity):
+        self.batch.append(entity)
+        self.records += 1
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        start = time.perf_counter()
+        self.write_batch(list(self.translate(self.batch)))
+        self.lines += len(self.batch)
+        self.batch = []
+        self.write_time += time.perf_counter() - start
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class Neo4jWriter:
+
+    def __init__(self, schema_config, biocypher_config, output_dir, batch_size=DEFAULT_BATCH_SIZE):
+        self.schema_config = schema_config
+        self.biocypher_config = biocypher_config
+        self.output_path = pathlib.Path(output_dir)
+        self.batch_size = batch_size
+
+        if not os.path.exists(output_dir):
+            self.output_path.mkdir()
+
+        self.bcy = BioCypher(schema_config_path=schema_config,
+                             biocypher_config_path=biocypher_config)
+        self.translator = self.bcy._get_translator()
+        # shared by the sinks so a node or edge is only written once per process, like in a BioCypher build
+        self.deduplicator = self.bcy._get_deduplicator()
+        self._batch_writers = {}
+
+    def batch_writer(self, output_dir):
+        """
+        :return: the Neo4j batch writer of output_dir, shared by the node and edge sinks writing to it
+        """
+        output_dir = str(output_dir)
+        if output_dir not in self._batch_writers:
+            self._batch_writers[output_dir] = get_writer("neo4j", self.translator, self.deduplicator, output_dir,
+                                                         self.bcy._strict_mode)
+        return self._batch_writers[output_dir]
+
+    def get_output_dir(self, path_prefix=None):
+        """
+        The directory isn't created here, the batch writer creates it and warns if it already exists
+        """
+        if path_prefix is not None:
+            return self.output_path.joinpath(path_prefix, NEO4J_DIR)
+        return self.output_path.joinpath(NEO4J_DIR)
+
+    def node_sink(self, path_prefix=None, create_dir=True, separator=True):
+        output_dir = self.get_output_dir(path_prefix)
+        return Neo4jSink(output_dir, self.translator.translate_nodes, self.batch_writer(output_dir).write_nodes,
+                         self.batch_size)
+
+    def edge_sink(self, path_prefix=None, create_dir=True, separator=True):
+        output_dir = self.get_output_dir(path_prefix)
+        return Neo4jSink(output_dir, self.translator.translate_edges, self.batch_writer(output_dir).write_edges,
+                         self.batch_size)
+
+    def write_nodes(self, nodes, path_prefix=None, create_dir=True, separator=True):
+        with self.node_sink(path_prefix, create_dir, separator) as sink:
+            for node in nodes:
+                sink.write(node)
+
+        logger.info("Finished writing out nodes")
+        return sink
+
+    def write_edges(self, edges, path_prefix=None, create_dir=True, separator=True):
+        with self.edge_sink(path_prefix, create_dir, separator) as sink:
+            for edge in edges:
+                sink.write(edge)
+        return sink
+
+    def merge_outputs(self, staged_dirs, output_dir):
+        """
+        Move the import files written by several entries to a single directory. The part files are renumbered so
+        the parts of a label are numbered in the order of staged_dirs, the headers of a label are the same for
+        every entry. The import files already in output_dir are replaced.
+        :param staged_dirs: the NEO4J_DIR directories of the entries
+        """
+        output_dir = pathlib.Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for file in glob.glob(os.path.join(output_dir, "*-part*.csv")) + \
+                glob.glob(os.path.join(output_dir, "*-header.csv")):
+            os.remove(file)
+
+        next_part = {}
+        for staged_dir in staged_dirs:
+            parts = []
+            for file in os.listdir(staged_dir):
+                match = PART_FILE.match(file)
+                if match:
+                    parts.append((match["label"], int(match["part"]), file))
+                elif file.endswith("-header.csv"):
+                    os.replace(os.path.join(staged_dir, file), output_dir.joinpath(file))
+            for label, _, file in sorted(parts):
+                part = next_part.get(label, 0)
+                next_part[label] = part + 1
+                os.replace(os.path.join(staged_dir, file), output_dir.joinpath(f"{label}-part{part:03d}.csv"))
+
+    def write_import_call(self, output_dir):
+        """
+        Write the neo4j-admin import script for the header and part files in output_dir
+        :return: the path of the script
+        """
+        writer = get_writer("neo4j", self.translator, self.deduplicator, str(output_dir), self.bcy._strict_mode)
+        for header in sorted(glob.glob(os.path.join(output_dir, "*-header.csv"))):
+            label = os.path.basename(header)[:-len("-header.csv")]
+            with open(header, "r", encoding="utf-8") as f:
+                is_edge = f.readline().startswith(":START_ID")
+            paths = (os.path.join(writer.import_call_file_prefix, f"{label}-header.csv"),
+                     os.path.join(writer.import_call_file_prefix, f"{label}-part.*"))
+            (writer.import_call_edges if is_edge else writer.import_call_nodes).add(paths)
+        return writer.write_import_call()
@@ -0,0 +1,81 @@
+# Compressed output for the writers. Text is compressed in independent blocks on a thread pool (zlib and zstd
+# release the GIL, so blocks are compressed in parallel) and the compressed blocks are written in order, each
+# one as a gzip member or a zstd frame. Concatenated members/frames are valid gzip/zstd files, so outputs can
+# be appended to and concatenated like plain text files.
+import gzip
+import io
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from biocypher_metta.adapters.gzip_reader import open_gzip
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODECS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+
+
+def codec_extension(codec):
+    return CODECS[codec or "none"]
+
+
+def check_codec(codec):
+    if codec not in CODECS:
+        raise ValueError(f"Unknown output codec {codec}, expected one of {', '.join(CODECS)}")
+    if codec == "zstd" and zstandard is None:
+        raise ImportError("The zstd output codec needs the zstandard package, installed with the zstd extra")
+
+
+def compress_block(codec, level, data):
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+class BlockCompressedWriter:
+    """
+    File-like object compressing the text written to it block by block on a thread pool
+    :param file_path: the file to append to
+    :param codec: 'gzip' or 'zstd'
+    :param pool: the ThreadPoolExecutor compressing the blocks, can be shared by several writers
+    :param level: the compression level, the codec's default if None
+    :param max_pending: number of blocks being compressed before write waits for the oldest one
+    """
+    def __init__(self, file_path, codec, pool, level=None, max_pending=8):
+        check_codec(codec)
+        self.codec = codec
+        self.level = DEFAULT_LEVELS[codec] if level is None else level
+        self.pool = pool
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.file = open(file_path, "ab")
+
+    def write(self, text):
+        if not text:
+            return
+        self.pending.append(self.pool.submit(compress_block, self.codec, self.level, text.encode()))
+        while len(self.pending) > self.max_pending:
+            self.file.write(self.pending.popleft().result())
+
+    def close(self):
+        while self.pending:
+            self.file.write(self.pending.popleft().result())
+        self.file.close()
+
+
+def open_input(path):
+    """
+    Open a plain, gzip or zstd compressed text file for reading, based on its extension
+    """
+    path = str(path)
+    if path.endswith(".gz"):
+        return open_gzip(path)
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError(f"Reading {path} needs the zstandard package, installed with the zstd extra")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True,
+                                                             closefd=True)
+        return io.TextIOWrapper(reader)
+    return open(path, "r")
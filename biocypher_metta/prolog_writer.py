@@ -4,80 +4,125 @@ import pathlib
 import os
 from biocypher._logger import logger
 import networkx as nx
+from biocypher_metta.metta_writer import EntitySink, OutputCodecMixin, ProvenanceReferences, DEFAULT_BUFFER_SIZE, \
+    PROVENANCE_MODES
+from biocypher_metta.schema_cache import SchemaCache, DEFAULT_CACHE_DIR
 
-class PrologWriter:
+class PrologWriter(OutputCodecMixin):
+    NODES_FILE = "nodes.pl"
+    EDGES_FILE = "edges.pl"
 
     def __init__(self, schema_config, biocypher_config,
-                 output_dir):
+                 output_dir, buffer_size=DEFAULT_BUFFER_SIZE,
+                 codec=None, compression_level=None, compression_threads=None,
+                 schema_cache_dir=DEFAULT_CACHE_DIR, provenance="inline"):
         self.schema_config = schema_config
         self.biocypher_config = biocypher_config
         self.output_path = pathlib.Path(output_dir)
+        self.buffer_size = buffer_size
+        self.init_output_codec(codec, compression_level, compression_threads)
+        if provenance not in PROVENANCE_MODES:
+            raise ValueError(f"Unknown provenance mode {provenance}, expected one of {', '.join(PROVENANCE_MODES)}")
+        self.provenance = provenance
 
         if not os.path.exists(output_dir):
             self.output_path.mkdir()
 
-        self.bcy = BioCypher(schema_config_path=schema_config,
-                             biocypher_config_path=biocypher_config)
-
-        self.onotology = self.bcy._get_ontology()
-        self.create_edge_types()
+        self._bcy = None
+        schema_cache = SchemaCache(schema_cache_dir, type(self), schema_config, biocypher_config)
+        cached = schema_cache.load()
+        if cached is not None:
+            self.edge_node_types = cached["edge_node_types"]
+        else:
+            self.create_edge_types()
+            schema_cache.save({"edge_node_types": self.edge_node_types})
         #self.excluded_properties = ["licence", "version", "source"]
         self.excluded_properties = []
 
 
+    @property
+    def bcy(self):
+        """
+        The BioCypher instance, started on first use
+        """
+        if self._bcy is None:
+            self._bcy = BioCypher(schema_config_path=self.schema_config,
+                                  biocypher_config_path=self.biocypher_config)
+        return self._bcy
+
+    @property
+    def onotology(self):
+        return self.bcy._get_ontology()
+
     def create_edge_types(self):
         schema = self.bcy._get_ontology_mapping()._extend_schema()
         self.edge_node_types = {}
 
         for k, v in schema.items():
             if v["represented_as"] == "edge": #(: (label $x $y) (-> source_type target_type
-                edge_type = self.convert_input_labels(k)
+                source_type = v.get("source", None)
+                target_type = v.get("target", None)
+                if source_type is None or target_type is None:
+                    continue
 
                 # ## TODO fix this in the scheme config
                 if isinstance(v["input_label"], list):
                     label = self.convert_input_labels(v["input_label"][0])
-                    source_type = self.convert_input_labels(v["source"][0])
-                    target_type = self.convert_input_labels(v["target"][0])
+                    source_type = self.convert_input_labels(source_type[0])
+                    target_type = self.convert_input_labels(target_type[0])
                 else:
                     label = self.convert_input_labels(v["input_label"])
-                    source_type = self.convert_input_labels(v["source"])
-                    target_type = self.convert_input_labels(v["target"])
-                self.edge_node_types[label.lower()] = {"source": source_type.lower(), "target": target_type.lower()}
+                    source_type = self.convert_input_labels(source_type)
+                    target_type = self.convert_input_labels(target_type)
+                output_label = v.get("output_label", None)
+                self.edge_node_types[label.lower()] = {"source": source_type.lower(), "target": target_type.lower(),
+                                                       "output_label": output_label.lower() if output_label is not None else None}
 
-    def write_nodes(self, nodes, path_prefix=None, create_dir=True):
+    def get_output_path(self, file_name, path_prefix=None, create_dir=True):
         if path_prefix is not None:
-            file_path = f"{self.output_path}/{path_prefix}/nodes.pl"
+            file_path = f"{self.output_path}/{path_prefix}/{file_name}"
             if create_dir:
                 if not os.path.exists(f"{self.output_path}/{path_prefix}"):
                     pathlib.Path(f"{self.output_path}/{path_prefix}").mkdir(parents=True, exist_ok=True)
         else:
-            file_path = f"{self.output_path}/nodes.pl"
-        with open(file_path, "a") as f:
-            for node in nodes:
-                out_str = self.write_node(node)
-                for s in out_str:
-                    f.write(s + "\n")
+            file_path = f"{self.output_path}/{file_name}"
+        return file_path
 
-            f.write("\n")
+    def node_sink(self, path_prefix=None, create_dir=True, separator=True):
+        return EntitySink(self.get_output_path(self.output_file_name(self.NODES_FILE), path_prefix, create_dir),
+                          self.serializer(self.write_node), self.buffer_size, self.open_output,
+                          separator=separator)
 
-        logger.info("Finished writing out nodes")
+    def edge_sink(self, path_prefix=None, create_dir=True, separator=True):
+        return EntitySink(self.get_output_path(self.output_file_name(self.EDGES_FILE), path_prefix, create_dir),
+                          self.serializer(self.write_edge), self.buffer_size, self.open_output,
+                          separator=separator)
 
-    def write_edges(self, edges, path_prefix=None, create_dir=True):
-        if path_prefix is not None:
-            file_path = f"{self.output_path}/{path_prefix}/edges.pl"
-            if create_dir:
-                if not os.path.exists(f"{self.output_path}/{path_prefix}"):
-                    pathlib.Path(f"{self.output_path}/{path_prefix}").mkdir(parents=True, exist_ok=True)
-        else:
-            file_path = f"{self.output_path}/edges.pl"
+    def serializer(self, serialize):
+        if self.provenance == "reference":
+            return ProvenanceReferences(serialize, self.write_provenance_record, self.write_provenance_reference)
+        return serialize
 
-        with open(file_path, "a") as f:
-            for edge in edges:
-                out_str = self.write_edge(edge)
-                for s in out_str:
-                    f.write(s + "\n")
+    def write_provenance_record(self, id, provenance):
+        return self.write_property(f"provenance({id})", provenance)
+
+    def write_provenance_reference(self, def_out, id):
+        # the first atom of an entity is its term followed by a period
+        return f"has_provenance({def_out[:-1]}, provenance({id}))."
 
-            f.write("\n")
+    def write_nodes(self, nodes, path_prefix=None, create_dir=True, separator=True):
+        with self.node_sink(path_prefix, create_dir, separator) as sink:
+            for node in nodes:
+                sink.write(node)
+
+        logger.info("Finished writing out nodes")
+        return sink
+
+    def write_edges(self, edges, path_prefix=None, create_dir=True, separator=True):
+        with self.edge_sink(path_prefix, create_dir, separator) as sink:
+            for edge in edges:
+                sink.write(edge)
+        return sink
 
     def write_node(self, node):
         id, label, properties = node
@@ -111,9 +156,10 @@ class PrologWriter:
                 for i, e in enumerate(v):
                     prop += f'{self.check_property(e)}'
                     if i != len(v) - 1: prop += ","
-                prop += "]."
+                prop += "]"
+                out_str.append(f'{k}({def_out}, {prop}).')
             elif isinstance(v, dict):
-                prop = f"{k}({def_out})."
+                prop = f"{k}({def_out})"
                 out_str.extend(self.write_property(prop, v))
             else:
                 out_str.append(f'{k}({def_out}, {self.check_property(v)}).')
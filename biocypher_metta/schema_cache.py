@@ -0,0 +1,57 @@
+# On-disk cache of what the writers derive from the BioCypher schema (type definitions, edge node types), so a
+# writer whose configs haven't changed doesn't have to build the BioCypher ontology. Entries are keyed by a hash
+# of the schema and BioCypher configs, of the writer's source and of the BioCypher version.
+import hashlib
+import inspect
+import json
+import os
+import pathlib
+import tempfile
+import biocypher
+from biocypher._logger import logger
+from biocypher_metta.build_manifest import hash_file
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+                                 "biocypher-metta", "schema")
+
+
+class SchemaCache:
+    """
+    Cache entry of the schema artifacts of a writer class for a pair of configs
+    :param cache_dir: directory of the cache, None to disable it
+    :param writer_cls: the writer class, its source is part of the key so code changes invalidate the entry
+    """
+    def __init__(self, cache_dir, writer_cls, schema_config, biocypher_config):
+        self.cache_dir = None if cache_dir is None else pathlib.Path(cache_dir)
+        if self.cache_dir is None:
+            return
+        h = hashlib.sha256()
+        for path in (schema_config, biocypher_config, inspect.getsourcefile(writer_cls)):
+            h.update(hash_file(path).encode())
+        h.update(f"{writer_cls.__name__} {biocypher.__version__}".encode())
+        self.path = self.cache_dir.joinpath(f"{writer_cls.__name__.lower()}-{h.hexdigest()}.json")
+
+    def load(self):
+        """
+        :return: the cached artifacts, or None if there are none
+        """
+        if self.cache_dir is None or not self.path.exists():
+            return None
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable schema cache {self.path}: {e}")
+            return None
+
+    def save(self, artifacts):
+        if self.cache_dir is None:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # renamed into place, so concurrent writers never read a partial entry
+            with tempfile.NamedTemporaryFile("w", dir=self.cache_dir, suffix=".tmp", delete=False) as f:
+                json.dump(artifacts, f)
+            os.replace(f.name, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save the schema cache to {self.cache_dir}: {e}")
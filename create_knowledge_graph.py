@@ -2,38 +2,618 @@
 Knowledge graph generation through BioCypher script
 """
 from biocypher_metta.metta_writer import *
+from biocypher_metta.prolog_writer import PrologWriter
+from biocypher_metta.neo4j_writer import Neo4jWriter, NEO4J_DIR
+from biocypher_metta.composite_writer import CompositeWriter, PARALLELISM
+from biocypher_metta.entity_store import EntityStoreWriter, StoreAdapter, STORE_DIR
+from biocypher_metta.metta_index import index_path, merge_indexes
+from biocypher_metta.schema_cache import DEFAULT_CACHE_DIR
 from biocypher._logger import logger
 import typer
 import yaml
 import importlib #for reflection
+import inspect
+import copy
+import contextlib
+from enum import Enum
 from typing_extensions import Annotated
+from typing import Optional
 import pickle
+import json
+import shutil
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from biocypher_metta.adapters.readers import SOURCE_READERS
+from biocypher_metta.adapters.input_chunks import is_splittable
+from biocypher_metta.adapters.region_filter import RegionFilter
+from biocypher_metta.dbsnp_index import DbsnpIndex
+from biocypher_metta.build_manifest import BuildManifest, hash_file
+from biocypher_metta.output_codecs import CODECS
+from biocypher_metta.build_metrics import ResourceMonitor, sink_counts, entry_metrics, directory_size, write_report, \
+    format_summary
 
 app = typer.Typer()
 
+SCHEMA_CONFIG = "config/schema_config.yaml"
+BIOCYPHER_CONFIG = "config/biocypher_config.yaml"
+STAGING_DIR = ".staging"
+# subdirectory of STAGING_DIR the running jobs write to, the outputs are moved out of it when the job completes
+PARTIAL_DIR = ".partial"
+JOURNAL_FILE = "build_journal.jsonl"
+TIMINGS_FILE = "adapter_timings.json"
+CHROMOSOMES = [f"chr{c}" for c in list(range(1, 23)) + ["X", "Y", "M"]]
+
+
+class ShardBy(str, Enum):
+    chromosome = "chromosome"
+
+
+OutputCodec = Enum("OutputCodec", {codec: codec for codec in CODECS}, type=str)
+FormatParallelism = Enum("FormatParallelism", {p: p for p in PARALLELISM}, type=str)
+ProvenanceMode = Enum("ProvenanceMode", {m: m for m in PROVENANCE_MODES}, type=str)
+
+WRITERS = {"metta": MeTTaWriter, "prolog": PrologWriter, "neo4j": Neo4jWriter, "store": EntityStoreWriter}
+# writer options taken by each writer
+FILE_OPTIONS = ["buffer_size", "codec", "compression_level", "compression_threads", "schema_cache_dir", "provenance"]
+WRITER_OPTIONS = {"metta": FILE_OPTIONS + ["index"], "prolog": FILE_OPTIONS, "neo4j": [], "store": []}
+# writer options changing the content of the output files, part of the fingerprint of incremental builds
+OUTPUT_OPTIONS = ["provenance", "index"]
+
+
+# Set in the parent process before the worker pool is forked, so the workers inherit the dbsnp maps
+# instead of receiving a pickled copy per task
+_dbsnp_rsids_dict = None
+_dbsnp_pos_dict = None
+_dbsnp_index = None
+# (sample_size, sample_fraction) applied to every adapter, see Adapter.set_sampling
+_sampling = (None, None)
+# Regions the positional adapters are restricted to, see Adapter.set_region_filter
+_region_filter = None
+# Per worker process writer, created once by _init_worker
+_worker_writer = None
+# Entity store the nodes and edges are read from instead of running the adapters, and the properties left out
+_from_store = None
+_excluded_properties = ()
+
+
+def create_writer(output_dir, formats, writer_options, parallelism="none"):
+    """
+    :param formats: names of the output formats, keys of WRITERS
+    :param writer_options: options of the writers, each writer gets those listed in WRITER_OPTIONS
+    :return: CompositeWriter writing every node and edge in each of the formats
+    """
+    writers = {}
+    for fmt in formats:
+        options = {k: v for k, v in writer_options.items() if k in WRITER_OPTIONS[fmt]}
+        writers[fmt] = WRITERS[fmt](schema_config=SCHEMA_CONFIG,
+                                    biocypher_config=BIOCYPHER_CONFIG,
+                                    output_dir=output_dir,
+                                    **options)
+    return CompositeWriter(writers, parallelism)
+
+
+def get_adapter_class(config):
+    adapter_config = config["adapter"]
+    adapter_module = importlib.import_module(adapter_config["module"])
+    return getattr(adapter_module, adapter_config["cls"])
+
+
+def create_adapter(name, config, write_properties, add_provenance):
+    if _from_store is not None:
+        adapter = StoreAdapter(_from_store.joinpath(name), write_properties, add_provenance, _excluded_properties)
+        adapter.set_sampling(*_sampling)
+        return adapter
+    adapter_cls = get_adapter_class(config)
+    ctr_args = dict(config["adapter"]["args"])
+    if "dbsnp_rsid_map" in ctr_args: #this for dbs that use grch37 assembly and to map grch37 to grch38
+        ctr_args["dbsnp_rsid_map"] = _dbsnp_rsids_dict
+    if "dbsnp_pos_map" in ctr_args:
+        if _dbsnp_index is not None and "shard" in config:
+            # a chromosome shard only looks up positions on its own chromosome
+            ctr_args["dbsnp_pos_map"] = DbsnpIndex(_dbsnp_index.index_path, chromosomes=[config["shard"]]).pos_map()
+        else:
+            ctr_args["dbsnp_pos_map"] = _dbsnp_pos_dict
+    ctr_args["write_properties"] = write_properties
+    ctr_args["add_provenance"] = add_provenance
+    adapter = adapter_cls(**ctr_args)
+    adapter.set_sampling(*_sampling)
+    adapter.set_region_filter(_region_filter)
+    if "chunk" in config:
+        adapter.set_chunk(*config["chunk"])
+    return adapter
+
+
+def ends_output(config):
+    """
+    :return: False if the output of the entry is followed by that of the next chunk of its input in the same files,
+    so no separator is written after it
+    """
+    if "chunk" not in config or not config.get("merged"):
+        return True
+    index, count = config["chunk"]
+    return index == count - 1
+
+
+def run_adapter(bc, name, config, path_prefix, write_properties, add_provenance):
+    """
+    Instantiate the adapter described by a single adapters config entry and write its nodes and/or edges
+    :param bc: the CompositeWriter to write the output with
+    :param name: name of the config entry
+    :param config: the config entry
+    :param path_prefix: output directory of the entry, relative to the output path of the writer
+    :return: the sink_counts of the entry by entry name and the time spent producing its nodes and edges
+    """
+    logger.info(f"Running adapter: {name}")
+    adapter = create_adapter(name, config, write_properties, add_provenance)
+    sinks = []
+    start = time.perf_counter()
+
+    if config["nodes"]:
+        nodes = adapter.sample_nodes(adapter.get_nodes())
+        sinks.append(bc.write_nodes(nodes, path_prefix=path_prefix, separator=ends_output(config)))
+
+    if config["edges"]:
+        edges = adapter.sample_edges(adapter.get_edges())
+        sinks.append(bc.write_edges(edges, path_prefix=path_prefix, separator=ends_output(config)))
+
+    counts = sink_counts(sinks)
+    return {name: counts}, time.perf_counter() - start - counts["serialize_time"]
+
+
+def run_shared_scan(bc, names, adapters_dict, staging_prefix, write_properties, add_provenance):
+    """
+    Run config entries whose adapters read the same input file. The file is read and parsed once by the
+    shared reader of its format and every record is handed to each of the adapters. Each entry is written to
+    its own staging directory so entries sharing an outdir don't interleave their output.
+    :return: the sink_counts of each entry by entry name and the time spent reading and processing the records
+    """
+    logger.info(f"Running adapters: {', '.join(names)} with a shared scan")
+    first_config = adapters_dict[names[0]]
+    source_format = get_adapter_class(first_config).SOURCE_FORMAT
+    filepath = first_config["adapter"]["args"]["filepath"]
+    reader_args = {"chunk": tuple(first_config["chunk"])} if "chunk" in first_config else {}
+
+    consumers = []
+    # the regions read by each consumer, None if it reads the whole file
+    consumer_regions = []
+    sinks = {name: [] for name in names}
+    try:
+        for name in names:
+            config = adapters_dict[name]
+            adapter = create_adapter(name, config, write_properties, add_provenance)
+            path_prefix = f"{staging_prefix}{name}/{config['outdir']}"
+            if config["nodes"]:
+                sinks[name].append(bc.node_sink(path_prefix, separator=ends_output(config)))
+                consumers.append((adapter, adapter.process_node_record, adapter.keep_node, sinks[name][-1]))
+                consumer_regions.append(adapter.read_regions() if "nodes" in adapter.POSITIONAL_OUTPUTS else None)
+            if config["edges"]:
+                sinks[name].append(bc.edge_sink(path_prefix, separator=ends_output(config)))
+                consumers.append((adapter, adapter.process_edge_record, adapter.keep_edge, sinks[name][-1]))
+                consumer_regions.append(adapter.read_regions() if "edges" in adapter.POSITIONAL_OUTPUTS else None)
+        # the file is read in the union of the regions of the consumers, if the reader can seek to them
+        reader = SOURCE_READERS[source_format]
+        if ("regions" in inspect.signature(reader).parameters and "chunk" not in first_config
+                and all(regions is not None for regions in consumer_regions)):
+            reader_args["regions"] = [region for regions in consumer_regions for region in regions]
+
+        start = time.perf_counter()
+        with contextlib.closing(reader(filepath, **reader_args)) as records:
+            for record in records:
+                for adapter, process_record, keep, sink in consumers:
+                    # the sample limit is checked before processing the record, so the generators of the adapters
+                    # are run to the end rather than abandoned at a yield
+                    if adapter.sample_size is not None and sink.records >= adapter.sample_size:
+                        continue
+                    for entity in process_record(record):
+                        if keep(entity) and (adapter.sample_size is None or sink.records < adapter.sample_size):
+                            sink.write(entity)
+                if all(a.sample_size is not None and sink.records >= a.sample_size for a, *_, sink in consumers):
+                    break
+        elapsed = time.perf_counter() - start
+    finally:
+        for *_, sink in consumers:
+            sink.close()
+
+    counts = {name: sink_counts(entry_sinks) for name, entry_sinks in sinks.items()}
+    return counts, elapsed - sum(c["serialize_time"] for c in counts.values())
+
+
+def shard_by_chromosome(adapters_dict, chromosomes):
+    """
+    Replace every entry whose adapter filters its input by location (takes a chr argument) and isn't already
+    restricted to a chromosome with one entry per chromosome, named <name>.<chr> and writing to <outdir>/<chr>.
+    Other entries are kept as they are, including those writing outputs the adapter doesn't filter by location
+    (see Adapter.POSITIONAL_OUTPUTS), which every shard would write in full.
+    """
+    sharded = {}
+    for name, config in adapters_dict.items():
+        adapter_class = get_adapter_class(config)
+        params = inspect.signature(adapter_class.__init__).parameters
+        outputs = [output for output in ("nodes", "edges") if config[output]]
+        if ("chr" not in params or config["adapter"]["args"].get("chr") is not None
+                or any(output not in adapter_class.POSITIONAL_OUTPUTS for output in outputs)):
+            sharded[name] = config
+            continue
+        for chr in chromosomes:
+            shard = copy.deepcopy(config)
+            shard["adapter"]["args"]["chr"] = chr
+            shard["outdir"] = f"{config['outdir']}/{chr}"
+            shard["shard"] = chr
+            sharded[f"{name}.{chr}"] = shard
+    return sharded
+
+
+def split_inputs(adapters_dict, count, merge=True):
+    """
+    Replace every entry whose adapter can read a chunk of its input (see Adapter.SPLITTABLE) with count entries,
+    each reading one chunk of the input, named <name>.chunk<i>. The chunks write to the outdir of the entry, so
+    its output files are the outputs of the chunks concatenated in file order, with the nodes and edges in the
+    same order as when the input isn't split (see ends_output). If merge is False each chunk writes to
+    <outdir>/chunk<i> instead.
+    Entries whose input can't be split (plain gzip files) or that are restricted to a chromosome are kept as they are.
+    """
+    split = {}
+    width = len(str(count - 1))
+    for name, config in adapters_dict.items():
+        args = config["adapter"]["args"]
+        if (not get_adapter_class(config).SPLITTABLE or args.get("filepath") is None or args.get("chr") is not None
+                or not is_splittable(args["filepath"])):
+            split[name] = config
+            continue
+        for index in range(count):
+            suffix = f"chunk{index:0{width}d}"
+            chunk = copy.deepcopy(config)
+            chunk["chunk"] = [index, count]
+            chunk["merged"] = merge
+            if not merge:
+                chunk["outdir"] = f"{config['outdir']}/{suffix}"
+            split[f"{name}.{suffix}"] = chunk
+    return split
+
+
+def plan_jobs(adapters_dict, shared_scan):
+    """
+    Split the config entries into jobs. Entries whose adapters read the same file (or chunk of a file) in a format
+    supported by a shared reader form a single job (per chromosome when sharding), every other entry is a job on
+    its own.
+    :return: list of jobs, each a list of config entry names, in config order
+    """
+    jobs = []
+    shared = {}
+    for name, config in adapters_dict.items():
+        source_format = get_adapter_class(config).SOURCE_FORMAT
+        filepath = config["adapter"]["args"].get("filepath")
+        if not shared_scan or source_format is None or filepath is None:
+            jobs.append([name])
+            continue
+        key = (source_format, os.path.realpath(filepath), config.get("shard"), str(config.get("chunk")))
+        if key in shared:
+            shared[key].append(name)
+        else:
+            shared[key] = [name]
+            jobs.append(shared[key])
+    return jobs
+
+
+def run_job(bc, job, adapters_dict, staging_prefix, write_properties, add_provenance):
+    """
+    :param staging_prefix: prefix of the directory the entries are written to, relative to the output path of
+    the writer. Each entry is written to <staging_prefix><name>/<outdir>.
+    :return: the job, the ResourceMonitor measurements of the job, the sink_counts of its entries and its parse time
+    """
+    with ResourceMonitor() as usage:
+        if len(job) > 1:
+            counts, parse_time = run_shared_scan(bc, job, adapters_dict, staging_prefix, write_properties,
+                                                 add_provenance)
+        else:
+            name = job[0]
+            config = adapters_dict[name]
+            counts, parse_time = run_adapter(bc, name, config, f"{staging_prefix}{name}/{config['outdir']}",
+                                             write_properties, add_provenance)
+    return job, usage.as_dict(), counts, parse_time
+
+
+def _init_worker(staging_path, formats, writer_options, parallelism):
+    global _worker_writer
+    _worker_writer = create_writer(staging_path, formats, writer_options, parallelism)
+
+
+def _run_staged_job(job, adapters_dict, write_properties, add_provenance):
+    return run_job(_worker_writer, job, adapters_dict, f"{PARTIAL_DIR}/", write_properties, add_provenance)
+
+
+def schedule_jobs(jobs, timings):
+    """
+    Order the jobs longest-first using the timings of previous runs, so the slowest adapters don't end up
+    starting last. Jobs with an entry without a recorded timing are scheduled first.
+    """
+    unknown = [job for job in jobs if any(n not in timings for n in job)]
+    known = sorted((job for job in jobs if all(n in timings for n in job)),
+                   key=lambda job: max(timings[n] for n in job), reverse=True)
+    return unknown + known
+
+
+def commit_job(staging_path, job, journal):
+    """
+    Move the outputs of a completed job out of the partial directory and record its entries in the journal
+    """
+    for name in job:
+        partial_dir = staging_path.joinpath(PARTIAL_DIR, name)
+        committed_dir = staging_path.joinpath(name)
+        if committed_dir.exists(): # committed by an interrupted run that didn't get to write the journal
+            shutil.rmtree(committed_dir)
+        if partial_dir.exists():
+            os.replace(partial_dir, committed_dir)
+        journal.write(json.dumps({"entry": name}) + "\n")
+    journal.flush()
+    os.fsync(journal.fileno())
+
+
+def record_job_metrics(staging_path, metrics, job, usage, counts, parse_time):
+    for name in job:
+        bytes_written = directory_size(staging_path.joinpath(name))
+        metrics.append(entry_metrics(name, job, usage, counts[name], parse_time, bytes_written))
+
+
+def load_journal(journal_path):
+    completed = set()
+    if not journal_path.exists():
+        return completed
+    with open(journal_path, "r") as fp:
+        for line in fp:
+            try:
+                completed.add(json.loads(line)["entry"])
+            except (json.JSONDecodeError, KeyError): # last line cut short by the interruption
+                continue
+    return completed
+
+
+def merge_staged_outputs(output_dir, adapters_dict):
+    """
+    Move the per entry outputs of the staging directory to their outdir. Entries sharing an outdir are
+    concatenated in config order, so the result is the same as a sequential run. Every output file is
+    replaced atomically and the staged outputs are only removed once all the files are in place, so an
+    interrupted merge can simply be run again.
+    """
+    staging_path = output_dir.joinpath(STAGING_DIR)
+    targets = {}
+    for name, config in adapters_dict.items():
+        staged_dir = staging_path.joinpath(name, config["outdir"])
+        if not staged_dir.is_dir():
+            continue
+        for staged_file in sorted(staged_dir.iterdir()):
+            if staged_file.is_file():
+                targets.setdefault(output_dir.joinpath(config["outdir"], staged_file.name), []).append(staged_file)
+
+    for target_file, staged_files in targets.items():
+        target_file.parent.mkdir(parents=True, exist_ok=True)
+        partial_file = target_file.with_name(target_file.name + ".partial")
+        partial_file.unlink(missing_ok=True)
+        if len(staged_files) == 1:
+            try:
+                os.link(staged_files[0], partial_file)
+            except OSError:
+                shutil.copyfile(staged_files[0], partial_file)
+        else:
+            with open(partial_file, "wb") as out:
+                for staged_file in staged_files:
+                    with open(staged_file, "rb") as f:
+                        shutil.copyfileobj(f, out, 16 * 1024 * 1024)
+        os.replace(partial_file, target_file)
+        if any(index_path(f).is_dir() for f in staged_files):
+            if not merge_indexes(staged_files, target_file):
+                logger.warning(f"Not all the parts of {target_file} are indexed, its index isn't written")
+                shutil.rmtree(index_path(target_file), ignore_errors=True)
+        else: # index of a previous build
+            shutil.rmtree(index_path(target_file), ignore_errors=True)
+
+    shutil.rmtree(staging_path)
+
+
+def merge_neo4j_outputs(neo4j_writer, output_dir, adapters_dict, neo4j_dir):
+    """
+    Move the Neo4j import files of every entry from the staging directory to neo4j_dir, in config order, and
+    write the neo4j-admin import script. Run before merge_staged_outputs, which removes the staging directory.
+    """
+    staging_path = output_dir.joinpath(STAGING_DIR)
+    staged_dirs = [staging_path.joinpath(name, config["outdir"], NEO4J_DIR) for name, config in adapters_dict.items()]
+    neo4j_writer.merge_outputs([d for d in staged_dirs if d.is_dir()], neo4j_dir)
+    neo4j_writer.write_import_call(neo4j_dir)
+
+
+def merge_store_outputs(output_dir, adapters_dict, store_dir):
+    """
+    Move the entity store of every entry from the staging directory to <store_dir>/<name>, replacing the store
+    of the entry left by a previous build. Run before merge_staged_outputs, which removes the staging directory.
+    """
+    staging_path = output_dir.joinpath(STAGING_DIR)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    for name, config in adapters_dict.items():
+        staged_dir = staging_path.joinpath(name, config["outdir"], STORE_DIR)
+        if not staged_dir.is_dir():
+            continue
+        entry_dir = store_dir.joinpath(name)
+        if entry_dir.exists():
+            shutil.rmtree(entry_dir)
+        os.replace(staged_dir, entry_dir)
+
+
+def entry_outputs(config, file_names):
+    """
+    :param file_names: the names of the nodes and edges files of the writer, see CompositeWriter.output_file_names
+    """
+    outputs = set()
+    if config["nodes"]:
+        outputs.update(os.path.join(config["outdir"], f) for f in file_names["nodes"])
+    if config["edges"]:
+        outputs.update(os.path.join(config["outdir"], f) for f in file_names["edges"])
+    return outputs
+
+
+def find_stale_entries(output_dir, adapters_dict, fingerprints, manifest, file_names):
+    """
+    Find the config entries that have to be rerun: entries whose fingerprint changed or whose output is
+    missing, plus every entry writing to an output file of a stale entry, since the output files are appended
+    to and have to be rebuilt as a whole.
+    :return: the names of the stale entries in config order and the output files they write to
+    """
+    stale = {name for name, config in adapters_dict.items()
+             if not manifest.is_unchanged(name, fingerprints[name])
+             or not all(output_dir.joinpath(f).exists() for f in entry_outputs(config, file_names))}
+    stale_files = set()
+    while True:
+        stale_files = set().union(*(entry_outputs(adapters_dict[n], file_names) for n in stale))
+        more = {name for name, config in adapters_dict.items()
+                if name not in stale and entry_outputs(config, file_names) & stale_files}
+        if not more:
+            break
+        stale |= more
+    return [name for name in adapters_dict if name in stale], stale_files
+
+
+def load_timings(output_dir):
+    timings_path = output_dir.joinpath(TIMINGS_FILE)
+    if not timings_path.exists():
+        return {}
+    with open(timings_path, "r") as fp:
+        return json.load(fp)
+
+
+def save_timings(output_dir, timings):
+    with open(output_dir.joinpath(TIMINGS_FILE), "w") as fp:
+        json.dump(timings, fp, indent=2, sort_keys=True)
+
+
 # Run build
 @app.command()
 def main(output_dir: Annotated[pathlib.Path, typer.Option(exists=True, file_okay=False, dir_okay=True)],
          adapters_config: Annotated[pathlib.Path, typer.Option(exists=True, file_okay=True, dir_okay=False)],
-         dbsnp_rsids: Annotated[pathlib.Path, typer.Option(exists=True, file_okay=True, dir_okay=False)],
-         dbsnp_pos: Annotated[pathlib.Path, typer.Option(exists=True, file_okay=True, dir_okay=False)],
+         dbsnp_rsids: Annotated[Optional[pathlib.Path], typer.Option(exists=True, file_okay=True, dir_okay=False)] = None,
+         dbsnp_pos: Annotated[Optional[pathlib.Path], typer.Option(exists=True, file_okay=True, dir_okay=False)] = None,
+         dbsnp_index: Annotated[Optional[pathlib.Path], typer.Option(exists=True, file_okay=False, dir_okay=True,
+                                help="dbSNP index built by scripts/build_dbsnp_index.py, used instead of the pickled maps")] = None,
          write_properties: bool = typer.Option(True, help="Write properties to nodes and edges"),
-         add_provenance: bool = typer.Option(True, help="Add provenance to nodes and edges")):
+         add_provenance: bool = typer.Option(True, help="Add provenance to nodes and edges"),
+         workers: int = typer.Option(1, min=1, help="Number of worker processes to run the adapters in"),
+         shared_scan: bool = typer.Option(True, help="Read input files shared by several adapters only once"),
+         incremental: bool = typer.Option(False, help="Only rerun the adapters whose inputs, arguments or schema "
+                                                      "changed since the last incremental build of output_dir"),
+         resume: bool = typer.Option(False, help="Resume an interrupted build of output_dir, skipping the adapters "
+                                                 "it completed"),
+         shard_by: Optional[ShardBy] = typer.Option(None, help="Split the adapters filtering their input by location "
+                                                               "into one job per chromosome, written to <outdir>/<chr>"),
+         chromosomes: str = typer.Option(",".join(CHROMOSOMES), help="Comma separated chromosomes to build when sharding"),
+         split_input: int = typer.Option(1, min=1, help="Split the input file of the adapters that can read a chunk of "
+                                                        "it into this many chunks, each run as its own job, so a "
+                                                        "single large input is parsed by several workers. Ignored "
+                                                        "with --sample, which only reads the start of each input"),
+         merge_chunks: bool = typer.Option(True, help="Concatenate the outputs of the chunks of an input in file "
+                                                      "order, otherwise each chunk is written to <outdir>/chunk<i>"),
+         sample: Optional[int] = typer.Option(None, min=1, help="Only write the first N nodes and edges of each adapter"),
+         sample_fraction: Optional[float] = typer.Option(None, min=0, max=1,
+                                                         help="Only write a deterministic sample of this fraction of "
+                                                              "the node ids, and the edges between sampled nodes"),
+         regions: Optional[pathlib.Path] = typer.Option(None, exists=True, file_okay=True, dir_okay=False,
+                                                        help="BED file of the regions the nodes and edges of the "
+                                                             "positional adapters are restricted to"),
+         region_overlap: bool = typer.Option(False, help="Keep the nodes and edges overlapping a region of --regions, "
+                                                         "instead of only those contained in one"),
+         buffer_size: int = typer.Option(DEFAULT_BUFFER_SIZE, min=1,
+                                         help="Characters of output buffered per file before it is written"),
+         output_codec: OutputCodec = typer.Option(OutputCodec.none, help="Compression of the node and edge files"),
+         compression_level: Optional[int] = typer.Option(None, help="Compression level, the codec's default if not set"),
+         compression_threads: Optional[int] = typer.Option(None, min=1, help="Threads compressing the output of "
+                                                           "each process, the CPUs divided by the workers if not set"),
+         formats: str = typer.Option("metta", help=f"Comma separated output formats, from {', '.join(WRITERS)}. "
+                                                   "Each adapter is run once whatever the number of formats"),
+         format_parallelism: FormatParallelism = typer.Option(FormatParallelism.none,
+                                                              help="Encode each output format in its own thread "
+                                                                   "or process"),
+         neo4j_dir: Optional[pathlib.Path] = typer.Option(None, file_okay=False, dir_okay=True,
+                                                          help="Directory of the Neo4j import files, "
+                                                               "<output_dir>/neo4j if not set"),
+         store_dir: Optional[pathlib.Path] = typer.Option(None, file_okay=False, dir_okay=True,
+                                                          help="Directory the store output format saves the nodes "
+                                                               "and edges of each adapter to, <output_dir>/store if "
+                                                               "not set"),
+         from_store: Optional[pathlib.Path] = typer.Option(None, exists=True, file_okay=False, dir_okay=True,
+                                                           help="Render the nodes and edges saved in this store "
+                                                                "instead of running the adapters"),
+         exclude_properties: str = typer.Option("", help="Comma separated properties left out when rendering "
+                                                         "from the store"),
+         index_output: bool = typer.Option(False, help="Write a sidecar index of each MeTTa nodes and edges file "
+                                                       "for random access, see scripts/metta_lookup.py"),
+         schema_cache: bool = typer.Option(True, help="Reuse the type definitions derived from the schema by "
+                                                      "previous runs while the configs are unchanged"),
+         schema_cache_dir: pathlib.Path = typer.Option(DEFAULT_CACHE_DIR, file_okay=False, dir_okay=True,
+                                                       help="Directory of the schema cache"),
+         provenance_mode: ProvenanceMode = typer.Option(ProvenanceMode.inline,
+                                                        help="Write the source and source_url of every node and edge "
+                                                             "inline, or as a provenance record written once per file "
+                                                             "and referenced by each node and edge. A record is "
+                                                             "written once per adapter output, so it is repeated "
+                                                             "in files shared by several adapters or chunks of "
+                                                             "--split-input")):
     """
     Main function. Call individual adapters to download and process data. Build
     via BioCypher from node and edge data.
     """
+    global _dbsnp_rsids_dict, _dbsnp_pos_dict, _dbsnp_index, _sampling, _region_filter, _from_store, \
+        _excluded_properties
+
+    if sample is not None and sample_fraction is not None:
+        raise typer.BadParameter("--sample and --sample-fraction can't be used together")
+    _sampling = (sample, sample_fraction)
+    if regions is not None:
+        if from_store is not None:
+            raise typer.BadParameter("--regions can't be used with --from-store")
+        _region_filter = RegionFilter.from_bed(regions, region_overlap)
+
+    formats = [f.strip() for f in formats.split(",") if f.strip()]
+    unknown_formats = [f for f in formats if f not in WRITERS]
+    if not formats or unknown_formats:
+        raise typer.BadParameter(f"Unknown output formats {', '.join(unknown_formats)}, expected some of "
+                                 f"{', '.join(WRITERS)}")
+    if incremental and "neo4j" in formats:
+        # the import files of all the adapters are merged into a single directory, they can't be rebuilt per adapter
+        raise typer.BadParameter("--incremental doesn't support the neo4j output format")
+    if from_store is not None:
+        if "store" in formats:
+            raise typer.BadParameter("--from-store can't write the store output format")
+        if incremental:
+            raise typer.BadParameter("--incremental can't be used with --from-store")
+        if split_input > 1:
+            raise typer.BadParameter("--split-input can't be used with --from-store")
+        _from_store = from_store
+        _excluded_properties = [p.strip() for p in exclude_properties.split(",") if p.strip()]
+        # the store has one stream per entry, there is no shared source file to scan
+        shared_scan = False
+    elif exclude_properties:
+        raise typer.BadParameter("--exclude-properties only applies to --from-store")
 
     # Start biocypher
-    logger.info("Loading dbsnp rsids map")
-    dbsnp_rsids_dict = pickle.load(open(dbsnp_rsids, 'rb'))
-    logger.info("Loading dbsnp pos map")
-    dbsnp_pos_dict = pickle.load(open(dbsnp_pos, 'rb'))
+    if dbsnp_index is not None:
+        logger.info("Opening dbsnp index")
+        _dbsnp_index = DbsnpIndex(dbsnp_index)
+        _dbsnp_rsids_dict = _dbsnp_index.rsid_map()
+        _dbsnp_pos_dict = _dbsnp_index.pos_map()
+    else:
+        if dbsnp_rsids is not None:
+            logger.info("Loading dbsnp rsids map")
+            _dbsnp_rsids_dict = pickle.load(open(dbsnp_rsids, 'rb'))
+        if dbsnp_pos is not None:
+            logger.info("Loading dbsnp pos map")
+            _dbsnp_pos_dict = pickle.load(open(dbsnp_pos, 'rb'))
 
 
-    bc = MeTTaWriter(schema_config="config/schema_config.yaml",
-                     biocypher_config="config/biocypher_config.yaml",
-                     output_dir=output_dir)
+    if index_output and output_codec != OutputCodec.none:
+        raise typer.BadParameter("--index-output needs uncompressed output files")
+    writer_options = {"buffer_size": buffer_size, "codec": output_codec.value, "compression_level": compression_level,
+                      "compression_threads": compression_threads or max(1, os.cpu_count() // workers),
+                      "index": index_output, "schema_cache_dir": schema_cache_dir if schema_cache else None,
+                      "provenance": provenance_mode.value}
+    bc = create_writer(output_dir, formats, writer_options, format_parallelism.value)
 
     # bc.show_ontology_structure()
 
@@ -46,32 +626,102 @@ def main(output_dir: Annotated[pathlib.Path, typer.Option(exists=True, file_okay
             logger.error(f"Error while trying to load adapter config")
             logger.error(e)
 
-    for c in adapters_dict:
-        logger.info(f"Running adapter: {c}")
-        adapter_config = adapters_dict[c]["adapter"]
-        adapter_module = importlib.import_module(adapter_config["module"])
-        adapter_cls = getattr(adapter_module, adapter_config["cls"])
-        ctr_args = adapter_config["args"]
-        if "dbsnp_rsid_map" in ctr_args: #this for dbs that use grch37 assembly and to map grch37 to grch38
-            ctr_args["dbsnp_rsid_map"] = dbsnp_rsids_dict
-        if "dbsnp_pos_map" in ctr_args:
-            ctr_args["dbsnp_pos_map"] = dbsnp_pos_dict
-        ctr_args["write_properties"] = write_properties
-        ctr_args["add_provenance"] = add_provenance
-        adapter = adapter_cls(**ctr_args)
-        write_nodes = adapters_dict[c]["nodes"]
-        write_edges = adapters_dict[c]["edges"]
-        outdir = adapters_dict[c]["outdir"]
-
-        if write_nodes:
-            nodes = adapter.get_nodes()
-            bc.write_nodes(nodes, path_prefix=outdir)
-
-        if write_edges:
-            edges = adapter.get_edges()
-            bc.write_edges(edges, path_prefix=outdir)
+    if shard_by == ShardBy.chromosome:
+        adapters_dict = shard_by_chromosome(adapters_dict, [c.strip() for c in chromosomes.split(",") if c.strip()])
+    if split_input > 1 and sample is not None:
+        # every chunk would write its own first N nodes and edges, the first N of the input are in the first chunk
+        logger.info("Not splitting the inputs, --sample only reads the start of each input")
+    elif split_input > 1:
+        adapters_dict = split_inputs(adapters_dict, split_input, merge_chunks)
+
+    # Each job writes to the partial directory, its outputs are committed to the staging directory and recorded in
+    # the journal when it completes, and all the committed outputs are moved to their outdir at the end
+    staging_path = output_dir.joinpath(STAGING_DIR)
+    journal_path = output_dir.joinpath(JOURNAL_FILE)
+    completed = set()
+    if resume:
+        completed = {name for name in load_journal(journal_path) if staging_path.joinpath(name).is_dir()}
+        # outputs of the jobs that were running when the build was interrupted
+        shutil.rmtree(staging_path.joinpath(PARTIAL_DIR), ignore_errors=True)
+    else: # leftovers of an interrupted run
+        shutil.rmtree(staging_path, ignore_errors=True)
+        journal_path.unlink(missing_ok=True)
+
+    manifest = None
+    if incremental:
+        manifest = BuildManifest(output_dir)
+        schema_hash = hash_file(SCHEMA_CONFIG)
+        dbsnp_sources = {"dbsnp_rsid_map": dbsnp_index or dbsnp_rsids, "dbsnp_pos_map": dbsnp_index or dbsnp_pos}
+        fingerprints = {name: manifest.fingerprint(config, write_properties, add_provenance, schema_hash,
+                                                   substitutions=dbsnp_sources, sampling=_sampling,
+                                                   regions=(hash_file(regions), region_overlap) if regions else None,
+                                                   writer_options={k: writer_options[k] for k in OUTPUT_OPTIONS})
+                        for name, config in adapters_dict.items()}
+        stale, stale_files = find_stale_entries(output_dir, adapters_dict, fingerprints, manifest,
+                                                bc.output_file_names())
+        logger.info(f"Skipping {len(adapters_dict) - len(stale)} unchanged adapters, rebuilding {len(stale)}")
+        for file in stale_files:
+            output_dir.joinpath(file).unlink(missing_ok=True)
+        # saved before running, so outputs left incomplete by an interrupted build are never considered up to date
+        for name in stale:
+            manifest.forget(name)
+        manifest.save()
+        adapters_dict = {name: adapters_dict[name] for name in stale}
+
+    pending = {name: config for name, config in adapters_dict.items() if name not in completed}
+    if resume:
+        logger.info(f"Resuming build, skipping {len(adapters_dict) - len(pending)} completed adapters")
+
+    timings = load_timings(output_dir)
+    jobs = plan_jobs(pending, shared_scan)
+    staging_path.mkdir(exist_ok=True)
+    metrics = []
+
+    try:
+        with open(journal_path, "a") as journal:
+            if workers == 1:
+                for job in jobs:
+                    _, usage, counts, parse_time = run_job(bc, job, pending, f"{STAGING_DIR}/{PARTIAL_DIR}/",
+                                                           write_properties, add_provenance)
+                    commit_job(staging_path, job, journal)
+                    record_job_metrics(staging_path, metrics, job, usage, counts, parse_time)
+                    for c in job:
+                        timings[c] = usage["wall_time"]
+            else:
+                jobs = schedule_jobs(jobs, timings)
+                logger.info(f"Running {len(jobs)} adapter jobs on {workers} workers")
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"),
+                                         initializer=_init_worker,
+                                         initargs=(staging_path, formats, writer_options,
+                                                   format_parallelism.value)) as pool:
+                    futures = [pool.submit(_run_staged_job, job, pending, write_properties, add_provenance)
+                               for job in jobs]
+                    for future in as_completed(futures):
+                        job, usage, counts, parse_time = future.result()
+                        commit_job(staging_path, job, journal)
+                        record_job_metrics(staging_path, metrics, job, usage, counts, parse_time)
+                        for c in job:
+                            timings[c] = usage["wall_time"]
+                        logger.info(f"Finished adapters: {', '.join(job)} in {usage['wall_time']:.1f}s")
+
+        if "neo4j" in bc.writers:
+            merge_neo4j_outputs(bc.writers["neo4j"], output_dir, adapters_dict,
+                                neo4j_dir or output_dir.joinpath(NEO4J_DIR))
+        if "store" in bc.writers:
+            merge_store_outputs(output_dir, adapters_dict, store_dir or output_dir.joinpath(STORE_DIR))
+        merge_staged_outputs(output_dir, adapters_dict)
 
+        if manifest is not None:
+            for name in adapters_dict:
+                manifest.record(name, fingerprints[name])
+            manifest.save()
+        journal_path.unlink()
+    finally:
+        save_timings(output_dir, timings)
+        write_report(output_dir, metrics)
 
+    if metrics:
+        logger.info("Adapter metrics:\n" + format_summary(metrics))
     logger.info("Done")
 
 if __name__ == "__main__":
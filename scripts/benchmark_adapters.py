@@ -0,0 +1,59 @@
+# Benchmarks the adapters of an adapters config (the sample files by default) alone and through MeTTaWriter,
+# and optionally compares the throughput with a saved baseline
+import pathlib
+import sys
+import tempfile
+import typer
+import yaml
+from typing import Optional
+from typing_extensions import Annotated
+from biocypher._logger import logger
+from biocypher_metta.metta_writer import MeTTaWriter
+from biocypher_metta.benchmark import load_dbsnp_maps, run_benchmarks, find_regressions, load_baseline, \
+    save_baseline, format_results
+
+app = typer.Typer()
+
+@app.command()
+def main(adapters_config: Annotated[pathlib.Path, typer.Option(exists=True, file_okay=True, dir_okay=False)] =
+                pathlib.Path("config/adapters_config_sample.yaml"),
+         entries: Annotated[Optional[str], typer.Option(help="Comma separated config entries to run, all if not set")] = None,
+         dbsnp_rsids: Annotated[Optional[pathlib.Path], typer.Option(exists=True, file_okay=True, dir_okay=False)] = None,
+         dbsnp_pos: Annotated[Optional[pathlib.Path], typer.Option(exists=True, file_okay=True, dir_okay=False)] = None,
+         dbsnp_index: Annotated[Optional[pathlib.Path], typer.Option(exists=True, file_okay=False, dir_okay=True)] = None,
+         repeat: int = typer.Option(3, min=1, help="Number of timed runs per benchmark, the best one is kept"),
+         allocations: bool = typer.Option(True, help="Measure the bytes allocated per record with tracemalloc"),
+         baseline: Annotated[Optional[pathlib.Path], typer.Option(help="Baseline results to compare with")] = None,
+         save: bool = typer.Option(False, help="Save the results as the new baseline"),
+         tolerance: float = typer.Option(0.2, min=0, max=1, help="Records/sec drop from the baseline reported as a regression")):
+    with open(adapters_config, "r") as fp:
+        adapters_dict = yaml.safe_load(fp)
+    if entries is not None:
+        names = [e.strip() for e in entries.split(",")]
+        adapters_dict = {name: adapters_dict[name] for name in names}
+
+    dbsnp_maps = load_dbsnp_maps(dbsnp_rsids, dbsnp_pos, dbsnp_index)
+    with tempfile.TemporaryDirectory() as output_dir:
+        writer = MeTTaWriter(schema_config="config/schema_config.yaml",
+                             biocypher_config="config/biocypher_config.yaml",
+                             output_dir=output_dir)
+        results = run_benchmarks(adapters_dict, writer, dbsnp_maps, repeat=repeat, allocations=allocations)
+
+    baseline_results = load_baseline(baseline) if baseline is not None and baseline.exists() else None
+    print(format_results(results, baseline_results))
+
+    if save:
+        if baseline is None:
+            raise typer.BadParameter("--save needs --baseline")
+        save_baseline(baseline, results)
+        logger.info(f"Saved baseline to {baseline}")
+    elif baseline_results is not None:
+        regressions = find_regressions(results, baseline_results, tolerance)
+        for name, mode, base, current in regressions:
+            logger.error(f"Regression in {name} ({mode}): {current:.0f} records/s, baseline {base:.0f} records/s")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,117 @@
+# Microbenchmark of MeTTaWriter's compiled serializers against the previous write_property implementation, on
+# synthetic FAVOR-like records with many properties. Also checks that both produce the same atoms.
+import random
+import tempfile
+import timeit
+import typer
+from biocypher_metta.metta_writer import MeTTaWriter
+
+app = typer.Typer()
+
+
+def legacy_check_property(prop):
+    if isinstance(prop, str):
+        if " " in prop:
+            prop = prop.replace(" ", "_")
+
+        special_chars = ["(", ")"]
+        escape_char = "\\"
+        return "".join(escape_char + c if c in special_chars or c == escape_char else c for c in prop)
+
+    return prop
+
+
+def legacy_write_property(def_out, property):
+    out_str = [def_out]
+    for k, v in property.items():
+        if v is None or v == "": continue
+        if isinstance(v, list):
+            prop = "("
+            for i, e in enumerate(v):
+                prop += f'{legacy_check_property(e)}'
+                if i != len(v) - 1: prop += " "
+            prop += ")"
+            out_str.append(f'({k} {def_out} {prop})')
+        elif isinstance(v, dict):
+            prop = f"({k} {def_out})"
+            out_str.extend(legacy_write_property(prop, v))
+        else:
+            out_str.append(f'({k} {def_out} {legacy_check_property(v)})')
+    return out_str
+
+
+def legacy_write_node(writer, node):
+    id, label, properties = node
+    if "." in label:
+        label = label.split(".")[1]
+    def_out = f"({writer.convert_input_labels(label)} {id})"
+    return legacy_write_property(def_out, properties)
+
+
+def legacy_write_edge(writer, edge):
+    source_id, target_id, label, properties = edge
+    label = label.lower()
+    source_type = writer.edge_node_types[label]["source"]
+    target_type = writer.edge_node_types[label]["target"]
+    output_label = writer.edge_node_types[label]["output_label"]
+    if output_label is not None:
+        label = output_label
+    def_out = f"({label} ({source_type} {source_id}) ({target_type} {target_id}))"
+    return legacy_write_property(def_out, properties)
+
+
+def random_value(rng):
+    kind = rng.random()
+    if kind < 0.4:
+        return rng.random() * 100
+    if kind < 0.6:
+        return rng.randint(0, 10**6)
+    if kind < 0.85:
+        return rng.choice(["benign", "likely pathogenic", "exonic (splicing)", "C\\T", ""])
+    if kind < 0.9:
+        return None
+    if kind < 0.95:
+        return [rng.choice(["a b", "c(d)", "e"]) for _ in range(rng.randint(0, 4))]
+    return {"source": "FAVOR", "source_url": "http://favor.genohub.org/"}
+
+
+def make_records(rng, n, n_properties, edge_labels):
+    keys = [f"annotation_{i}" for i in range(n_properties)]
+    nodes = [(f"chr16_{rng.randint(1, 9 * 10**7)}_A_G", "snp", {k: random_value(rng) for k in keys})
+             for _ in range(n)]
+    edges = [(f"rs{i}", f"ENSG{i:011d}", rng.choice(edge_labels), {k: random_value(rng) for k in keys[:10]})
+             for i in range(n)]
+    return nodes, edges
+
+
+@app.command()
+def main(records: int = typer.Option(2000, help="Number of nodes and of edges to serialize"),
+         properties: int = typer.Option(90, help="Number of properties of each node"),
+         repeat: int = typer.Option(5, help="Number of timed runs, the best one is reported"),
+         seed: int = typer.Option(42)):
+    with tempfile.TemporaryDirectory() as output_dir:
+        writer = MeTTaWriter(schema_config="config/schema_config.yaml",
+                             biocypher_config="config/biocypher_config.yaml",
+                             output_dir=output_dir)
+    rng = random.Random(seed)
+    nodes, edges = make_records(rng, records, properties, sorted(writer.edge_node_types))
+
+    for node in nodes:
+        assert writer.write_node(node) == legacy_write_node(writer, node), node
+    for edge in edges:
+        assert writer.write_edge(edge) == legacy_write_edge(writer, edge), edge
+    print("Compiled and legacy serializers produce the same atoms")
+
+    benchmarks = {
+        "nodes": (lambda: [legacy_write_node(writer, n) for n in nodes], lambda: [writer.write_node(n) for n in nodes]),
+        "edges": (lambda: [legacy_write_edge(writer, e) for e in edges], lambda: [writer.write_edge(e) for e in edges]),
+    }
+    for kind, (legacy, compiled) in benchmarks.items():
+        legacy_time = min(timeit.repeat(legacy, number=1, repeat=repeat))
+        compiled_time = min(timeit.repeat(compiled, number=1, repeat=repeat))
+        print(f"{kind}: legacy {records / legacy_time:,.0f} records/s, compiled {records / compiled_time:,.0f} "
+              f"records/s, {legacy_time / compiled_time:.2f}x")
+
+
+if __name__ == "__main__":
+    app()
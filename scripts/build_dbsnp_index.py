@@ -0,0 +1,18 @@
+# Builds the memory-mapped dbSNP index used by create_knowledge_graph.py --dbsnp-index
+import typer
+import pathlib
+from typing_extensions import Annotated
+from biocypher_metta.dbsnp_index import build_dbsnp_index
+
+app = typer.Typer()
+
+@app.command()
+def main(vcf: Annotated[pathlib.Path, typer.Option(exists=True, file_okay=True, dir_okay=False,
+                                                   help="dbSNP VCF file, as read by DBSNPAdapter")],
+         output_dir: Annotated[pathlib.Path, typer.Option(file_okay=False, dir_okay=True,
+                                                          help="Directory to write the index to")]):
+    build_dbsnp_index(vcf, output_dir)
+
+
+if __name__ == "__main__":
+    app()
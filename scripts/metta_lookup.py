@@ -0,0 +1,39 @@
+# Prints the atoms of entities of a nodes.metta or edges.metta file indexed by create_knowledge_graph.py
+# --index-output, by id or by genomic region, without scanning the file
+import typer
+import pathlib
+from typing import List, Optional
+from typing_extensions import Annotated
+from biocypher_metta.metta_index import MettaIndex
+
+app = typer.Typer()
+
+
+def parse_region(region):
+    chr, _, interval = region.partition(":")
+    start, _, end = interval.partition("-")
+    try:
+        return chr, int(start.replace(",", "")), int((end or start).replace(",", ""))
+    except ValueError:
+        raise typer.BadParameter(f"Invalid region {region}, expected chr:start-end")
+
+
+@app.command()
+def main(file: Annotated[pathlib.Path, typer.Argument(exists=True, file_okay=True, dir_okay=False,
+                                                      help="Indexed nodes.metta or edges.metta file")],
+         id: Annotated[Optional[List[str]], typer.Option(help="Id of a node, or source or target id of edges")] = None,
+         region: Annotated[Optional[List[str]], typer.Option(help="chr:start-end, entities starting in it")] = None):
+    if not id and not region:
+        raise typer.BadParameter("Give at least one --id or --region")
+    with MettaIndex(file) as index:
+        blocks = []
+        for i in id or []:
+            blocks.extend(index.lookup(i))
+        for r in region or []:
+            blocks.extend(index.region(*parse_region(r)))
+    for block in blocks:
+        print(block, end="")
+
+
+if __name__ == "__main__":
+    app()
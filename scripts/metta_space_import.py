@@ -7,6 +7,9 @@ import time
 import datetime
 import resource
 import logging
+import shutil
+import tempfile
+from biocypher_metta.output_codecs import open_input, CODECS
 
 app = typer.Typer()
 
@@ -32,6 +35,20 @@ def memory_usage(point=""):
                 usage[2]/1024.0 )
 
 
+def import_metta_file(metta, path):
+    """
+    Import a .metta file, compressed files (see create_knowledge_graph.py --output-codec) are decompressed to a
+    temporary file first
+    """
+    if path.suffix == ".metta":
+        metta.import_file(str(path.resolve()))
+        return
+    with tempfile.NamedTemporaryFile("w", suffix=".metta") as tmp, open_input(path) as f:
+        shutil.copyfileobj(f, tmp, 16 * 1024 * 1024)
+        tmp.flush()
+        metta.import_file(tmp.name)
+
+
 def setup_logger(logger_name, log_file, level=logging.INFO):
     logger = logging.getLogger(logger_name)
     formatter = logging.Formatter('%(asctime)s - %(name)s : %(message)s')
@@ -63,11 +80,12 @@ def load_metta_space(input_dir: Annotated[pathlib.Path,
         logger.info(f"Loading type definitions ...")
         metta.import_file(str(type_def_path.resolve()))
         logger.debug(memory_usage("After loading type definitions"))
-        for path in input_dir.rglob("*.metta"):
-            full_path = str(path.resolve())
-            logger.info(f"Loading {full_path} ...")
-            metta.import_file(full_path)
-            logger.debug(memory_usage(f"After loading {full_path}"))
+        for extension in CODECS.values():
+            for path in input_dir.rglob(f"*.metta{extension}"):
+                full_path = str(path.resolve())
+                logger.info(f"Loading {full_path} ...")
+                import_metta_file(metta, path)
+                logger.debug(memory_usage(f"After loading {full_path}"))
 
         # get properties of (gene ENSG00000290825)
         prog1 = '''
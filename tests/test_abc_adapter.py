@@ -0,0 +1,49 @@
+import gzip
+import pickle
+from biocypher_metta.adapters.abc_adapter import ABCAdapter, COL_DICT
+from biocypher_metta.adapters.region_filter import RegionFilter
+
+DBSNP_RSID_MAP = {"rs1": {"chr": "chr16", "pos": 100}, "rs2": {"chr": "chr4", "pos": 500}}
+
+
+def write_row(f, rsid, chr, target_gene):
+    row = [""] * len(COL_DICT)
+    row[COL_DICT["rsid"]] = rsid
+    row[COL_DICT["chromosome"]] = chr
+    row[COL_DICT["target_gene"]] = target_gene
+    row[COL_DICT["abc_score"]] = "0.5"
+    row[COL_DICT["cell_type"]] = "HepG2-Roadmap"
+    f.write(",".join(row) + "\n")
+
+
+def create_adapter(tmp_path, **kwargs):
+    filepath = tmp_path / "abc.csv.gz"
+    with gzip.open(filepath, "wt") as f:
+        f.write(",".join(COL_DICT) + "\n")
+        write_row(f, "rs1", "chr16", "GENE1")
+        write_row(f, "rs2", "chr4", "GENE2")
+        write_row(f, "rs3", "chr16", "GENE1") # not in the dbsnp map
+    hgnc_to_ensembl_map = tmp_path / "hgnc_to_ensembl.pkl"
+    tissue_to_ontology_id_map = tmp_path / "tissues.pkl"
+    with open(hgnc_to_ensembl_map, "wb") as f:
+        pickle.dump({"GENE1": "ENSG1", "GENE2": "ENSG2"}, f)
+    with open(tissue_to_ontology_id_map, "wb") as f:
+        pickle.dump({"HepG2-Roadmap": "EFO_0001187"}, f)
+    return ABCAdapter(filepath, "edge", hgnc_to_ensembl_map, tissue_to_ontology_id_map, DBSNP_RSID_MAP,
+                      write_properties=True, add_provenance=False, **kwargs)
+
+
+def test_edges_of_chromosome(tmp_path):
+    adapter = create_adapter(tmp_path, chr="chr16")
+    assert [(source, target) for source, target, _, _ in adapter.get_edges()] == [("rs1", "ENSG1")]
+
+
+def test_edges_of_regions(tmp_path):
+    adapter = create_adapter(tmp_path)
+    adapter.set_region_filter(RegionFilter([("chr4", 1, 1000)]))
+    assert [(source, target) for source, target, _, _ in adapter.get_edges()] == [("rs2", "ENSG2")]
+
+
+def test_edges_of_window(tmp_path):
+    adapter = create_adapter(tmp_path, chr="chr16", start=50, end=99)
+    assert list(adapter.get_edges()) == []